@@ -1,6 +1,7 @@
 "use client";
-import { useEffect, useState } from "react";
-import { supabase, Appointment, OFFICES, BOOK_URL } from "@/lib/supabase";
+import { useEffect, useMemo, useState } from "react";
+import { supabase, Appointment, OFFICES, BOOK_URL, snapshotAppointment } from "@/lib/supabase";
+import { usePublicSnapshot } from "@/lib/usePublicSnapshot";
 import { format, parseISO, formatDistanceToNow } from "date-fns";
 
 const PAGE_SIZE_OPTIONS = [25, 50, 100];
@@ -21,19 +22,29 @@ function firstSeen(ts: string): string {
   return formatDistanceToNow(new Date(ts), { addSuffix: true });
 }
 
+// Same order as the history query: golden first, then date, then time (future rows have none)
+function byTableOrder(a: Appointment, b: Appointment): number {
+  if (a.is_golden !== b.is_golden) return a.is_golden ? -1 : 1;
+  if (a.appointment_date !== b.appointment_date) return a.appointment_date < b.appointment_date ? -1 : 1;
+  return (a.appointment_time ?? "").localeCompare(b.appointment_time ?? "");
+}
+
 type Filters = {
   offices: string[];
   available: "Y" | "N" | "all";
 };
 
 export default function AppointmentsTable() {
-  const [appointments, setAppointments] = useState<Appointment[]>([]);
+  const snapshot = usePublicSnapshot();
+  const [history, setHistory] = useState<Appointment[]>([]);
   const [filters, setFilters] = useState<Filters>({ offices: [], available: "Y" });
   const [page, setPage] = useState(1);
   const [pageSize, setPageSize] = useState(25);
   const [officeOpen, setOfficeOpen] = useState(false);
 
-  const fetchAppointments = async () => {
+  // "Gone" and "All" include history, which isn't in the snapshot: query it,
+  // again only when a new snapshot is published rather than on every row change
+  const fetchHistory = async () => {
     let query = supabase
       .from("appointments")
       .select("*")
@@ -43,29 +54,34 @@ export default function AppointmentsTable() {
       .order("appointment_time", { ascending: true, nullsFirst: true });
 
     const todayStr = new Date().toISOString().split("T")[0];
-    if (filters.available === "Y") query = query.eq("available", true).gte("appointment_date", todayStr);
     if (filters.available === "N") query = query.eq("available", false);
     // In "all" mode, never show past dates with available=true (stale records)
     if (filters.available === "all") query = query.or(`available.eq.false,appointment_date.gte.${todayStr}`);
     if (filters.offices.length > 0) query = query.in("office", filters.offices);
 
     const { data } = await query;
-    if (data) setAppointments(data);
+    if (data) setHistory(data);
   };
 
   useEffect(() => {
-    fetchAppointments();
     setPage(1);
   }, [filters]);
 
   useEffect(() => {
-    fetchAppointments();
-    const channel = supabase
-      .channel("appointments_table")
-      .on("postgres_changes", { event: "*", schema: "public", table: "appointments" }, fetchAppointments)
-      .subscribe();
-    return () => { supabase.removeChannel(channel); };
-  }, []);
+    if (filters.available !== "Y") fetchHistory();
+  }, [filters, snapshot?.version]);
+
+  // "Available" comes straight from the snapshot
+  const appointments = useMemo(() => {
+    if (filters.available !== "Y") return history;
+    if (!snapshot) return [];
+    const todayStr = new Date().toISOString().split("T")[0];
+    return snapshot.payload.slots
+      .filter((slot) => slot.appointment_date >= todayStr)
+      .filter((slot) => filters.offices.length === 0 || filters.offices.includes(slot.office))
+      .map((slot) => snapshotAppointment(slot, snapshot.published_at))
+      .sort(byTableOrder);
+  }, [filters, history, snapshot]);
 
   // Paginate
   const totalPages = Math.ceil(appointments.length / pageSize);
@@ -164,6 +180,7 @@ export default function AppointmentsTable() {
               <th className="px-4 py-3 text-left text-xs font-semibold text-gray-500 uppercase tracking-wide">Office</th>
               <th className="px-4 py-3 text-left text-xs font-semibold text-gray-500 uppercase tracking-wide">Date</th>
               <th className="px-4 py-3 text-left text-xs font-semibold text-gray-500 uppercase tracking-wide">Time</th>
+              <th className="px-4 py-3 text-left text-xs font-semibold text-gray-500 uppercase tracking-wide hidden md:table-cell">Type</th>
               <th className="px-4 py-3 text-left text-xs font-semibold text-gray-500 uppercase tracking-wide hidden sm:table-cell">First Seen</th>
               <th className="px-4 py-3 text-left text-xs font-semibold text-gray-500 uppercase tracking-wide">Status</th>
               <th className="px-4 py-3 text-right text-xs font-semibold text-gray-500 uppercase tracking-wide">Action</th>
@@ -172,7 +189,7 @@ export default function AppointmentsTable() {
           <tbody className="divide-y divide-gray-100">
             {paginated.length === 0 ? (
               <tr>
-                <td colSpan={6} className="px-4 py-12 text-center text-sm text-gray-400">
+                <td colSpan={7} className="px-4 py-12 text-center text-sm text-gray-400">
                   No appointments match your filters.
                 </td>
               </tr>
@@ -200,6 +217,7 @@ export default function AppointmentsTable() {
                   <td className="px-4 py-3 text-sm text-gray-700 font-mono">
                     {formatTime(appt.appointment_time)}
                   </td>
+                  <td className="px-4 py-3 text-sm text-gray-700 hidden md:table-cell">{appt.appointment_type}</td>
                   <td className="px-4 py-3 text-sm text-gray-400 hidden sm:table-cell">
                     {firstSeen(appt.first_seen_at)}
                   </td>
@@ -1,6 +1,6 @@
 "use client";
-import { useEffect, useState } from "react";
-import { supabase, Appointment, BOOK_URL } from "@/lib/supabase";
+import { BOOK_URL } from "@/lib/supabase";
+import { usePublicSnapshot } from "@/lib/usePublicSnapshot";
 import { format, parseISO } from "date-fns";
 
 function formatDate(dateStr: string): string {
@@ -22,43 +22,17 @@ function daysUntil(dateStr: string): number {
 }
 
 export default function GoldenSlots() {
-  const [slots, setSlots] = useState<Appointment[]>([]);
-
-  const fetchSlots = async () => {
-    const today = new Date();
-    const todayStr = today.toISOString().split("T")[0];
-
-    const { data } = await supabase
-      .from("appointments")
-      .select("*")
-      .eq("slot_type", "golden")
-      .eq("available", true)
-      .gte("appointment_date", todayStr)
-      .order("appointment_date", { ascending: true })
-      .order("appointment_time", { ascending: true });
-
-    if (data) {
-      // Also filter out same-day slots whose time has already passed
-      const now = new Date();
-      const filtered = data.filter((slot) => {
-        if (slot.appointment_date !== todayStr || !slot.appointment_time) return true;
-        const [h, m] = slot.appointment_time.split(":").map(Number);
-        return h > now.getHours() || (h === now.getHours() && m > now.getMinutes());
-      });
-      setSlots(filtered);
-    }
-  };
-
-  useEffect(() => {
-    fetchSlots();
-
-    const channel = supabase
-      .channel("golden_slots")
-      .on("postgres_changes", { event: "*", schema: "public", table: "appointments" }, fetchSlots)
-      .subscribe();
-
-    return () => { supabase.removeChannel(channel); };
-  }, []);
+  const snapshot = usePublicSnapshot();
+
+  const todayStr = new Date().toISOString().split("T")[0];
+  const now = new Date();
+  const slots = (snapshot?.payload.slots ?? []).filter((slot) => {
+    if (slot.slot_type !== "golden" || slot.appointment_date < todayStr) return false;
+    // Also filter out same-day slots whose time has already passed
+    if (slot.appointment_date !== todayStr || !slot.appointment_time) return true;
+    const [h, m] = slot.appointment_time.split(":").map(Number);
+    return h > now.getHours() || (h === now.getHours() && m > now.getMinutes());
+  });
 
   if (slots.length === 0) return null;
 
@@ -29,6 +29,42 @@ export type ScrapeRun = {
   future_slots_found: number;
 };
 
+// Published by the scraper at the end of every sweep (scraper/public_snapshot.py)
+export type SnapshotSlot = Pick<
+  Appointment,
+  "id" | "office" | "appointment_type" | "slot_type" | "appointment_date" | "appointment_time" | "first_seen_at"
+>;
+
+export type OfficeCheck = {
+  office: string;
+  appointment_type: string;
+  last_checked_at: string;
+  golden_count: number;
+  future_count: number;
+};
+
+export type PublicSnapshot = {
+  version: number;
+  published_at: string;
+  payload: {
+    slots: SnapshotSlot[];          // live golden slots + each office's closest future date
+    offices: OfficeCheck[];
+    last_checked_at: string | null;
+  };
+};
+
+// A snapshot slot in the shape of an appointments row (everything in a snapshot is available)
+export function snapshotAppointment(slot: SnapshotSlot, publishedAt: string): Appointment {
+  return {
+    ...slot,
+    is_golden: slot.slot_type === "golden",
+    is_current_closest: slot.slot_type === "future",
+    available: true,
+    last_seen_at: publishedAt,
+    book_url: BOOK_URL,
+  };
+}
+
 export const OFFICES = [
   "Augusta",
   "Bangor",
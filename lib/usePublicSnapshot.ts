@@ -0,0 +1,60 @@
+import { useEffect, useState } from "react";
+import { supabase, PublicSnapshot } from "@/lib/supabase";
+
+// One fetch and one realtime channel per tab, shared by every component using the hook.
+// The scraper bumps the version once per sweep, so that's all the traffic a tab causes.
+let current: PublicSnapshot | null = null;
+let channel: ReturnType<typeof supabase.channel> | null = null;
+const listeners = new Set<(snapshot: PublicSnapshot) => void>();
+
+function accept(next: PublicSnapshot) {
+  if (current && next.version <= current.version) return;
+  current = next;
+  listeners.forEach((listener) => listener(next));
+}
+
+async function fetchSnapshot() {
+  const { data } = await supabase
+    .from("public_snapshot")
+    .select("version, published_at, payload")
+    .eq("id", 1)
+    .single();
+  if (data) accept(data);
+}
+
+function connect() {
+  if (channel) return;
+  fetchSnapshot();
+  channel = supabase
+    .channel("public_snapshot")
+    .on("postgres_changes", { event: "UPDATE", schema: "public", table: "public_snapshot" }, (change) => {
+      const row = change.new as Partial<PublicSnapshot>;
+      // Realtime can leave out large column values; re-read the row if the payload didn't come along
+      if (row.payload && typeof row.version === "number" && row.published_at) accept(row as PublicSnapshot);
+      else fetchSnapshot();
+    })
+    .subscribe();
+}
+
+function disconnect() {
+  if (channel && listeners.size === 0) {
+    supabase.removeChannel(channel);
+    channel = null;
+  }
+}
+
+export function usePublicSnapshot(): PublicSnapshot | null {
+  const [snapshot, setSnapshot] = useState<PublicSnapshot | null>(current);
+
+  useEffect(() => {
+    listeners.add(setSnapshot);
+    connect();
+    if (current) setSnapshot(current);
+    return () => {
+      listeners.delete(setSnapshot);
+      disconnect();
+    };
+  }, []);
+
+  return snapshot;
+}
@@ -1,57 +1,91 @@
 """
 Email alerts via Resend when new golden slots appear.
+One digest per office per sweep, sent in batches by AlertDispatcher.
 """
+import asyncio
 import os
+import random
+import time
 import resend
-from datetime import date
+from dataclasses import dataclass
+from datetime import date, datetime
+
+import metrics
 
 resend.api_key = os.environ.get("RESEND_API_KEY", "")
 
 FROM_EMAIL = "Maine BMV Slots <alerts@mainebmvslots.com>"  # update after domain setup
 # For testing before domain setup, Resend allows: onboarding@resend.dev
 
+ALERT_CONCURRENCY = int(os.environ.get("ALERT_CONCURRENCY", "2"))
+ALERT_MAX_RETRIES = int(os.environ.get("ALERT_MAX_RETRIES", "4"))
+ALERT_BACKOFF_BASE = float(os.environ.get("ALERT_BACKOFF_BASE", "1.0"))
+# A slot that comes back within this long of its last alert isn't alerted on again
+ALERT_COOLDOWN_SECONDS = float(os.environ.get("ALERT_COOLDOWN_SECONDS", "3600"))
+RESEND_BATCH_SIZE = 100  # Resend's per-request batch limit
+
 
 def format_date(d: date) -> str:
     return d.strftime("%B %-d, %Y")  # "February 13, 2026"
 
 
-def send_golden_alert(
-    to_emails: list[str],
-    office: str,
-    appt_date: date,
-    appt_time: str,
-    book_url: str,
-) -> None:
-    """Send email alert for a new golden slot."""
-    if not resend.api_key or not to_emails:
-        return
-
-    date_str = format_date(appt_date)
-
-    # Format time nicely: "14:00:00" → "2:00 PM"
-    from datetime import datetime
+def format_time(appt_time: str) -> str:
+    """"14:00:00" → "2:00 PM"."""
     try:
         t = datetime.strptime(appt_time[:5], "%H:%M")
-        time_str = t.strftime("%-I:%M %p")
+        return t.strftime("%-I:%M %p")
     except Exception:
-        time_str = appt_time
+        return appt_time
+
+
+def _slot_key(slot: dict) -> tuple:
+    return (slot["date"], slot["time"], slot.get("type"))
+
+
+def _type_suffix(slot: dict) -> str:
+    return f" · {slot['type']}" if slot.get("type") else ""
 
-    subject = f"⚡ {office} — {date_str} at {time_str} — Book Now"
+
+def _digest_type(slots: list[dict]) -> str | None:
+    """The one appointment type every slot in a digest shares, or None when they differ (or aren't labelled)."""
+    types = {s.get("type") for s in slots}
+    return types.pop() if len(types) == 1 else None
+
+
+def build_digest(office: str, slots: list[dict], book_url: str) -> tuple[str, str]:
+    """Subject + HTML for every new golden slot at one office. slots: [{date, time, type?}]."""
+    slots = sorted(slots, key=lambda s: (s["date"], s["time"], s.get("type", "")))
+    first = slots[0]
+    first_str = f"{format_date(first['date'])} at {format_time(first['time'])}"
+    appt_type = _digest_type(slots)
+    kind = f"{appt_type} " if appt_type else ""
+    if len(slots) == 1:
+        subject = f"⚡ {office} — {appt_type + ' — ' if appt_type else ''}{first_str} — Book Now"
+        heading = f"New {kind}Appointment"
+        intro = "A short-notice slot just opened up at the Maine BMV."
+    else:
+        subject = f"⚡ {office} — {len(slots)} new {kind}slots from {first_str} — Book Now"
+        heading = f"{len(slots)} New {kind}Appointments"
+        intro = "Short-notice slots just opened up at the Maine BMV."
+
+    rows = "".join(
+        f"""
+        <div style="font-size: 18px; color: #333; margin-top: 4px;">{format_date(s['date'])} · {format_time(s['time'])}{'' if appt_type else _type_suffix(s)}</div>"""
+        for s in slots
+    )
 
     html_body = f"""
     <div style="font-family: -apple-system, sans-serif; max-width: 480px; margin: 0 auto; padding: 24px;">
-      <h2 style="margin: 0 0 8px; color: #111;">New Real ID Appointment</h2>
+      <h2 style="margin: 0 0 8px; color: #111;">{heading}</h2>
       <p style="margin: 0 0 24px; color: #555; font-size: 15px;">
-        A short-notice slot just opened up at the Maine BMV.
+        {intro}
       </p>
 
       <div style="background: #fef3c7; border: 1px solid #f59e0b; border-radius: 8px; padding: 20px; margin-bottom: 24px;">
         <div style="font-size: 13px; color: #92400e; text-transform: uppercase; letter-spacing: 0.05em; margin-bottom: 6px;">
-          🏆 Golden Slot
+          🏆 Golden Slot{"s" if len(slots) > 1 else ""}
         </div>
-        <div style="font-size: 22px; font-weight: 700; color: #111;">{office}</div>
-        <div style="font-size: 18px; color: #333; margin-top: 4px;">{date_str}</div>
-        <div style="font-size: 18px; color: #333;">{time_str}</div>
+        <div style="font-size: 22px; font-weight: 700; color: #111;">{office}</div>{rows}
       </div>
 
       <a href="{book_url}"
@@ -68,15 +102,151 @@ def send_golden_alert(
       </p>
     </div>
     """
+    return subject, html_body
+
+
+@dataclass
+class _Digest:
+    office: str
+    slots: list[dict]
+    to_emails: list[str]
+    book_url: str
+
+
+class AlertDispatcher:
+    """
+    Sends alert digests off the scrape's critical path.
+
+    submit() never blocks: it queues one digest per office (merging into a
+    digest for the same office that hasn't been picked up yet). ALERT_CONCURRENCY
+    workers turn each digest into Resend batch sends of up to RESEND_BATCH_SIZE
+    emails, retrying failed batches with exponential backoff + jitter.
+
+    A slot alerted on in the last ALERT_COOLDOWN_SECONDS is dropped from new
+    digests, so one that flaps gone → back doesn't email everyone twice. The
+    cooldown starts when the slot is queued (so it isn't queued twice while in
+    flight) and is lifted again if Resend accepts none of the digest's batches.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = ALERT_CONCURRENCY,
+        max_retries: int = ALERT_MAX_RETRIES,
+        cooldown: float = ALERT_COOLDOWN_SECONDS,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.cooldown = cooldown
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._pending: dict[str, _Digest] = {}  # office → digest not yet picked up
+        self._alerted: dict[tuple, float] = {}   # (office, *slot key) → monotonic time of last alert
+        self._workers: list[asyncio.Task] = []
+        self.stats = {"digests": 0, "emails": 0, "batches": 0, "retries": 0, "failed": 0, "cooled_down": 0}
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def start(self) -> None:
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
 
-    # Resend requires sending one at a time or use batch
-    for email in to_emails:
+    def submit(self, office: str, slots: list[dict], to_emails: list[str], book_url: str) -> None:
+        if not resend.api_key or not to_emails or not slots:
+            return
+        slots = self._past_cooldown(office, slots)
+        if not slots:
+            return
+        self.start()
+        pending = self._pending.get(office)
+        if pending is not None:
+            seen = {_slot_key(s) for s in pending.slots}
+            pending.slots.extend(s for s in slots if _slot_key(s) not in seen)
+            pending.to_emails = sorted(set(pending.to_emails) | set(to_emails))
+            return
+        self._pending[office] = _Digest(office, list(slots), list(to_emails), book_url)
+        self._queue.put_nowait(office)
+
+    def _past_cooldown(self, office: str, slots: list[dict]) -> list[dict]:
+        """The slots not alerted on within the cooldown; marks them alerted as of now."""
+        now = time.monotonic()
+        self._alerted = {k: t for k, t in self._alerted.items() if now - t < self.cooldown}
+        fresh = []
+        for slot in slots:
+            key = (office, *_slot_key(slot))
+            if key in self._alerted:
+                self.stats["cooled_down"] += 1
+                continue
+            self._alerted[key] = now
+            fresh.append(slot)
+        return fresh
+
+    async def _worker(self) -> None:
+        while True:
+            office = await self._queue.get()
+            digest = self._pending.pop(office, None)
+            try:
+                if digest is not None and not await self._send_digest(digest):
+                    self._lift_cooldown(digest)
+            except Exception as e:
+                self._lift_cooldown(digest)
+                print(f"  [alerts] digest for {office} failed: {e}", flush=True)
+            finally:
+                self._queue.task_done()
+
+    def _lift_cooldown(self, digest: _Digest | None) -> None:
+        """Nobody got this digest: let its slots be alerted on again."""
+        if digest is None:
+            return
+        for slot in digest.slots:
+            self._alerted.pop((digest.office, *_slot_key(slot)), None)
+
+    async def _send_digest(self, digest: _Digest) -> bool:
+        """True if at least one batch was accepted."""
+        subject, html_body = build_digest(digest.office, digest.slots, digest.book_url)
+        self.stats["digests"] += 1
+        emails = digest.to_emails
+        sent = False
+        for i in range(0, len(emails), RESEND_BATCH_SIZE):
+            chunk = emails[i:i + RESEND_BATCH_SIZE]
+            params = [
+                {"from": FROM_EMAIL, "to": [email], "subject": subject, "html": html_body}
+                for email in chunk
+            ]
+            sent = await self._send_batch(params) or sent
+        return sent
+
+    async def _send_batch(self, params: list[dict]) -> bool:
+        for attempt in range(self.max_retries + 1):
+            try:
+                with metrics.span("bmv_email_seconds"):
+                    await asyncio.to_thread(resend.Batch.send, params)
+                self.stats["batches"] += 1
+                self.stats["emails"] += len(params)
+                metrics.inc("bmv_emails_total", len(params), result="sent")
+                return True
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.stats["failed"] += len(params)
+                    metrics.inc("bmv_emails_total", len(params), result="failed")
+                    print(f"  [alerts] batch of {len(params)} failed after {attempt + 1} tries: {e}", flush=True)
+                    return False
+                self.stats["retries"] += 1
+                metrics.inc("bmv_emails_total", len(params), result="retried")
+                delay = ALERT_BACKOFF_BASE * (2 ** attempt)
+                await asyncio.sleep(delay + random.uniform(0, delay))
+
+    async def drain(self, timeout: float | None = None) -> None:
+        """Wait for everything queued so far to be sent (used by one-shot runs)."""
+        if not self._workers:
+            return
         try:
-            resend.Emails.send({
-                "from": FROM_EMAIL,
-                "to": [email],
-                "subject": subject,
-                "html": html_body,
-            })
-        except Exception as e:
-            print(f"Failed to send alert to {email}: {e}")
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"  [alerts] drain timed out with {self.queue_depth} digests queued", flush=True)
+
+    async def close(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
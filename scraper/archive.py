@@ -0,0 +1,171 @@
+"""
+Hot/cold split for the appointments table.
+
+Moves rows that are no longer available and were last seen more than
+ARCHIVE_RETENTION_DAYS ago into appointments_archive, and keeps
+appointment_daily_rollups (per office, appointment type, day first seen and slot type:
+slots seen, median / max lifetime, first-seen times) up to date for them.
+
+  python archive.py                        # archive everything past the window
+  python archive.py --dry-run              # just count
+  python archive.py --retention-days 30 --batch 500
+
+Each batch is:
+  1. upsert the rows into appointments_archive (on id, so a re-run after a
+     crash between steps is harmless)
+  2. recompute the rollups for every (office, day) the batch touched, from
+     the archive, and upsert them
+  3. delete the rows from appointments
+"""
+import argparse
+import os
+import statistics
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import db
+from db import parse_ts
+
+ARCHIVE_RETENTION_DAYS = int(os.environ.get("ARCHIVE_RETENTION_DAYS", "14"))
+ARCHIVE_BATCH = int(os.environ.get("ARCHIVE_BATCH", "1000"))
+# Rows per archive read; at most PostgREST's max_rows (1000 by default), which truncates silently
+ARCHIVE_READ_PAGE = int(os.environ.get("ARCHIVE_READ_PAGE", "1000"))
+LOCAL_TZ = ZoneInfo("America/New_York")
+
+
+def local_day(row: dict) -> date:
+    return parse_ts(row["first_seen_at"]).astimezone(LOCAL_TZ).date()
+
+
+def compute_rollups(rows: list[dict]) -> list[dict]:
+    """Group archived rows by (office, appointment type, local day first seen, slot_type) into rollup rows."""
+    groups: dict[tuple[str, str, date, str], list[dict]] = defaultdict(list)
+    for row in rows:
+        groups[(row["office"], row["appointment_type"], local_day(row), row["slot_type"])].append(row)
+
+    rollups = []
+    for (office, appointment_type, day, slot_type), members in sorted(groups.items()):
+        lifetimes = []
+        seen_times: list[time] = []
+        by_hour = [0] * 24
+        for row in members:
+            first = parse_ts(row["first_seen_at"])
+            last = parse_ts(row["last_seen_at"])
+            lifetimes.append(max(0, int((last - first).total_seconds())))
+            local = first.astimezone(LOCAL_TZ).time().replace(microsecond=0)
+            seen_times.append(local)
+            by_hour[local.hour] += 1
+        rollups.append({
+            "office": office,
+            "appointment_type": appointment_type,
+            "day": day.isoformat(),
+            "slot_type": slot_type,
+            "slots_seen": len(members),
+            "median_lifetime_seconds": int(statistics.median(lifetimes)),
+            "max_lifetime_seconds": max(lifetimes),
+            "earliest_first_seen": min(seen_times).isoformat(),
+            "latest_first_seen": max(seen_times).isoformat(),
+            "first_seen_by_hour": by_hour,
+            "updated_at": db.now_utc(),
+        })
+    return rollups
+
+
+def _archived_for_days(db_client, keys: set[tuple[str, date]]) -> list[dict]:
+    """
+    Every archived row first seen on one of the (office, local day) pairs in `keys`.
+    Read in pages: a busy office / day range easily passes PostgREST's row cap.
+    """
+    days = sorted({d for _, d in keys})
+    # Local-day bounds in UTC, padded by the range of the touched days
+    start = datetime.combine(days[0], time(), LOCAL_TZ).astimezone(timezone.utc)
+    end = datetime.combine(days[-1] + timedelta(days=1), time(), LOCAL_TZ).astimezone(timezone.utc)
+    rows: list[dict] = []
+    while True:
+        page = (
+            db_client.table("appointments_archive")
+            .select("office, appointment_type, slot_type, first_seen_at, last_seen_at")
+            .in_("office", sorted({o for o, _ in keys}))
+            .gte("first_seen_at", start.isoformat())
+            .lt("first_seen_at", end.isoformat())
+            .order("id")
+            .range(len(rows), len(rows) + ARCHIVE_READ_PAGE - 1)
+            .execute()
+        ).data
+        rows.extend(page)
+        if len(page) < ARCHIVE_READ_PAGE:
+            break
+    return [r for r in rows if (r["office"], local_day(r)) in keys]
+
+
+def archive_batch(db_client, cutoff: str, batch: int) -> int:
+    """Archive up to `batch` eligible rows. Returns how many were moved."""
+    rows = (
+        db_client.table("appointments")
+        .select("*")
+        .eq("available", False)
+        .lt("last_seen_at", cutoff)
+        .order("last_seen_at")
+        .limit(batch)
+        .execute()
+    ).data
+    if not rows:
+        return 0
+
+    archived_at = db.now_utc()
+    db_client.table("appointments_archive").upsert(
+        [{**row, "archived_at": archived_at} for row in rows], on_conflict="id",
+    ).execute()
+
+    touched = {(row["office"], local_day(row)) for row in rows}
+    rollups = compute_rollups(_archived_for_days(db_client, touched))
+    if rollups:
+        db_client.table("appointment_daily_rollups").upsert(
+            rollups, on_conflict="office,appointment_type,day,slot_type",
+        ).execute()
+
+    db_client.table("appointments").delete().in_("id", [row["id"] for row in rows]).execute()
+    return len(rows)
+
+
+def archive(db_client, retention_days: int = ARCHIVE_RETENTION_DAYS, batch: int = ARCHIVE_BATCH,
+            dry_run: bool = False) -> int:
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).isoformat()
+    print(f"Archiving appointments gone before {cutoff[:19]} UTC ({retention_days} days)", flush=True)
+
+    if dry_run:
+        result = (
+            db_client.table("appointments")
+            .select("id", count="exact")
+            .eq("available", False)
+            .lt("last_seen_at", cutoff)
+            .limit(1)
+            .execute()
+        )
+        print(f"  [dry run] {result.count or 0} rows would be archived", flush=True)
+        return 0
+
+    total = 0
+    while True:
+        moved = archive_batch(db_client, cutoff, batch)
+        total += moved
+        if moved:
+            print(f"  archived {moved} rows ({total} so far)", flush=True)
+        if moved < batch:
+            break
+    print(f"Done. {total} rows archived.", flush=True)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--retention-days", type=int, default=ARCHIVE_RETENTION_DAYS)
+    parser.add_argument("--batch", type=int, default=ARCHIVE_BATCH)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    archive(db.get_client(), args.retention_days, args.batch, args.dry_run)
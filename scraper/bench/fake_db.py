@@ -0,0 +1,284 @@
+"""
+In-memory stand-in for the supabase Client, covering the query-builder calls
+db.py makes. Every execute() is one "round trip" and is counted per table and
+operation, so benchmarks can report DB calls per sweep.
+
+Supported: table().select(cols, count=) / insert / update / upsert(on_conflict,
+default_to_null) / delete, filters eq / neq / in_ / gte / lt / lte / is_ / or_
+(comma-separated col.op.value terms, incl. cs.{...}), order, limit, execute;
+plus rpc() for functions registered with register_rpc().
+"""
+import copy
+import threading
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+# Column defaults the real schema fills in on insert
+_DEFAULTS: dict[str, dict[str, Callable[[], Any]]] = {
+    "appointments": {
+        "appointment_type": lambda: "Driver's License",
+        "is_golden": lambda: False,
+        "is_current_closest": lambda: False,
+        "available": lambda: True,
+        "first_seen_at": lambda: _now(),
+        "last_seen_at": lambda: _now(),
+        "created_at": lambda: _now(),
+    },
+    "scrape_runs": {"run_at": lambda: _now()},
+    "email_subscribers": {
+        "active": lambda: True,
+        "offices": lambda: [],
+        "subscribed_at": lambda: _now(),
+        "updated_at": lambda: _now(),
+    },
+    "office_status": {"last_checked_at": lambda: _now()},
+}
+_PRIMARY_KEYS = {"office_status": ("office", "appointment_type")}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+@dataclass
+class _Result:
+    data: list[dict]
+    count: int | None = None
+
+
+def _coerce(value: str) -> Any:
+    if value == "null":
+        return None
+    if value in ("true", "false"):
+        return value == "true"
+    return value
+
+
+def _match_term(row: dict, term: str) -> bool:
+    """One PostgREST or_ term: col.op.value."""
+    col, op, value = term.split(".", 2)
+    cell = row.get(col)
+    if op == "eq":
+        if value == "{}":
+            return cell == [] or cell == ()
+        return cell == _coerce(value) or str(cell) == value
+    if op == "is":
+        return cell is _coerce(value)
+    if op == "cs":
+        wanted = [v.strip().strip('"') for v in value.strip("{}").split(",") if v.strip()]
+        return cell is not None and all(w in cell for w in wanted)
+    if op == "gte":
+        return cell is not None and str(cell) >= value
+    raise ValueError(f"unsupported or_ operator: {op}")
+
+
+def _split_terms(expr: str) -> list[str]:
+    # Commas inside {...} belong to the value, not the term list
+    terms, depth, cur = [], 0, ""
+    for ch in expr:
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+        if ch == "," and depth == 0:
+            terms.append(cur)
+            cur = ""
+        else:
+            cur += ch
+    if cur:
+        terms.append(cur)
+    return terms
+
+
+class _Query:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self._db = db
+        self._table = table
+        self._op = "select"
+        self._payload: Any = None
+        self._filters: list[Callable[[dict], bool]] = []
+        self._order: list[tuple[str, bool]] = []
+        self._limit: int | None = None
+        self._count = False
+        self._on_conflict: tuple[str, ...] = ()
+        self._default_to_null = True
+
+    # ── Operations ───────────────────────────────────────────────────────────
+
+    def select(self, _cols: str = "*", count: str | None = None) -> "_Query":
+        self._op = "select"
+        self._count = count is not None
+        return self
+
+    def insert(self, payload) -> "_Query":
+        self._op, self._payload = "insert", payload
+        return self
+
+    def update(self, payload: dict) -> "_Query":
+        self._op, self._payload = "update", payload
+        return self
+
+    def upsert(self, payload, on_conflict: str = "", default_to_null: bool = True, **_) -> "_Query":
+        self._op, self._payload = "upsert", payload
+        self._on_conflict = tuple(c.strip() for c in on_conflict.split(",") if c.strip())
+        self._default_to_null = default_to_null
+        return self
+
+    def delete(self) -> "_Query":
+        self._op = "delete"
+        return self
+
+    # ── Filters ──────────────────────────────────────────────────────────────
+
+    def eq(self, col: str, value) -> "_Query":
+        self._filters.append(lambda r: r.get(col) == value)
+        return self
+
+    def neq(self, col: str, value) -> "_Query":
+        self._filters.append(lambda r: r.get(col) != value)
+        return self
+
+    def in_(self, col: str, values) -> "_Query":
+        values = set(values)
+        self._filters.append(lambda r: r.get(col) in values)
+        return self
+
+    def gte(self, col: str, value) -> "_Query":
+        self._filters.append(lambda r: r.get(col) is not None and str(r.get(col)) >= str(value))
+        return self
+
+    def lt(self, col: str, value) -> "_Query":
+        self._filters.append(lambda r: r.get(col) is not None and str(r.get(col)) < str(value))
+        return self
+
+    def lte(self, col: str, value) -> "_Query":
+        self._filters.append(lambda r: r.get(col) is not None and str(r.get(col)) <= str(value))
+        return self
+
+    def is_(self, col: str, value) -> "_Query":
+        target = _coerce(value) if isinstance(value, str) else value
+        self._filters.append(lambda r: r.get(col) is target)
+        return self
+
+    def or_(self, expr: str) -> "_Query":
+        terms = _split_terms(expr)
+        self._filters.append(lambda r: any(_match_term(r, t) for t in terms))
+        return self
+
+    def order(self, col: str, desc: bool = False, **_) -> "_Query":
+        self._order.append((col, desc))
+        return self
+
+    def limit(self, n: int) -> "_Query":
+        self._limit = n
+        return self
+
+    # ── Execution ────────────────────────────────────────────────────────────
+
+    def _matches(self, row: dict) -> bool:
+        return all(f(row) for f in self._filters)
+
+    def _new_row(self, values: dict) -> dict:
+        row = {"id": str(uuid.uuid4())}
+        for col, default in _DEFAULTS.get(self._table, {}).items():
+            row[col] = default()
+        row.update(values)
+        return row
+
+    def execute(self) -> _Result:
+        db = self._db
+        with db.lock:
+            db.calls[f"{self._table}.{self._op}"] += 1
+            rows = db.tables.setdefault(self._table, [])
+
+            if self._op == "select":
+                out = [r for r in rows if self._matches(r)]
+                for col, desc in reversed(self._order):
+                    out.sort(key=lambda r: (r.get(col) is None, r.get(col) or ""), reverse=desc)
+                total = len(out)
+                if self._limit is not None:
+                    out = out[: self._limit]
+                return _Result(copy.deepcopy(out), total if self._count else None)
+
+            if self._op == "insert":
+                payload = self._payload if isinstance(self._payload, list) else [self._payload]
+                new = [self._new_row(p) for p in payload]
+                rows.extend(new)
+                return _Result(copy.deepcopy(new))
+
+            if self._op == "update":
+                out = []
+                for r in rows:
+                    if self._matches(r):
+                        r.update(self._payload)
+                        out.append(r)
+                return _Result(copy.deepcopy(out))
+
+            if self._op == "delete":
+                keep = [r for r in rows if not self._matches(r)]
+                gone = [r for r in rows if self._matches(r)]
+                rows[:] = keep
+                return _Result(copy.deepcopy(gone))
+
+            if self._op == "upsert":
+                keys = self._on_conflict or _PRIMARY_KEYS.get(self._table, ("id",))
+                payload = self._payload if isinstance(self._payload, list) else [self._payload]
+                out = []
+                for p in payload:
+                    key = tuple(p.get(k) for k in keys)
+                    existing = next(
+                        (r for r in rows
+                         if None not in key and tuple(r.get(k) for k in keys) == key),
+                        None,
+                    )
+                    if existing is not None:
+                        existing.update(p)
+                        out.append(existing)
+                    else:
+                        row = self._new_row(p)
+                        rows.append(row)
+                        out.append(row)
+                return _Result(copy.deepcopy(out))
+
+        raise ValueError(f"unsupported operation {self._op}")
+
+
+class _Rpc:
+    def __init__(self, db: "FakeSupabase", name: str, params: dict):
+        self._db, self._name, self._params = db, name, params
+
+    def execute(self) -> _Result:
+        with self._db.lock:
+            self._db.calls[f"rpc.{self._name}"] += 1
+            fn = self._db.rpcs[self._name]
+            return _Result(fn(self._db, **self._params))
+
+
+class FakeSupabase:
+    """Drop-in for supabase.Client in benchmarks: FakeSupabase().table("appointments")..."""
+
+    def __init__(self):
+        self.tables: dict[str, list[dict]] = {}
+        self.calls: Counter[str] = Counter()
+        self.rpcs: dict[str, Callable] = {}
+        self.lock = threading.RLock()
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def rpc(self, name: str, params: dict | None = None) -> _Rpc:
+        return _Rpc(self, name, params or {})
+
+    def register_rpc(self, name: str, fn: Callable) -> None:
+        """fn(db, **params) -> list[dict]; runs under the DB lock like a Postgres function."""
+        self.rpcs[name] = fn
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def reset_counts(self) -> None:
+        self.calls.clear()
@@ -0,0 +1,63 @@
+"""
+Stand-in for the office lease functions in supabase/schema.sql
+(claim_office_leases / renew_office_leases / release_office_leases),
+registered as FakeSupabase RPCs with the same rules: leases expire after the
+TTL, free or expired ones can be taken over, and each live worker (seen
+within the TTL) gets about an equal share. `clock` can be swapped to move
+time forward.
+"""
+import math
+import time
+from typing import Callable
+
+
+def install(fake_db, clock: Callable[[], float] = time.time) -> None:
+    leases: dict[str, dict] = fake_db.tables.setdefault("office_leases_fake", {})
+    workers: dict[str, float] = {}
+
+    def claim(db, p_holder: str, p_offices: list[str], p_ttl_seconds: int) -> list[dict]:
+        now = clock()
+        workers[p_holder] = now
+        for office in p_offices:
+            leases.setdefault(office, {"holder": None, "expires_at": now})
+        mine = [o for o in p_offices if leases[o]["holder"] == p_holder]
+        for office in mine:
+            leases[office]["expires_at"] = now + p_ttl_seconds
+
+        live = sum(1 for seen in workers.values() if seen > now - p_ttl_seconds)
+        share = math.ceil(len(p_offices) / max(live, 1))
+        if len(mine) < share:
+            free = sorted(
+                (o for o in p_offices if leases[o]["holder"] is None or leases[o]["expires_at"] <= now),
+                key=lambda o: leases[o]["expires_at"],
+            )
+            for office in free[:share - len(mine)]:
+                leases[office] = {"holder": p_holder, "expires_at": now + p_ttl_seconds}
+        elif len(mine) > share:
+            for office in sorted(mine, reverse=True)[:len(mine) - share]:
+                leases[office] = {"holder": None, "expires_at": now}
+        return [{"office": o} for o, l in sorted(leases.items())
+                if l["holder"] == p_holder and l["expires_at"] > now]
+
+    def renew(db, p_holder: str, p_ttl_seconds: int) -> list[dict]:
+        now = clock()
+        if p_holder in workers:
+            workers[p_holder] = now
+        renewed = []
+        for office, lease in sorted(leases.items()):
+            if lease["holder"] == p_holder:
+                lease["expires_at"] = now + p_ttl_seconds
+                renewed.append({"office": office})
+        return renewed
+
+    def release(db, p_holder: str) -> list[dict]:
+        now = clock()
+        for lease in leases.values():
+            if lease["holder"] == p_holder:
+                lease.update(holder=None, expires_at=now)
+        workers.pop(p_holder, None)
+        return []
+
+    fake_db.register_rpc("claim_office_leases", claim)
+    fake_db.register_rpc("renew_office_leases", renew)
+    fake_db.register_rpc("release_office_leases", release)
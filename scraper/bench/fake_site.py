@@ -0,0 +1,267 @@
+"""
+Local stand-in for the cxmflow/Qflow booking site.
+
+Serves the five screens scrape_office walks, for all 13 offices, with the DOM
+hooks the scraper relies on (.QflowObjectItem, .next-button,
+.ServiceAppointmentDateTime[data-datetime], "Choose a Date"). Each screen is a
+real form post, so the Playwright walk and the HTTP fast path both work:
+
+  GET  /Appointment/Index/<id>   → Welcome (sets the session cookie)
+  POST /Appointment/Next         → Location / Service / Appointment Type / Date & Time,
+                                   depending on the posted Step + SelectedItemId
+  GET  /Appointment/Next         → Service page again for a live session (checkpoint restore)
+
+The markup is synthetic — modelled on what probe.py saw on 2026-02-21, not a
+byte-for-byte recording — and knobs are provided for slot counts, latency,
+failures and session expiry. Static assets under /static/ exercise request
+blocking / caching.
+"""
+import hashlib
+import html
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+OFFICES = [
+    "Augusta", "Bangor", "Calais", "Caribou", "Ellsworth", "Kennebunk", "Lewiston",
+    "Portland", "Rockland", "Rumford", "Scarborough", "Springvale", "Topsham",
+]
+APPOINTMENT_TYPES = ["Driver's License", "State ID", "Commercial License", "Vehicle Registration"]
+APPT_PATH = "/Appointment/Index/2c052fc7-571f-4b76-9790-7e91f103c408"
+ITEM_FIELD = "SelectedItemId"
+COOKIE = "QflowSession"
+
+CSS = b".QflowObjectItem{padding:8px;border:1px solid #ccc;cursor:pointer}"
+JS = (b"document.addEventListener('click',function(e){var i=e.target.closest('.QflowObjectItem');"
+      b"if(!i)return;var f=document.forms[0];f.SelectedItemId.value=i.dataset.id;f.submit();});")
+PNG = (b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f"
+       b"\x15\xc4\x89\x00\x00\x00\rIDATx\x9cc\xf8\x0f\x00\x00\x01\x01\x00\x05\x18\xd8N\x00\x00\x00\x00IEND\xaeB`\x82")
+
+
+@dataclass
+class SiteConfig:
+    slots_per_office: int = 60          # total slots on each Date & Time page
+    golden_slots_per_office: int = 4    # how many of those fall inside the golden window
+    latency_ms: float = 0.0             # added to every response
+    latency_jitter_ms: float = 0.0
+    failure_rate: float = 0.0           # fraction of requests answered with a 500
+    session_ttl: float = 600.0          # seconds before a Qflow session cookie stops working
+    seed: int = 1
+    per_office: dict[str, dict] = field(default_factory=dict)  # office → overrides of the two slot counts
+
+
+def _slot_strings(office: str, cfg: SiteConfig, today: date, appt_type: str = APPOINTMENT_TYPES[0]) -> list[str]:
+    """Deterministic slot list for an office / type: golden ones first week, the rest 8–60 days out."""
+    overrides = cfg.per_office.get(office, {})
+    total = overrides.get("slots_per_office", cfg.slots_per_office)
+    golden = min(total, overrides.get("golden_slots_per_office", cfg.golden_slots_per_office))
+    seed = f"{cfg.seed}:{office}:{today}"
+    rng = random.Random(seed if appt_type == APPOINTMENT_TYPES[0] else f"{seed}:{appt_type}")
+    times = [(h, m) for h in range(8, 16) for m in (0, 15, 30, 45)]
+
+    def pick(day_lo: int, day_hi: int, n: int) -> set[datetime]:
+        out: set[datetime] = set()
+        capacity = (day_hi - day_lo + 1) * len(times)
+        while len(out) < min(n, capacity):
+            d = today + timedelta(days=rng.randint(day_lo, day_hi))
+            h, m = rng.choice(times)
+            out.add(datetime(d.year, d.month, d.day, h, m))
+        return out
+
+    slots = sorted(pick(1, 6, golden) | pick(9, 60, total - golden))
+    # Same format the real site uses: "4/22/2026 2:15:00 PM"
+    return [f"{s.month}/{s.day}/{s.year} {s.strftime('%I').lstrip('0')}:{s.strftime('%M:%S %p')}" for s in slots]
+
+
+def _page(title: str, step: str, token: str, body: str) -> bytes:
+    return f"""<!DOCTYPE html>
+<html><head><title>{html.escape(title)} - Maine BMV</title>
+<link rel="stylesheet" href="/static/site.css"><script src="/static/site.js" defer></script></head>
+<body><img src="/static/logo.png" alt="BMV">
+<main id="maincontent"><h1>{html.escape(title)}</h1>
+<form method="post" action="/Appointment/Next">
+<input type="hidden" name="__RequestVerificationToken" value="{token}">
+<input type="hidden" name="Step" value="{step}">
+<input type="hidden" name="{ITEM_FIELD}" value="">
+{body}
+</form></main></body></html>""".encode()
+
+
+def _items(pairs: list[tuple[str, str]]) -> str:
+    return "\n".join(
+        f'<div class="QflowObjectItem" data-id="{html.escape(i)}"><span>{html.escape(label)}</span></div>'
+        for i, label in pairs
+    )
+
+
+class FakeBMVSite:
+    """Threaded HTTP server; use as a context manager or start()/stop()."""
+
+    def __init__(self, config: SiteConfig | None = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or SiteConfig()
+        self.requests: Counter[str] = Counter()
+        self._sessions: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def bmv_url(self) -> str:
+        return self.base_url + APPT_PATH
+
+    def start(self) -> "FakeBMVSite":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeBMVSite":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def expire_sessions(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+
+    # ── Screens ──────────────────────────────────────────────────────────────
+
+    def welcome(self, token: str) -> bytes:
+        return _page("Welcome", "welcome", token,
+                     "<p>Please read and accept the terms below.</p>" + _items([("agree", "I Agree")]))
+
+    def location(self, token: str) -> bytes:
+        body = (_items([(f"loc-{i}", f"{o} BMV") for i, o in enumerate(OFFICES)])
+                + '\n<button type="submit" class="next-button">Next</button>')
+        return _page("Location", "location", token, body)
+
+    def service(self, token: str) -> bytes:
+        return _page("Service", "service", token,
+                     _items([(f"office-{i}", f"{o} Appts") for i, o in enumerate(OFFICES)]))
+
+    def appointment_type(self, token: str, office_idx: int) -> bytes:
+        items = [(f"type-{office_idx}-{i}", t) for i, t in enumerate(APPOINTMENT_TYPES)]
+        return _page("Appointment Type", "appointment_type", token, _items(items))
+
+    def date_time(self, token: str, office: str, appt_type: str = APPOINTMENT_TYPES[0]) -> bytes:
+        slots = _slot_strings(office, self.config, datetime.now().date(), appt_type)
+        body = "<h2>Choose a Date &amp; Time</h2>\n" + "\n".join(
+            f'<div class="ServiceAppointmentDateTime" data-datetime="{s}">{s}</div>' for s in slots
+        )
+        return _page("Date & Time", "date_time", token, body)
+
+    # ── HTTP plumbing ────────────────────────────────────────────────────────
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # headers + body go out as separate writes
+
+            def log_message(self, *args):  # quiet
+                pass
+
+            def _send(self, status: int, body: bytes, ctype: str = "text/html; charset=utf-8",
+                      cookie: str | None = None) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                if ctype.startswith("text/css") or ctype.startswith("application/javascript"):
+                    self.send_header("ETag", f'"{hashlib.md5(body).hexdigest()[:16]}"')
+                    self.send_header("Cache-Control", "max-age=3600")
+                if cookie:
+                    self.send_header("Set-Cookie", f"{COOKIE}={cookie}; Path=/; HttpOnly")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _delay_or_fail(self) -> bool:
+                cfg = site.config
+                delay = cfg.latency_ms + random.uniform(0, cfg.latency_jitter_ms)
+                if delay > 0:
+                    time.sleep(delay / 1000)
+                if cfg.failure_rate and random.random() < cfg.failure_rate:
+                    self._send(500, b"<h1>Service Unavailable</h1>")
+                    return True
+                return False
+
+            def _session(self) -> str | None:
+                jar = SimpleCookie(self.headers.get("Cookie", ""))
+                sid = jar[COOKIE].value if COOKIE in jar else None
+                with site._lock:
+                    created = site._sessions.get(sid) if sid else None
+                if created is None or time.time() - created > site.config.session_ttl:
+                    return None
+                return sid
+
+            def do_GET(self):
+                site.requests[f"GET {self.path.split('?')[0]}"] += 1
+                if self.path.startswith("/static/"):
+                    name = self.path.split("?")[0].rsplit("/", 1)[-1]
+                    assets = {"site.css": (CSS, "text/css"), "site.js": (JS, "application/javascript"),
+                              "logo.png": (PNG, "image/png")}
+                    if name not in assets:
+                        return self._send(404, b"not found")
+                    body, ctype = assets[name]
+                    if self.headers.get("If-None-Match") == f'"{hashlib.md5(body).hexdigest()[:16]}"':
+                        site.requests["304"] += 1
+                        self.send_response(304)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    return self._send(200, body, ctype)
+                if self._delay_or_fail():
+                    return
+                if self.path.startswith(APPT_PATH):
+                    sid = uuid.uuid4().hex
+                    with site._lock:
+                        site._sessions[sid] = time.time()
+                    return self._send(200, site.welcome(sid[:16]), cookie=sid)
+                if self.path.startswith("/Appointment/Next"):
+                    if self._session() is None:
+                        return self._send(200, site.welcome("expired"))
+                    return self._send(200, site.service("restored"))
+                self._send(404, b"not found")
+
+            def do_POST(self):
+                site.requests[f"POST {self.path}"] += 1
+                length = int(self.headers.get("Content-Length") or 0)
+                form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+                if self._delay_or_fail():
+                    return
+                if self._session() is None:
+                    # Expired / missing session: Qflow drops you back on the welcome screen
+                    return self._send(200, site.welcome("expired"))
+
+                step, item = form.get("Step"), form.get(ITEM_FIELD, "")
+                token = form.get("__RequestVerificationToken", "")
+                if step == "welcome" and item == "agree":
+                    return self._send(200, site.location(token))
+                if step == "location":
+                    return self._send(200, site.service(token))
+                if step == "service" and item.startswith("office-"):
+                    return self._send(200, site.appointment_type(token, int(item.split("-")[1])))
+                if step == "appointment_type" and item.startswith("type-"):
+                    _, office_idx, type_idx = item.split("-")
+                    return self._send(200, site.date_time(token, OFFICES[int(office_idx)],
+                                                          APPOINTMENT_TYPES[int(type_idx)]))
+                self._send(400, b"<h1>Unexpected form post</h1>")
+
+        return Handler
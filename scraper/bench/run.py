@@ -0,0 +1,281 @@
+"""
+End-to-end scraper benchmark against the local BMV stand-in.
+
+Run from scraper/:
+
+  python -m bench.run                                # 3 sweeps, defaults
+  python -m bench.run --engine http --sweeps 5       # browserless fast path only
+  python -m bench.run --types 4                      # every appointment type per office
+  python -m bench.run --workers 3                    # offices split between 3 lease holders
+  python -m bench.run --latency-ms 80 --failure-rate 0.05 --json bench.json
+
+Each sweep is one main() call over all 13 offices, with FakeBMVSite standing in
+for cxmflow and FakeSupabase for the DB. Sweep 1 is cold (empty DB, nothing
+cached); later sweeps see the same slots and exercise the unchanged paths.
+With --workers N, N lease holders (each with its own cache, writer and
+LeaseManager, against bench/fake_leases.py) claim their share of the offices
+before each sweep and scrape them concurrently.
+Reports sweep wall time, per-step latency (avg / p95), peak RSS of this
+process and of its whole tree (driver + Chromium), DB round trips per
+table/op, site requests and Playwright IPC messages.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+# Settings the scraper reads at import time
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "bench")
+os.environ.setdefault("HOST_MIN_INTERVAL", "0")
+os.environ.setdefault("RESEND_API_KEY", "")
+
+from bench import fake_leases
+from bench.fake_db import FakeSupabase
+from bench.fake_site import APPOINTMENT_TYPES, FakeBMVSite, SiteConfig
+
+
+def _p95(values: list[float]) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=20, method="inclusive")[18]
+
+
+class _IpcCounter:
+    """Counts Playwright driver messages by method while installed."""
+
+    def __init__(self):
+        self.calls: Counter[str] = Counter()
+        self._original = None
+
+    def install(self) -> None:
+        try:
+            from playwright._impl._connection import Channel
+        except ImportError:
+            return
+        original = self._original = Channel.send
+        calls = self.calls
+
+        async def send(channel, method, *args, **kwargs):
+            calls[method] += 1
+            return await original(channel, method, *args, **kwargs)
+
+        Channel.send = send
+
+    def uninstall(self) -> None:
+        if self._original is not None:
+            from playwright._impl._connection import Channel
+            Channel.send = self._original
+
+
+def _increment_slot_stats(fake_db: FakeSupabase, deltas: list[dict]) -> list[dict]:
+    """Python twin of the increment_slot_stats SQL function."""
+    rows = fake_db.tables.setdefault("slot_stats", [])
+    for d in deltas:
+        key = (d["office"], d["appointment_type"], d["metric"])
+        row = next((r for r in rows if (r["office"], r["appointment_type"], r["metric"]) == key), None)
+        if row is None:
+            rows.append(dict(d))
+            continue
+        row["buckets"] = [a + b for a, b in zip(row["buckets"], d["buckets"])]
+        row["total"] += d["total"]
+        row["sum_seconds"] += d["sum_seconds"]
+    return []
+
+
+def _publish_public_snapshot(fake_db: FakeSupabase, p_payload: dict, p_checksum: str) -> int | None:
+    """Python twin of the publish_public_snapshot SQL function."""
+    rows = fake_db.tables.setdefault("public_snapshot", [])
+    if not rows:
+        rows.append({"id": 1, "version": 0, "payload": {}, "checksum": None})
+    row = rows[0]
+    if row["checksum"] == p_checksum:
+        return None
+    row.update(version=row["version"] + 1, payload=p_payload, checksum=p_checksum)
+    return row["version"]
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def bench(args: argparse.Namespace) -> dict:
+    import main
+    import db
+    from browser_pool import BrowserPool, _process_tree_rss_mb
+    from state_cache import SlotStateCache
+    from alerts import AlertDispatcher
+    from subscribers import SubscriberCache
+    from journal import WriteJournal
+    from writer import SlotWriter
+    from leases import LeaseManager
+
+    config = SiteConfig(
+        slots_per_office=args.slots,
+        golden_slots_per_office=args.golden,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_ms / 4,
+        failure_rate=args.failure_rate,
+    )
+    fake_db = FakeSupabase()
+    fake_db.register_rpc("increment_slot_stats", _increment_slot_stats)
+    fake_db.register_rpc("publish_public_snapshot", _publish_public_snapshot)
+    fake_leases.install(fake_db)
+    fake_db.tables["email_subscribers"] = [
+        {"id": "bench-sub", "email": "bench@example.com", "active": True, "offices": [],
+         "updated_at": "2026-01-01T00:00:00+00:00"},
+    ]
+
+    live_url = main.BMV_URL
+    main.SCRAPE_ENGINE = args.engine
+    main.SCRAPE_CONCURRENCY = args.concurrency
+    live_types = main.APPOINTMENT_TYPES
+    main.APPOINTMENT_TYPES = APPOINTMENT_TYPES[:args.types]
+    db.get_client = lambda: fake_db
+
+    ipc = _IpcCounter()
+    ipc.install()
+    pool = BrowserPool()
+    # No RESEND_API_KEY: subscribers are looked up but nothing is queued or sent
+    dispatcher = AlertDispatcher()
+    subscriber_cache = SubscriberCache()
+    journal_dir = tempfile.mkdtemp(prefix="bmv-bench-")
+    workers = []
+    for i in range(args.workers):
+        cache = SlotStateCache()
+        leases = None
+        if args.workers > 1:
+            # Claimed explicitly before each sweep rather than on a timer
+            leases = LeaseManager(main.OFFICES, holder=f"bench-{i + 1}", renew_every=3600, claim_every=3600)
+            leases.db_client = fake_db
+        writer = SlotWriter(cache, main.OFFICES, dispatcher, subscriber_cache,
+                            journal=WriteJournal(os.path.join(journal_dir, f"journal-{i + 1}.sqlite3")),
+                            appointment_types=main.APPOINTMENT_TYPES, leases=leases)
+        workers.append((leases, {
+            "pool": pool,
+            "cache": cache,
+            "dispatcher": dispatcher,
+            "subscriber_cache": subscriber_cache,
+            "writer": writer,
+        }))
+
+    async def run_sweep() -> list[dict]:
+        if args.workers == 1:
+            return await main.main(**workers[0][1])
+        runs = await asyncio.gather(*(
+            main.main(offices=leases.held, **resources) for leases, resources in workers if leases.held
+        ))
+        return [s for summaries in runs for s in summaries]
+
+    sweeps = []
+    peak_tree_mb = 0.0
+    with FakeBMVSite(config) as site:
+        main.BMV_URL = site.bmv_url
+        try:
+            for n in range(1, args.sweeps + 1):
+                # Two rounds, so early claimers hand back what's over their share
+                for _ in range(2 if n == 1 else 1):
+                    for leases, _resources in workers:
+                        if leases is not None:
+                            await leases.claim()
+                fake_db.reset_counts()
+                site.requests.clear()
+                ipc.calls.clear()
+                started = time.perf_counter()
+                summaries = await run_sweep()
+                wall = time.perf_counter() - started
+
+                steps: dict[str, list[float]] = {}
+                for s in summaries:
+                    for step, ms in (s.get("timings") or {}).items():
+                        steps.setdefault(step, []).append(ms)
+                # This process + Playwright driver + Chromium, sampled with the browser still up
+                peak_tree_mb = max(peak_tree_mb, _process_tree_rss_mb(os.getpid()))
+
+                sweeps.append({
+                    "sweep": n,
+                    "leases": {l.holder: len(l.held) for l, _r in workers if l is not None},
+                    "wall_s": round(wall, 3),
+                    "offices": len(summaries),
+                    "errors": sum(1 for s in summaries if s["error"]),
+                    "engines": dict(Counter(s.get("engine", "none") for s in summaries)),
+                    "golden": sum(s["golden"] for s in summaries),
+                    "new_golden": sum(len(s["new_golden"]) for s in summaries),
+                    "steps_ms": {
+                        k: {"avg": round(statistics.fmean(v), 1), "p95": round(_p95(v), 1), "n": len(v)}
+                        for k, v in steps.items()
+                    },
+                    "db_calls": dict(fake_db.calls),
+                    "db_total": fake_db.total_calls,
+                    "site_requests": sum(site.requests.values()),
+                    "ipc_messages": sum(ipc.calls.values()),
+                })
+        finally:
+            for leases, resources in workers:
+                await resources["writer"].close()
+                resources["writer"].journal.close()
+                if leases is not None:
+                    await leases.close()
+            shutil.rmtree(journal_dir, ignore_errors=True)
+            await dispatcher.close()
+            await pool.close()
+            ipc.uninstall()
+            main.BMV_URL = live_url
+            main.APPOINTMENT_TYPES = live_types
+
+    return {
+        "config": vars(args),
+        "sweeps": sweeps,
+        "peak_rss_mb": round(_rss_mb(), 1),
+        "peak_tree_rss_mb": round(peak_tree_mb, 1),
+    }
+
+
+def report(result: dict) -> None:
+    print(f"\n{'='*60}\nBenchmark — {result['config']}\n{'='*60}")
+    for s in result["sweeps"]:
+        print(f"Sweep {s['sweep']}: {s['wall_s']:.2f}s  offices={s['offices']} errors={s['errors']} "
+              f"engines={s['engines']} golden={s['golden']} new={s['new_golden']}")
+        if s["leases"]:
+            print("    Leases: " + " ".join(f"{k}={v}" for k, v in s["leases"].items()))
+        for step, v in s["steps_ms"].items():
+            print(f"    {step:<18} avg {v['avg']:>8.1f}ms  p95 {v['p95']:>8.1f}ms  (n={v['n']})")
+        print(f"    DB round trips: {s['db_total']}  "
+              + " ".join(f"{k}={v}" for k, v in sorted(s["db_calls"].items())))
+        print(f"    Site requests: {s['site_requests']}  Playwright IPC messages: {s['ipc_messages']}")
+    print(f"Peak RSS: scraper {result['peak_rss_mb']} MB, process tree incl. browser {result['peak_tree_rss_mb']} MB")
+    print(f"{'='*60}\n")
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark the scraper against a local BMV stand-in")
+    p.add_argument("--slots", type=int, default=60, help="slots per office")
+    p.add_argument("--golden", type=int, default=4, help="golden slots per office")
+    p.add_argument("--latency-ms", type=float, default=0.0, help="added to every site response")
+    p.add_argument("--failure-rate", type=float, default=0.0, help="fraction of site requests that 500")
+    p.add_argument("--engine", choices=["auto", "http", "browser"], default="auto")
+    p.add_argument("--concurrency", type=int, default=3)
+    p.add_argument("--types", type=int, default=1, choices=range(1, len(APPOINTMENT_TYPES) + 1),
+                   help="appointment types scraped per office")
+    p.add_argument("--workers", type=int, default=1, help="lease-holding workers sharing the offices")
+    p.add_argument("--sweeps", type=int, default=3)
+    p.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    return p.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    result = asyncio.run(bench(args))
+    report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2, default=str)
+    sys.exit(1 if any(s["errors"] for s in result["sweeps"]) else 0)
@@ -0,0 +1,227 @@
+"""
+Long-lived Chromium pool for the scraper.
+One browser is shared by every office (and, under runner.py, every run).
+Each office gets a fresh context; the browser itself is recycled after
+BROWSER_RECYCLE_PAGES contexts, when its process tree passes BROWSER_MAX_RSS_MB,
+or when it crashes / disconnects.
+Every context gets the pool's ResourcePolicy (blocked assets, shared on-disk
+JS/CSS cache) unless RESOURCE_POLICY=false.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from playwright.async_api import async_playwright, Browser, BrowserContext, Playwright
+
+from resource_policy import RESOURCE_POLICY, ResourcePolicy
+
+BROWSER_RECYCLE_PAGES = int(os.environ.get("BROWSER_RECYCLE_PAGES", "200"))
+BROWSER_MAX_RSS_MB = int(os.environ.get("BROWSER_MAX_RSS_MB", "1024"))
+
+USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+VIEWPORT = {"width": 1280, "height": 900}
+
+# Flags that keep Chromium lean on a small container
+LAUNCH_ARGS = ["--disable-dev-shm-usage", "--disable-gpu", "--no-zygote"]
+
+
+def _process_tree_rss_mb(root_pid: int) -> float:
+    """
+    Sum RSS (MB) of root_pid and all its descendants by walking /proc.
+    Chromium runs under the Playwright driver, which runs under us, so
+    passing os.getpid() covers the whole browser tree.
+    Returns 0.0 where /proc isn't available.
+    """
+    try:
+        children: dict[int, list[int]] = {}
+        rss_kb: dict[int, int] = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            pid = int(entry)
+            try:
+                with open(f"/proc/{pid}/status") as f:
+                    ppid, rss = 0, 0
+                    for line in f:
+                        if line.startswith("PPid:"):
+                            ppid = int(line.split()[1])
+                        elif line.startswith("VmRSS:"):
+                            rss = int(line.split()[1])
+            except (OSError, ValueError, IndexError):
+                continue
+            children.setdefault(ppid, []).append(pid)
+            rss_kb[pid] = rss
+    except OSError:
+        return 0.0
+
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss_kb.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total / 1024
+
+
+class BrowserPool:
+    """
+    Hands out fresh BrowserContexts from a shared Chromium instance.
+
+    Usage:
+        pool = BrowserPool()
+        async with pool.context() as ctx:
+            page = await ctx.new_page()
+            ...
+        await pool.close()
+    """
+
+    def __init__(
+        self,
+        recycle_pages: int = BROWSER_RECYCLE_PAGES,
+        max_rss_mb: int = BROWSER_MAX_RSS_MB,
+        policy: ResourcePolicy | None = None,
+    ):
+        self.recycle_pages = recycle_pages
+        self.max_rss_mb = max_rss_mb
+        self.policy = policy if policy is not None else (ResourcePolicy() if RESOURCE_POLICY else None)
+
+        self._playwright: Playwright | None = None
+        self._browser: Browser | None = None
+        self._served = 0                       # contexts handed out by current browser
+        self._active: dict[Browser, int] = {}  # open contexts per browser (incl. retiring ones)
+        self._retiring: set[Browser] = set()
+        self._lock = asyncio.Lock()
+
+        self.stats = {"launches": 0, "reuses": 0, "recycles": 0, "crashes": 0}
+
+    # ── Browser lifecycle ────────────────────────────────────────────────────
+
+    async def _launch(self) -> Browser:
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        browser = await self._playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+        browser.on("disconnected", lambda b: self._on_disconnected(b))
+        self._active[browser] = 0
+        self._served = 0
+        self.stats["launches"] += 1
+        print(f"  [pool] launched browser #{self.stats['launches']}", flush=True)
+        return browser
+
+    def _on_disconnected(self, browser: Browser) -> None:
+        if browser is self._browser:
+            self.stats["crashes"] += 1
+            self._browser = None
+            print("  [pool] browser disconnected — will relaunch", flush=True)
+        self._retiring.discard(browser)
+        self._active.pop(browser, None)
+
+    async def _retire(self, browser: Browser) -> None:
+        """Stop handing out this browser; close it once its last context is done."""
+        if browser is self._browser:
+            self._browser = None
+        self.stats["recycles"] += 1
+        if self._active.get(browser, 0) == 0:
+            await self._close_browser(browser)
+        else:
+            self._retiring.add(browser)
+
+    async def _close_browser(self, browser: Browser) -> None:
+        self._retiring.discard(browser)
+        self._active.pop(browser, None)
+        try:
+            await browser.close()
+        except Exception as e:
+            print(f"  [pool] close failed (ignored): {e}", flush=True)
+
+    def _needs_recycle(self) -> str | None:
+        if self.recycle_pages and self._served >= self.recycle_pages:
+            return f"served {self._served} contexts"
+        if self.max_rss_mb:
+            rss = _process_tree_rss_mb(os.getpid())
+            if rss > self.max_rss_mb:
+                return f"RSS {rss:.0f} MB > {self.max_rss_mb} MB"
+        return None
+
+    async def _acquire_browser(self) -> Browser:
+        async with self._lock:
+            browser = self._browser
+            if browser is not None and not browser.is_connected():
+                self._on_disconnected(browser)
+                browser = None
+
+            if browser is not None:
+                reason = self._needs_recycle()
+                if reason:
+                    print(f"  [pool] recycling browser ({reason})", flush=True)
+                    await self._retire(browser)
+                    browser = None
+
+            if browser is None:
+                browser = self._browser = await self._launch()
+            else:
+                self.stats["reuses"] += 1
+
+            self._served += 1
+            self._active[browser] = self._active.get(browser, 0) + 1
+            return browser
+
+    async def _release_browser(self, browser: Browser) -> None:
+        async with self._lock:
+            if browser in self._active:
+                self._active[browser] -= 1
+            if browser in self._retiring and self._active.get(browser, 0) <= 0:
+                await self._close_browser(browser)
+
+    # ── Public API ───────────────────────────────────────────────────────────
+
+    @asynccontextmanager
+    async def context(self, **kwargs) -> AsyncIterator[BrowserContext]:
+        """Yield a fresh, isolated context. Closed (and the browser released) on exit."""
+        browser = await self._acquire_browser()
+        ctx = None
+        try:
+            if self.policy is not None:
+                # Service workers would fetch outside page.route()
+                kwargs.setdefault("service_workers", "block")
+            ctx = await browser.new_context(
+                user_agent=USER_AGENT,
+                viewport=VIEWPORT,
+                **kwargs,
+            )
+            if self.policy is not None:
+                await self.policy.install(ctx)
+            yield ctx
+        except Exception:
+            # A dead browser surfaces as an exception here; make sure the next
+            # caller gets a new one instead of the same corpse.
+            if not browser.is_connected():
+                async with self._lock:
+                    self._on_disconnected(browser)
+            raise
+        finally:
+            if ctx is not None:
+                try:
+                    await ctx.close()
+                except Exception:
+                    pass
+            await self._release_browser(browser)
+
+    def report(self) -> str:
+        s = self.stats
+        line = (f"launches={s['launches']} reuses={s['reuses']} "
+                f"recycles={s['recycles']} crashes={s['crashes']}")
+        if self.policy is not None:
+            line += f" | assets: {self.policy.report()}"
+        return line
+
+    async def close(self) -> None:
+        async with self._lock:
+            self._browser = None
+            for browser in list(self._active):
+                await self._close_browser(browser)
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
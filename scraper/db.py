@@ -2,15 +2,26 @@
 Supabase DB operations for the Maine BMV scraper.
 Uses the service_role key so it can write past RLS.
 """
+import functools
 import os
+import re
+from dataclasses import dataclass, field
 from datetime import date, datetime, timezone
 from supabase import create_client, Client
 
+import metrics
+
 SUPABASE_URL = os.environ["SUPABASE_URL"]
 SUPABASE_KEY = os.environ["SUPABASE_SERVICE_KEY"]
 
 BOOK_URL = "https://mainebmvappt.cxmflow.com/Appointment/Index/2c052fc7-571f-4b76-9790-7e91f103c408"
 GOLDEN_THRESHOLD_DAYS = 8
+DEFAULT_APPOINTMENT_TYPE = "Driver's License"
+# A live golden slot missing from a scrape is only marked gone once it has been
+# missed this many scrapes in a row, or was first missed this long ago (which
+# caps the hold when GONE_AFTER_MISSES is raised or an office is scraped rarely).
+GONE_AFTER_MISSES = int(os.environ.get("GONE_AFTER_MISSES", "2"))
+GONE_AFTER_SECONDS = int(os.environ.get("GONE_AFTER_SECONDS", "3600"))
 
 
 def get_client() -> Client:
@@ -21,159 +32,438 @@ def now_utc() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-def upsert_golden_slot(db: Client, office: str, appt_date: date, appt_time: str) -> bool:
-    """
-    Insert or refresh a golden slot (<8 days away).
-    Returns True if this is a brand-new slot (triggers alert).
-    """
-    date_str = appt_date.isoformat()
-    now = now_utc()
+_FRACTION_RE = re.compile(r"\.(\d+)")
+
+
+def parse_ts(value: str) -> datetime:
+    """Postgres timestamptz text → aware datetime (3.10's fromisoformat wants 0/3/6 fraction digits)."""
+    value = value.replace("Z", "+00:00").replace(" ", "T", 1)
+    value = _FRACTION_RE.sub(lambda m: "." + m.group(1)[:6].ljust(6, "0"), value, count=1)
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _op(name: str, calls: int | None = 1):
+    """Time a DB operation into bmv_db_seconds and count its round trips (None: it counts its own)."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with metrics.span("bmv_db_seconds", op=name):
+                result = fn(*args, **kwargs)
+            if calls:
+                metrics.inc("bmv_db_calls_total", calls, op=name)
+            return result
+        return inner
+    return wrap
+
 
-    # Check if this exact slot already exists
-    existing = (
+@dataclass
+class OfficeState:
+    """What the DB currently shows as live for one office and appointment type."""
+    golden: dict[tuple[str, str], str] = field(default_factory=dict)  # (date, time) → id of available golden row
+    future: tuple[str, str] | None = None                              # (date, id) of current closest future row
+    appeared: dict[tuple[str, str], str] = field(default_factory=dict)  # (date, time) → when it (re)appeared
+    # live slots the last scrapes missed → (misses in a row, first missed at). The first-miss
+    # time is kept in appointments.missed_since; a state loaded from the DB counts one miss.
+    misses: dict[tuple[str, str], tuple[int, str]] = field(default_factory=dict)
+
+
+@dataclass
+class ReconcileResult:
+    new_golden: list[tuple[str, str]]   # (date, time) slots to alert on (brand new or reappeared)
+    gone_golden: list[tuple[str, str]]
+    state: OfficeState                  # state after the writes
+    calls: int                          # DB round trips used
+    gone_appeared: dict[tuple[str, str], str] = field(default_factory=dict)  # gone slot → when it appeared
+    at: str = ""                        # timestamp the writes used
+    held_golden: list[tuple[str, str]] = field(default_factory=list)  # missed, but not gone yet
+    gone_since: dict[tuple[str, str], str] = field(default_factory=dict)  # gone slot → first scrape that missed it
+
+
+GOLDEN_CONFLICT_KEY = "office,appointment_type,appointment_date,appointment_time,slot_type"
+
+
+def _add_live_row(state: OfficeState, row: dict) -> None:
+    if row["slot_type"] == "golden":
+        key = (row["appointment_date"], row["appointment_time"])
+        state.golden[key] = row["id"]
+        state.appeared[key] = row["first_seen_at"]
+        if row.get("missed_since"):
+            state.misses[key] = (1, row["missed_since"])
+    elif row["is_current_closest"]:
+        state.future = (row["appointment_date"], row["id"])
+
+
+@_op("load_office_state")
+def load_office_state(db: Client, office: str, appointment_type: str = DEFAULT_APPOINTMENT_TYPE) -> OfficeState:
+    """One query: every available golden row plus the current-closest future row."""
+    rows = (
         db.table("appointments")
-        .select("id, available, first_seen_at")
+        .select("id, slot_type, appointment_date, appointment_time, is_current_closest, first_seen_at, missed_since")
         .eq("office", office)
-        .eq("appointment_date", date_str)
-        .eq("appointment_time", appt_time)
-        .eq("slot_type", "golden")
+        .eq("appointment_type", appointment_type)
+        .eq("available", True)
         .execute()
-    )
+    ).data
 
-    if existing.data:
-        row = existing.data[0]
-        # Update last_seen and ensure available=true (it might have reappeared)
-        db.table("appointments").update({
-            "last_seen_at": now,
-            "available": True,
-        }).eq("id", row["id"]).execute()
-        # It's "new" if it was previously marked unavailable (reappeared)
-        return not row["available"]
-    else:
-        # New slot
-        db.table("appointments").insert({
-            "office": office,
-            "appointment_type": "Driver's License",
-            "appointment_date": date_str,
-            "appointment_time": appt_time,
+    state = OfficeState()
+    for row in rows:
+        _add_live_row(state, row)
+    return state
+
+
+@_op("load_all_office_states")
+def load_all_office_states(
+    db: Client,
+    offices: list[str],
+    appointment_types: list[str] | None = None,
+) -> dict[tuple[str, str], OfficeState]:
+    """
+    Same as load_office_state, for every office and type in one query (cache hydration).
+    Keyed by (office, appointment_type).
+    """
+    appointment_types = appointment_types or [DEFAULT_APPOINTMENT_TYPE]
+    rows = (
+        db.table("appointments")
+        .select("id, office, appointment_type, slot_type, appointment_date, appointment_time, "
+                "is_current_closest, first_seen_at, missed_since")
+        .eq("available", True)
+        .execute()
+    ).data
+
+    return _office_states(rows, offices, appointment_types)
+
+
+def _office_states(
+    rows: list[dict], offices: list[str], appointment_types: list[str],
+) -> dict[tuple[str, str], OfficeState]:
+    states = {(office, t): OfficeState() for office in offices for t in appointment_types}
+    for row in rows:
+        _add_live_row(states.setdefault((row["office"], row["appointment_type"]), OfficeState()), row)
+    return states
+
+
+@dataclass
+class ReconcilePlan:
+    """
+    The writes that bring one office / type in line with a scrape, worked out
+    in memory. Shared by reconcile_office here and its async twin in db_async.
+    """
+    office: str
+    appointment_type: str
+    now: str
+    state: OfficeState                  # live rows before the writes
+    next_state: OfficeState             # filled in by finish() with ids from the writes
+    new_keys: list[tuple[str, str]]
+    gone: dict[tuple[str, str], str]    # key → id
+    gone_since: dict[tuple[str, str], str]  # key → first scrape that missed it
+    held: list[tuple[str, str]]         # missed this scrape, kept live until the gone policy says otherwise
+    missed_ids: list[str]               # held rows missed for the first time: missed_since is set
+    refresh_ids: list[str]
+    future_date: str | None
+    retire_future: tuple[str, dict] | None = None  # (old id, update payload)
+    insert_future: bool = False
+
+    def upsert_rows(self) -> list[dict]:
+        return [{
+            "office": self.office,
+            "appointment_type": self.appointment_type,
+            "appointment_date": d,
+            "appointment_time": t,
             "slot_type": "golden",
             "is_golden": True,
             "is_current_closest": False,
             "available": True,
-            "first_seen_at": now,
-            "last_seen_at": now,
+            "last_seen_at": self.now,
+            "missed_since": None,
+            "book_url": BOOK_URL,
+        } for d, t in self.new_keys]
+
+    def future_row(self) -> dict:
+        return {
+            "office": self.office,
+            "appointment_type": self.appointment_type,
+            "appointment_date": self.future_date,
+            "appointment_time": None,
+            "slot_type": "future",
+            "is_golden": False,
+            "is_current_closest": True,
+            "available": True,
+            "first_seen_at": self.now,
+            "last_seen_at": self.now,
             "book_url": BOOK_URL,
-        }).execute()
+        }
+
+    def refresh_payload(self) -> dict:
+        return {"last_seen_at": self.now, "available": True, "missed_since": None}
+
+    def missed_payload(self) -> dict:
+        return {"missed_since": self.now}
+
+    def gone_updates(self) -> list[tuple[dict, list[str]]]:
+        """(payload, ids) per first-missed time: last_seen_at is when the slot went missing."""
+        by_time: dict[str, list[str]] = {}
+        for key, row_id in self.gone.items():
+            by_time.setdefault(self.gone_since[key], []).append(row_id)
+        return [({"available": False, "last_seen_at": t}, ids) for t, ids in sorted(by_time.items())]
+
+    def finish(self, upserted: list[dict], future_row: dict | None, calls: int) -> ReconcileResult:
+        for row in upserted:
+            key = (row["appointment_date"], row["appointment_time"])
+            self.next_state.golden[key] = row["id"]
+            # A revived row keeps its original first_seen_at; this appearance starts now
+            self.next_state.appeared[key] = self.now
+        if future_row is not None:
+            self.next_state.future = (self.future_date, future_row["id"])
+        return ReconcileResult(
+            new_golden=self.new_keys,
+            gone_golden=sorted(self.gone),
+            state=self.next_state,
+            calls=calls,
+            gone_appeared={k: self.state.appeared[k] for k in self.gone if k in self.state.appeared},
+            at=self.now,
+            held_golden=self.held,
+            gone_since=self.gone_since,
+        )
+
+
+def _is_gone(misses: int, missed_since: str, now: str, gone_after_misses: int, gone_after_seconds: int) -> bool:
+    if misses >= gone_after_misses:
         return True
+    return (parse_ts(now) - parse_ts(missed_since)).total_seconds() >= gone_after_seconds
 
 
-def upsert_future_slot(db: Client, office: str, closest_date: date) -> bool:
+def plan_reconcile(
+    office: str,
+    golden: set[tuple[str, str]],
+    closest_future: date | None,
+    state: OfficeState,
+    appointment_type: str = DEFAULT_APPOINTMENT_TYPE,
+    now: str | None = None,
+    gone_after_misses: int = GONE_AFTER_MISSES,
+    gone_after_seconds: int = GONE_AFTER_SECONDS,
+) -> ReconcilePlan:
     """
-    Track the closest future date (>=8 days) for an office.
-    One active 'current closest' record per office at a time.
-    Returns True if a new record was created.
+    Diff a scrape against the live rows. Pure: no DB access.
+
+    A live golden slot the scrape missed stays live (no write at all) until it
+    has been missed gone_after_misses scrapes in a row or was first missed
+    gone_after_seconds ago, so a page that briefly drops a slot doesn't flip it
+    to gone and back (and re-alert). Both rules count from the first miss, never
+    from last_seen_at: an unchanged scrape is only a heartbeat and doesn't
+    refresh that. The first miss is written to missed_since (and cleared when
+    the slot is seen again), so the rules also hold over freshly loaded states:
+    one-shot runs, cache resyncs, restarts and lease takeovers.
     """
-    date_str = closest_date.isoformat()
-    now = now_utc()
+    now = now or now_utc()
+    gone, gone_since, held, misses, missed_ids = {}, {}, [], {}, []
+    for key, row_id in state.golden.items():
+        if key in golden:
+            continue
+        count, since = state.misses.get(key, (0, now))
+        if _is_gone(count + 1, since, now, gone_after_misses, gone_after_seconds):
+            gone[key] = row_id
+            gone_since[key] = since
+        else:
+            held.append(key)
+            misses[key] = (count + 1, since)
+            if not count:
+                missed_ids.append(row_id)
 
-    # Find current active closest for this office
-    existing = (
-        db.table("appointments")
-        .select("id, appointment_date, available")
-        .eq("office", office)
-        .eq("slot_type", "future")
-        .eq("is_current_closest", True)
-        .execute()
+    live = golden | set(held)
+    plan = ReconcilePlan(
+        office=office,
+        appointment_type=appointment_type,
+        now=now,
+        state=state,
+        next_state=OfficeState(
+            golden={k: i for k, i in state.golden.items() if k in live},
+            appeared={k: t for k, t in state.appeared.items() if k in live},
+            misses=misses,
+        ),
+        new_keys=sorted(golden - state.golden.keys()),
+        gone=gone,
+        gone_since=gone_since,
+        held=sorted(held),
+        missed_ids=missed_ids,
+        refresh_ids=[i for k, i in state.golden.items() if k in golden],
+        future_date=closest_future.isoformat() if closest_future else None,
     )
 
-    if existing.data:
-        row = existing.data[0]
-        existing_date = row["appointment_date"]
-        existing_date_obj = date.fromisoformat(existing_date)
-        today_date = datetime.now(timezone.utc).date()
-
-        if existing_date == date_str:
-            # Same date — just refresh last_seen, ensure available
-            db.table("appointments").update({
-                "last_seen_at": now,
-                "available": True,
-            }).eq("id", row["id"]).execute()
-            return False
-        else:
-            # Different date (closer or further) — existing date is no longer the right answer, retire it.
-            # If new closest is further, existing date was booked and dropped off the BMV site.
-            # If new closest is closer, a better date appeared.
-            # Either way: retire existing, fall through to insert new.
-            db.table("appointments").update({
+    # Future: same date → just refresh; different date or none → retire the old row
+    if state.future:
+        old_date, old_id = state.future
+        if old_date == plan.future_date:
+            plan.refresh_ids.append(old_id)
+            plan.next_state.future = state.future
+        elif plan.future_date:
+            plan.retire_future = (old_id, {
                 "is_current_closest": False,
-                "replaced_at": now,
-                "replaced_by_date": date_str,
+                "replaced_at": plan.now,
+                "replaced_by_date": plan.future_date,
                 "available": False,
-            }).eq("id", row["id"]).execute()
-            # Fall through to insert new
+            })
+        else:
+            plan.retire_future = (old_id, {"available": False, "is_current_closest": False})
+    plan.insert_future = bool(plan.future_date) and plan.next_state.future is None
+    return plan
+
+
+@_op("reconcile_office", calls=None)
+def reconcile_office(
+    db: Client,
+    office: str,
+    golden: set[tuple[str, str]],
+    closest_future: date | None,
+    state: OfficeState | None = None,
+    appointment_type: str = DEFAULT_APPOINTMENT_TYPE,
+) -> ReconcileResult:
+    """
+    Bring one office's rows for one appointment type in line with a scrape,
+    using a constant number of calls.
+
+    golden: (date ISO, "HH:MM:SS") keys seen this scrape.
+    closest_future: earliest date >= the golden threshold, or None.
+    state: current live rows; loaded with one SELECT when not supplied.
+
+    Diffs in memory (plan_reconcile), then writes in bulk:
+      - new golden   → one upsert on uq_golden_slot (a reappearing row is revived in place,
+                       first_seen_at kept because it's left out of the payload)
+      - still there  → one UPDATE ... WHERE id IN (...), shared with an unchanged future row
+      - first missed → one UPDATE ... WHERE id IN (...) setting missed_since
+      - gone golden  → one UPDATE ... WHERE id IN (...) per first-missed time, once the miss / age policy
+                       (GONE_AFTER_MISSES / GONE_AFTER_SECONDS) agrees it's gone
+      - future date changed → retire old row + insert new one
+    """
+    calls = 0
+    loaded = state is None
+    if loaded:
+        state = load_office_state(db, office, appointment_type)  # counted under its own op
+        calls += 1
+    plan = plan_reconcile(office, golden, closest_future, state, appointment_type)
+
+    upserted: list[dict] = []
+    if plan.new_keys:
+        upserted = (
+            db.table("appointments")
+            .upsert(plan.upsert_rows(), on_conflict=GOLDEN_CONFLICT_KEY, default_to_null=False)
+            .execute()
+        ).data
+        calls += 1
+
+    if plan.retire_future:
+        old_id, payload = plan.retire_future
+        db.table("appointments").update(payload).eq("id", old_id).execute()
+        calls += 1
+
+    future_row = None
+    if plan.insert_future:
+        future_row = db.table("appointments").insert(plan.future_row()).execute().data[0]
+        calls += 1
+
+    if plan.refresh_ids:
+        db.table("appointments").update(plan.refresh_payload()).in_("id", plan.refresh_ids).execute()
+        calls += 1
+
+    if plan.missed_ids:
+        db.table("appointments").update(plan.missed_payload()).in_("id", plan.missed_ids).execute()
+        calls += 1
+
+    for payload, ids in plan.gone_updates():
+        db.table("appointments").update(payload).in_("id", ids).execute()
+        calls += 1
 
-    # Insert new closest-future record
-    db.table("appointments").insert({
+    metrics.inc("bmv_db_calls_total", calls - int(loaded), op="reconcile_office")
+    return plan.finish(upserted, future_row, calls)
+
+
+@_op("mark_office_checked")
+def mark_office_checked(
+    db: Client,
+    office: str,
+    golden_count: int = 0,
+    future_count: int = 0,
+    appointment_type: str = DEFAULT_APPOINTMENT_TYPE,
+) -> None:
+    """
+    Heartbeat for one office and appointment type: a single-row upsert into office_status.
+    (Used to touch last_checked_at on every appointments row the office ever had,
+    which grew with history and fanned out a realtime event per row.)
+    """
+    db.table("office_status").upsert({
         "office": office,
-        "appointment_type": "Driver's License",
-        "appointment_date": date_str,
-        "appointment_time": None,
-        "slot_type": "future",
-        "is_golden": False,
-        "is_current_closest": True,
-        "available": True,
-        "first_seen_at": now,
-        "last_seen_at": now,
-        "book_url": BOOK_URL,
-    }).execute()
-    return True
-
-
-def mark_golden_gone(db: Client, office: str, still_available: set[tuple]) -> None:
-    """
-    After scraping an office, mark any previously-available golden slots
-    that were NOT in this scrape as unavailable.
-    still_available: set of (date_str, time_str) tuples
+        "appointment_type": appointment_type,
+        "last_checked_at": now_utc(),
+        "golden_count": golden_count,
+        "future_count": future_count,
+    }, on_conflict="office,appointment_type").execute()
+
+
+@_op("increment_slot_stats")
+def increment_slot_stats(db: Client, deltas: list[dict]) -> None:
     """
-    rows = (
+    Add per-office bucket counts to slot_stats in one call.
+    deltas: [{office, metric, buckets: [int], total, sum_seconds}] (see stats.py).
+    """
+    db.rpc("increment_slot_stats", {"deltas": deltas}).execute()
+
+
+@_op("claim_office_leases")
+def claim_office_leases(db: Client, holder: str, offices: list[str], ttl_seconds: int) -> list[str]:
+    """Renew, take over and rebalance office leases for one worker (see leases.py). Returns what it holds."""
+    rows = db.rpc("claim_office_leases", {
+        "p_holder": holder, "p_offices": offices, "p_ttl_seconds": ttl_seconds,
+    }).execute().data
+    return [row["office"] for row in rows or []]
+
+
+@_op("renew_office_leases")
+def renew_office_leases(db: Client, holder: str, ttl_seconds: int) -> list[str]:
+    """Extend every lease `holder` still has. Returns the offices renewed."""
+    rows = db.rpc("renew_office_leases", {"p_holder": holder, "p_ttl_seconds": ttl_seconds}).execute().data
+    return [row["office"] for row in rows or []]
+
+
+@_op("release_office_leases")
+def release_office_leases(db: Client, holder: str) -> None:
+    db.rpc("release_office_leases", {"p_holder": holder}).execute()
+
+
+@_op("load_public_rows", calls=2)
+def load_public_rows(db: Client) -> tuple[list[dict], list[dict]]:
+    """Everything the public snapshot is built from: live appointment rows and office_status."""
+    slots = (
         db.table("appointments")
-        .select("id, appointment_date, appointment_time")
-        .eq("office", office)
-        .eq("slot_type", "golden")
+        .select("id, office, appointment_type, slot_type, appointment_date, appointment_time, first_seen_at")
         .eq("available", True)
         .execute()
     ).data
-
-    for row in rows:
-        key = (row["appointment_date"], row["appointment_time"])
-        if key not in still_available:
-            db.table("appointments").update({
-                "available": False,
-                "last_seen_at": now_utc(),
-            }).eq("id", row["id"]).execute()
-
-
-def mark_future_gone(db: Client, office: str) -> None:
-    """Call when no future slots were found for an office — retire current closest."""
-    db.table("appointments").update({
-        "available": False,
-        "is_current_closest": False,
-    }).eq("office", office).eq("slot_type", "future").eq("is_current_closest", True).execute()
+    status = (
+        db.table("office_status")
+        .select("office, appointment_type, last_checked_at, golden_count, future_count")
+        .execute()
+    ).data
+    return slots, status
 
 
-def mark_office_checked(db: Client, office: str) -> None:
-    """Update last_checked_at on all rows for this office."""
-    db.table("appointments").update({
-        "last_checked_at": now_utc(),
-    }).eq("office", office).execute()
+@_op("publish_public_snapshot")
+def publish_public_snapshot(db: Client, payload: dict, checksum: str) -> int | None:
+    """
+    Replace the public_snapshot row. Returns the new version, or None when the
+    stored checksum already matched (nothing written, nobody notified).
+    """
+    version = db.rpc("publish_public_snapshot", {"p_payload": payload, "p_checksum": checksum}).execute().data
+    return version
 
 
+@_op("start_scrape_run")
 def start_scrape_run(db: Client) -> str:
     """Insert a scrape_run row and return its ID."""
     result = db.table("scrape_runs").insert({"run_at": now_utc()}).execute()
     return result.data[0]["id"]
 
 
+@_op("finish_scrape_run")
 def finish_scrape_run(
     db: Client,
     run_id: str,
@@ -181,28 +471,68 @@ def finish_scrape_run(
     golden_found: int,
     future_found: int,
     errors: list,
+    timings: dict | None = None,
 ) -> None:
+    """timings: metrics.run_breakdown() for this run, stored as jsonb."""
     db.table("scrape_runs").update({
         "completed_at": now_utc(),
         "offices_scraped": offices_scraped,
         "golden_slots_found": golden_found,
         "future_slots_found": future_found,
         "errors": errors,
+        "timings": timings,
     }).eq("id", run_id).execute()
 
 
-def get_active_subscribers(db: Client, office: str) -> list[str]:
-    """Return emails of subscribers who want alerts for this office (or all offices)."""
+@dataclass
+class SubscriberIndex:
+    """Active subscribers keyed by office; "all offices" subscribers kept separately."""
+    by_office: dict[str, list[str]]
+    all_offices: list[str]
+    marker: str | None = None
+
+    def for_office(self, office: str) -> list[str]:
+        specific = self.by_office.get(office, [])
+        if not specific:
+            return self.all_offices
+        return list(dict.fromkeys(self.all_offices + specific))
+
+
+@_op("load_subscriber_index")
+def load_subscriber_index(db: Client) -> SubscriberIndex:
+    """One read of the active subscriber list, bucketed by office."""
     rows = (
         db.table("email_subscribers")
         .select("email, offices")
         .eq("active", True)
         .execute()
     ).data
+    return _subscriber_index(rows)
+
 
-    result = []
+def _subscriber_index(rows: list[dict]) -> SubscriberIndex:
+    index = SubscriberIndex(by_office={}, all_offices=[])
     for row in rows:
         offices = row.get("offices") or []
-        if not offices or office in offices:
-            result.append(row["email"])
-    return result
+        if not offices:
+            index.all_offices.append(row["email"])
+        for office in offices:
+            index.by_office.setdefault(office, []).append(row["email"])
+    return index
+
+
+@_op("subscriber_change_marker")
+def subscriber_change_marker(db: Client) -> str:
+    """
+    Cheap "has anything changed?" probe: row count + newest updated_at
+    (bumped by a trigger on every insert/update of email_subscribers).
+    """
+    result = (
+        db.table("email_subscribers")
+        .select("updated_at", count="exact")
+        .order("updated_at", desc=True)
+        .limit(1)
+        .execute()
+    )
+    newest = result.data[0]["updated_at"] if result.data else ""
+    return f"{result.count}:{newest}"
@@ -0,0 +1,294 @@
+"""
+Async twin of db.py, on one pooled keep-alive HTTP/2 connection to PostgREST.
+
+db.py goes through the synchronous supabase Client, so every .execute()
+blocks the thread it runs on. AsyncDB sends the same requests to the same
+REST endpoints from one httpx.AsyncClient, so DB I/O overlaps with scraping
+on the event loop instead of queueing behind it:
+
+  - the same operations and return types as db.py; the reconcile diff is
+    shared (db.plan_reconcile), only the I/O differs
+  - every call takes timeout= in seconds (default DB_TIMEOUT) and raises
+    DBError / httpx.TimeoutException when the request fails or runs over
+  - independent writes are pipelined with asyncio.gather: reconcile_office
+    sends its golden upsert / refresh / gone updates together, and only
+    orders "retire old future row" before "insert new one"
+
+    adb = AsyncDB()
+    state = await adb.load_office_state("Augusta", timeout=5)
+    await adb.close()
+
+Set DB_ASYNC=true to have the SlotWriter use it instead of db.py in a thread.
+"""
+import asyncio
+import functools
+import os
+from datetime import date
+
+import httpx
+
+import db
+import metrics
+from db import (
+    DEFAULT_APPOINTMENT_TYPE, GOLDEN_CONFLICT_KEY, OfficeState, ReconcileResult, SubscriberIndex,
+    _add_live_row, _office_states, _subscriber_index, now_utc, plan_reconcile,
+)
+
+DB_ASYNC = os.environ.get("DB_ASYNC", "false").lower() == "true"
+DB_TIMEOUT = float(os.environ.get("DB_TIMEOUT", "15"))
+DB_HTTP2 = os.environ.get("DB_HTTP2", "true").lower() == "true"
+DB_MAX_CONNECTIONS = int(os.environ.get("DB_MAX_CONNECTIONS", "10"))
+
+
+class DBError(Exception):
+    """PostgREST answered with an error status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+def _aop(name: str, calls: int | None = 1):
+    """db._op for coroutines: time into bmv_db_seconds, count round trips (None: it counts its own)."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        async def inner(*args, **kwargs):
+            with metrics.span("bmv_db_seconds", op=name):
+                result = await fn(*args, **kwargs)
+            if calls:
+                metrics.inc("bmv_db_calls_total", calls, op=name)
+            return result
+        return inner
+    return wrap
+
+
+# ── PostgREST filter syntax ──────────────────────────────────────────────────
+
+def _literal(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _quoted(value) -> str:
+    """A value inside in.(...) / or=(...), where , . : ( ) are reserved."""
+    text = _literal(value)
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def eq(value) -> str:
+    return f"eq.{_literal(value)}"
+
+
+def in_(values) -> str:
+    return "in.(" + ",".join(_quoted(v) for v in values) + ")"
+
+
+class AsyncDB:
+    def __init__(
+        self,
+        url: str = db.SUPABASE_URL,
+        key: str = db.SUPABASE_KEY,
+        timeout: float = DB_TIMEOUT,
+        http2: bool = DB_HTTP2,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.timeout = timeout
+        self._client = httpx.AsyncClient(
+            base_url=url.rstrip("/") + "/rest/v1/",
+            headers={"apikey": key, "Authorization": f"Bearer {key}"},
+            http2=http2,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=DB_MAX_CONNECTIONS, max_keepalive_connections=DB_MAX_CONNECTIONS),
+            transport=transport,
+        )
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: dict | None = None,
+        json=None,
+        prefer: list[str] | None = None,
+        timeout: float | None = None,
+    ) -> httpx.Response:
+        headers = {"Prefer": ",".join(prefer)} if prefer else None
+        resp = await self._client.request(
+            method, path, params=params, json=json, headers=headers,
+            timeout=self.timeout if timeout is None else timeout,
+        )
+        if resp.status_code >= 400:
+            try:
+                message = resp.json().get("message") or resp.text
+            except ValueError:
+                message = resp.text
+            raise DBError(resp.status_code, message)
+        return resp
+
+    async def _select(self, table: str, params: dict, timeout: float | None = None) -> list[dict]:
+        return (await self._request("GET", table, params=params, timeout=timeout)).json()
+
+    async def _write(
+        self, method: str, table: str, payload, params: dict | None = None,
+        prefer: list[str] | None = None, returning: bool = False, timeout: float | None = None,
+    ) -> list[dict]:
+        prefer = list(prefer or []) + ["return=representation" if returning else "return=minimal"]
+        resp = await self._request(method, table, params=params, json=payload, prefer=prefer, timeout=timeout)
+        return resp.json() if returning else []
+
+    # ── Appointments ─────────────────────────────────────────────────────────
+
+    @_aop("load_office_state")
+    async def load_office_state(
+        self, office: str, appointment_type: str = DEFAULT_APPOINTMENT_TYPE, timeout: float | None = None,
+    ) -> OfficeState:
+        rows = await self._select("appointments", {
+            "select": "id,slot_type,appointment_date,appointment_time,is_current_closest,first_seen_at,missed_since",
+            "office": eq(office),
+            "appointment_type": eq(appointment_type),
+            "available": eq(True),
+        }, timeout)
+        state = OfficeState()
+        for row in rows:
+            _add_live_row(state, row)
+        return state
+
+    @_aop("load_all_office_states")
+    async def load_all_office_states(
+        self, offices: list[str], appointment_types: list[str] | None = None, timeout: float | None = None,
+    ) -> dict[tuple[str, str], OfficeState]:
+        appointment_types = appointment_types or [DEFAULT_APPOINTMENT_TYPE]
+        rows = await self._select("appointments", {
+            "select": "id,office,appointment_type,slot_type,appointment_date,appointment_time,"
+                      "is_current_closest,first_seen_at,missed_since",
+            "available": eq(True),
+        }, timeout)
+        return _office_states(rows, offices, appointment_types)
+
+    @_aop("reconcile_office", calls=None)
+    async def reconcile_office(
+        self,
+        office: str,
+        golden: set[tuple[str, str]],
+        closest_future: date | None,
+        state: OfficeState | None = None,
+        appointment_type: str = DEFAULT_APPOINTMENT_TYPE,
+        timeout: float | None = None,
+    ) -> ReconcileResult:
+        """db.reconcile_office, with its independent writes in flight together."""
+        calls = 0
+        loaded = state is None
+        if loaded:
+            state = await self.load_office_state(office, appointment_type, timeout=timeout)
+            calls += 1
+        plan = plan_reconcile(office, golden, closest_future, state, appointment_type)
+
+        async def upsert_golden() -> list[dict]:
+            return await self._write(
+                "POST", "appointments", plan.upsert_rows(),
+                params={"on_conflict": GOLDEN_CONFLICT_KEY},
+                prefer=["resolution=merge-duplicates", "missing=default"], returning=True, timeout=timeout,
+            )
+
+        async def replace_future() -> dict | None:
+            # uq_current_closest: the old row has to stop being current first
+            if plan.retire_future:
+                old_id, payload = plan.retire_future
+                await self._write("PATCH", "appointments", payload, params={"id": eq(old_id)}, timeout=timeout)
+            if plan.insert_future:
+                rows = await self._write("POST", "appointments", plan.future_row(), returning=True, timeout=timeout)
+                return rows[0]
+            return None
+
+        async def update_ids(payload: dict, ids: list[str]) -> None:
+            await self._write("PATCH", "appointments", payload, params={"id": in_(ids)}, timeout=timeout)
+
+        jobs = {}
+        if plan.new_keys:
+            jobs["upserted"] = upsert_golden()
+        if plan.retire_future or plan.insert_future:
+            jobs["future"] = replace_future()
+        if plan.refresh_ids:
+            jobs["refresh"] = update_ids(plan.refresh_payload(), plan.refresh_ids)
+        if plan.missed_ids:
+            jobs["missed"] = update_ids(plan.missed_payload(), plan.missed_ids)
+        for i, (payload, ids) in enumerate(plan.gone_updates()):
+            jobs[f"gone{i}"] = update_ids(payload, ids)
+        done = dict(zip(jobs, await asyncio.gather(*jobs.values())))
+
+        calls += len(jobs) + int(bool(plan.retire_future and plan.insert_future))
+        metrics.inc("bmv_db_calls_total", calls - int(loaded), op="reconcile_office")
+        return plan.finish(done.get("upserted", []), done.get("future"), calls)
+
+    @_aop("mark_office_checked")
+    async def mark_office_checked(
+        self,
+        office: str,
+        golden_count: int = 0,
+        future_count: int = 0,
+        appointment_type: str = DEFAULT_APPOINTMENT_TYPE,
+        timeout: float | None = None,
+    ) -> None:
+        await self._write("POST", "office_status", {
+            "office": office,
+            "appointment_type": appointment_type,
+            "last_checked_at": now_utc(),
+            "golden_count": golden_count,
+            "future_count": future_count,
+        }, params={"on_conflict": "office,appointment_type"}, prefer=["resolution=merge-duplicates"],
+            timeout=timeout)
+
+    @_aop("increment_slot_stats")
+    async def increment_slot_stats(self, deltas: list[dict], timeout: float | None = None) -> None:
+        await self._request("POST", "rpc/increment_slot_stats", json={"deltas": deltas}, timeout=timeout)
+
+    # ── Scrape runs ──────────────────────────────────────────────────────────
+
+    @_aop("start_scrape_run")
+    async def start_scrape_run(self, timeout: float | None = None) -> str:
+        rows = await self._write("POST", "scrape_runs", {"run_at": now_utc()}, returning=True, timeout=timeout)
+        return rows[0]["id"]
+
+    @_aop("finish_scrape_run")
+    async def finish_scrape_run(
+        self,
+        run_id: str,
+        offices_scraped: int,
+        golden_found: int,
+        future_found: int,
+        errors: list,
+        timings: dict | None = None,
+        timeout: float | None = None,
+    ) -> None:
+        await self._write("PATCH", "scrape_runs", {
+            "completed_at": now_utc(),
+            "offices_scraped": offices_scraped,
+            "golden_slots_found": golden_found,
+            "future_slots_found": future_found,
+            "errors": errors,
+            "timings": timings,
+        }, params={"id": eq(run_id)}, timeout=timeout)
+
+    # ── Subscribers ──────────────────────────────────────────────────────────
+
+    @_aop("load_subscriber_index")
+    async def load_subscriber_index(self, timeout: float | None = None) -> SubscriberIndex:
+        rows = await self._select("email_subscribers", {"select": "email,offices", "active": eq(True)}, timeout)
+        return _subscriber_index(rows)
+
+    @_aop("subscriber_change_marker")
+    async def subscriber_change_marker(self, timeout: float | None = None) -> str:
+        resp = await self._request(
+            "GET", "email_subscribers",
+            params={"select": "updated_at", "order": "updated_at.desc", "limit": "1"},
+            prefer=["count=exact"], timeout=timeout,
+        )
+        rows = resp.json()
+        count = resp.headers.get("content-range", "*/0").rsplit("/", 1)[-1]
+        newest = rows[0]["updated_at"] if rows else ""
+        return f"{count}:{newest}"
@@ -0,0 +1,371 @@
+"""
+Browserless fast path: replay the Qflow form posts with httpx and read slot
+datetimes straight out of the HTML.
+
+Same walk as scrape_office, as plain requests on one pooled keep-alive client:
+  1. GET  BMV_URL                         → Welcome
+  2. POST form with "I Agree" item        → Location
+  3. POST form as-is (Next, no office)    → Service
+  4. POST form with "{office} Appts" item → Appointment types
+  5. POST form with appointment type item → Date & Time
+     (repeated from the saved Appointment types page for every further type)
+
+Selecting a .QflowObjectItem is assumed to mean posting the screen's form
+with the item's QFLOW_ITEM_ID_ATTR value in its QFLOW_ITEM_FIELD input (plus
+whatever hidden fields / anti-forgery token the form already has). Neither
+name has been checked against recorded traffic yet, so the walk fails closed:
+every page has to look like the screen the browser flow would be on (and its
+form has to carry QFLOW_ITEM_FIELD), otherwise FastPathError and the caller
+falls back to Playwright. A Date & Time screen without any slots is never
+trusted either (EmptyDateTime): an empty list would mark every slot gone.
+
+Parsing is pure (parse_page takes an HTML string), so it can be checked
+against saved pages without a network (tests/test_http_engine.py). With
+HTTP_RECORD_DIR set, or `python http_engine.py --record DIR`, every page
+the walk receives is saved there under its screen name.
+"""
+import argparse
+import asyncio
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import httpx
+
+QFLOW_ITEM_FIELD = os.environ.get("QFLOW_ITEM_FIELD", "SelectedItemId")
+QFLOW_ITEM_ID_ATTR = os.environ.get("QFLOW_ITEM_ID_ATTR", "data-id")
+HTTP_RECORD_DIR = os.environ.get("HTTP_RECORD_DIR", "")
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "20"))
+# After this many consecutive validation failures, stop trying the fast path
+# for FAST_PATH_COOLDOWN seconds (the site probably changed shape).
+FAST_PATH_MAX_FAILURES = int(os.environ.get("FAST_PATH_MAX_FAILURES", "3"))
+FAST_PATH_COOLDOWN = int(os.environ.get("FAST_PATH_COOLDOWN", "3600"))
+
+DATE_TIME_MARKER = "Choose a Date"
+AGREE_TEXT = "I Agree"
+OFFICE_SUFFIX = " Appts"
+
+
+class FastPathError(Exception):
+    """The replayed flow didn't land where the browser flow would have."""
+
+
+class EmptyDateTime(FastPathError):
+    """A Date & Time screen with no slots: left to the browser to confirm."""
+
+
+@dataclass
+class Item:
+    text: str
+    attrs: dict[str, str]
+
+
+@dataclass
+class QflowPage:
+    url: str
+    form_action: str | None = None
+    form_method: str = "post"
+    fields: dict[str, str] = field(default_factory=dict)
+    items: list[Item] = field(default_factory=list)
+    slot_datetimes: list[str] = field(default_factory=list)
+    has_next_button: bool = False
+    text: str = ""
+
+    def find_item(self, text: str) -> Item | None:
+        for item in self.items:
+            if text in item.text:
+                return item
+        return None
+
+    @property
+    def has_office_items(self) -> bool:
+        return any(item.text.endswith(OFFICE_SUFFIX) for item in self.items)
+
+    def looks_like(self, screen: str) -> bool:
+        """
+        Whether this is the given screen of the browser flow. Each check also
+        rules out the neighbouring screens, so a page that only shares a phrase
+        with the expected one (an error or "session expired" page) fails.
+        """
+        agree = self.find_item(AGREE_TEXT) is not None
+        date_time = DATE_TIME_MARKER in self.text
+        if screen == "welcome":
+            return agree and not self.slot_datetimes
+        if screen == "location":
+            return self.has_next_button and not (agree or self.has_office_items or date_time or self.slot_datetimes)
+        if screen == "service":
+            return self.has_office_items and not (agree or date_time or self.slot_datetimes)
+        if screen == "appointment_type":
+            return bool(self.items) and not (agree or self.has_office_items or date_time or self.slot_datetimes)
+        if screen == "date_time":
+            return date_time and not self.items
+        raise ValueError(f"unknown screen {screen!r}")
+
+
+class _QflowParser(HTMLParser):
+    """Collects the first form, its inputs, .QflowObjectItem labels and slot datetimes."""
+
+    def __init__(self, page: QflowPage):
+        super().__init__(convert_charrefs=True)
+        self.page = page
+        self._in_form = False
+        self._form_seen = False
+        self._item_depth = 0          # >0 while inside a .QflowObjectItem
+        self._item: Item | None = None
+        self._skip_depth = 0          # inside <script>/<style>
+        self._text: list[str] = []
+
+    @staticmethod
+    def _classes(attrs: dict[str, str]) -> set[str]:
+        return set((attrs.get("class") or "").split())
+
+    def handle_starttag(self, tag, attrs_list):
+        attrs = {k: (v or "") for k, v in attrs_list}
+        classes = self._classes(attrs)
+
+        if tag in ("script", "style"):
+            self._skip_depth += 1
+            return
+
+        if tag == "form" and not self._form_seen:
+            self._in_form = self._form_seen = True
+            self.page.form_action = attrs.get("action") or None
+            self.page.form_method = (attrs.get("method") or "post").lower()
+
+        if tag == "input" and self._in_form and attrs.get("name"):
+            kind = attrs.get("type", "text").lower()
+            if kind not in ("submit", "button", "image", "checkbox", "radio") or "checked" in attrs:
+                self.page.fields[attrs["name"]] = attrs.get("value", "")
+
+        if "next-button" in classes:
+            self.page.has_next_button = True
+
+        if "ServiceAppointmentDateTime" in classes and attrs.get("data-datetime"):
+            self.page.slot_datetimes.append(attrs["data-datetime"])
+
+        if self._item_depth:
+            if tag not in ("br", "img", "input", "hr", "meta", "link"):
+                self._item_depth += 1
+        elif "QflowObjectItem" in classes:
+            self._item_depth = 1
+            self._item = Item(text="", attrs=attrs)
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style"):
+            self._skip_depth = max(0, self._skip_depth - 1)
+            return
+        if tag == "form":
+            self._in_form = False
+        if self._item_depth:
+            self._item_depth -= 1
+            if self._item_depth == 0 and self._item is not None:
+                self._item.text = " ".join(self._item.text.split())
+                self.page.items.append(self._item)
+                self._item = None
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        self._text.append(data)
+        if self._item is not None:
+            self._item.text += data
+
+    def close(self):
+        super().close()
+        self.page.text = " ".join("".join(self._text).split())
+
+
+def parse_page(html: str, url: str) -> QflowPage:
+    page = QflowPage(url=url)
+    parser = _QflowParser(page)
+    parser.feed(html)
+    parser.close()
+    return page
+
+
+class _SharedTransport(httpx.AsyncBaseTransport):
+    """Lends the sweep's pool to one office's client; closing the client leaves the pool open."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        pass
+
+
+def _file_label(*parts: str) -> str:
+    return "-".join(re.sub(r"[^A-Za-z0-9]+", "_", part).strip("_") for part in parts)
+
+
+class HttpScraper:
+    """
+    One pooled keep-alive transport for a whole sweep. Each office gets its own
+    lightweight client (so its own cookie jar / Qflow session) on top of it.
+    """
+
+    def __init__(
+        self,
+        start_url: str,
+        throttle=None,
+        transport: httpx.AsyncBaseTransport | None = None,
+        record_dir: str = HTTP_RECORD_DIR,
+    ):
+        self.start_url = start_url
+        self.throttle = throttle
+        self.transport = transport or httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_keepalive_connections=10, max_connections=20),
+            retries=1,
+        )
+        self.record_dir = record_dir
+        self._failures = 0
+        self._disabled_until = 0.0
+        self.stats = {"ok": 0, "failed": 0, "empty": 0, "requests": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return time.monotonic() >= self._disabled_until
+
+    def _record(self, ok: bool) -> None:
+        if ok:
+            self._failures = 0
+            self.stats["ok"] += 1
+            return
+        self._failures += 1
+        self.stats["failed"] += 1
+        if self._failures >= FAST_PATH_MAX_FAILURES:
+            self._disabled_until = time.monotonic() + FAST_PATH_COOLDOWN
+            self._failures = 0
+            print(f"  [http] fast path disabled for {FAST_PATH_COOLDOWN}s after repeated failures", flush=True)
+
+    def _session_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            transport=_SharedTransport(self.transport),
+            timeout=HTTP_TIMEOUT,
+            follow_redirects=True,
+            headers={"User-Agent": "Mozilla/5.0 (compatible; MaineBMVSlots/1.0)"},
+        )
+
+    def _record_page(self, label: str, html: str) -> None:
+        try:
+            os.makedirs(self.record_dir, exist_ok=True)
+            with open(os.path.join(self.record_dir, f"{label}.html"), "w", encoding="utf-8") as f:
+                f.write(html)
+        except OSError as e:
+            print(f"  [http] could not record {label}: {e}", flush=True)
+
+    async def _request(
+        self, method: str, url: str, client: httpx.AsyncClient, screen: str, label: str, data: dict | None = None,
+    ) -> QflowPage:
+        if self.throttle is not None:
+            await self.throttle.wait()
+        self.stats["requests"] += 1
+        if method == "GET":
+            resp = await client.request(method, url, params=data)
+        else:
+            resp = await client.request(method, url, data=data)
+        resp.raise_for_status()
+        if self.record_dir:
+            self._record_page(label, resp.text)
+        page = parse_page(resp.text, str(resp.url))
+        if not page.looks_like(screen):
+            raise FastPathError(f"expected the {screen} screen, got an unrecognised page at {page.url}")
+        return page
+
+    async def _submit(
+        self, page: QflowPage, client: httpx.AsyncClient, screen: str, label: str, item: Item | None = None,
+    ) -> QflowPage:
+        data = dict(page.fields)
+        if item is not None:
+            if QFLOW_ITEM_FIELD not in page.fields:
+                raise FastPathError(f"form at {page.url} has no {QFLOW_ITEM_FIELD} input")
+            item_id = item.attrs.get(QFLOW_ITEM_ID_ATTR)
+            if not item_id:
+                raise FastPathError(f"item '{item.text}' has no {QFLOW_ITEM_ID_ATTR}")
+            data[QFLOW_ITEM_FIELD] = item_id
+        action = urljoin(page.url, page.form_action or page.url)
+        method = "GET" if page.form_method == "get" else "POST"
+        return await self._request(method, action, client, screen, label, data=data)
+
+    async def _choose(
+        self, page: QflowPage, client: httpx.AsyncClient, text: str, screen: str, label: str, missing: str,
+    ) -> QflowPage:
+        item = page.find_item(text)
+        if item is None:
+            raise FastPathError(missing)
+        return await self._submit(page, client, screen, label, item)
+
+    async def fetch_slot_strings(self, office: str, appt_types: list[str]) -> dict[str, list[str]]:
+        """
+        Raw data-datetime strings per appointment type for one office. Types the
+        office doesn't offer are left out; raises FastPathError if none are
+        offered or on anything unexpected, EmptyDateTime if a type has no slots.
+        """
+        found: dict[str, list[str]] = {}
+        try:
+            async with self._session_client() as client:
+                page = await self._request("GET", self.start_url, client, "welcome", "welcome")
+                page = await self._choose(
+                    page, client, AGREE_TEXT, "location", "location", f"no '{AGREE_TEXT}' item on welcome page"
+                )
+                page = await self._submit(page, client, "service", "service")
+                types_page = await self._choose(
+                    page, client, f"{office}{OFFICE_SUFFIX}", "appointment_type", _file_label("types", office),
+                    f"'{office}{OFFICE_SUFFIX}' not found on service page",
+                )
+                for appt_type in appt_types:
+                    item = types_page.find_item(appt_type)
+                    if item is None:
+                        continue
+                    # Re-post the saved type list's form: no need to walk back to it
+                    page = await self._submit(
+                        types_page, client, "date_time", _file_label("date_time", office, appt_type), item
+                    )
+                    if not page.slot_datetimes:
+                        raise EmptyDateTime(f"no slots for '{appt_type}' at {office}")
+                    found[appt_type] = page.slot_datetimes
+                if not found:
+                    raise FastPathError(f"none of {appt_types} found for {office}")
+        except EmptyDateTime:
+            # The flow worked; only the empty answer is unconfirmed
+            self.stats["empty"] += 1
+            raise
+        except FastPathError:
+            self._record(False)
+            raise
+        except httpx.HTTPError as e:
+            self._record(False)
+            raise FastPathError(f"http error: {e}") from e
+
+        self._record(True)
+        return found
+
+    async def close(self) -> None:
+        await self.transport.aclose()
+
+
+async def record(url: str, directory: str, office: str, appt_types: list[str]) -> None:
+    scraper = HttpScraper(url, record_dir=directory)
+    try:
+        found = await scraper.fetch_slot_strings(office, appt_types)
+        print(", ".join(f"{t}: {len(v)} slots" for t, v in found.items()))
+    except FastPathError as e:
+        print(f"stopped: {e}")
+    finally:
+        await scraper.close()
+    print(f"Pages saved in {directory}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk the form once over HTTP and save every page it receives.")
+    parser.add_argument("--record", metavar="DIR", required=True, help="where to save the pages")
+    parser.add_argument("--url", default="https://mainebmvappt.cxmflow.com/Appointment/Index/2c052fc7-571f-4b76-9790-7e91f103c408")
+    parser.add_argument("--office", default="Portland")
+    parser.add_argument("--types", default="Driver's License", help="comma-separated appointment types")
+    args = parser.parse_args()
+    asyncio.run(record(args.url, args.record, args.office, args.types.split(",")))
@@ -0,0 +1,126 @@
+"""
+Local write-ahead journal for office snapshots (SQLite, WAL mode).
+
+Every scraped office snapshot is appended here before the writer tries to
+apply it to Supabase, and removed once it has been applied. Whatever is
+still in the journal after a crash, restart or DB outage is replayed the next
+time a SlotWriter starts.
+
+Snapshots are whole-office state (for one appointment type), not deltas, so
+only the newest one per (office, appointment_type) ever needs applying:
+latest() coalesces, and ack() drops everything up to the applied sequence
+number for that key.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+from db import DEFAULT_APPOINTMENT_TYPE
+from leases import OFFICE_LEASES, WORKER_ID
+
+# With OFFICE_LEASES several workers may share a host and its temp dir, so each
+# one gets its own file. Give each worker a stable WORKER_ID, so that after a
+# restart it replays its own journal (the hostname-pid default changes).
+WRITE_JOURNAL_PATH = os.environ.get("WRITE_JOURNAL_PATH") or os.path.join(
+    tempfile.gettempdir(),
+    f"bmv-write-journal.{WORKER_ID.replace(os.sep, '_')}.sqlite3" if OFFICE_LEASES else "bmv-write-journal.sqlite3",
+)
+
+
+@dataclass
+class OfficeSnapshot:
+    """One office's scrape for one appointment type, in the shape reconcile_office needs."""
+    office: str
+    golden: list[tuple[str, str]]   # (date ISO, "HH:MM:SS"), sorted
+    closest_future: str | None      # date ISO
+    golden_count: int
+    future_count: int
+    fingerprint: str
+    scraped_at: float               # time.time()
+    appointment_type: str = DEFAULT_APPOINTMENT_TYPE
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return (self.office, self.appointment_type)
+
+    @property
+    def label(self) -> str:
+        if self.appointment_type == DEFAULT_APPOINTMENT_TYPE:
+            return self.office
+        return f"{self.office} / {self.appointment_type}"
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text: str) -> "OfficeSnapshot":
+        data = json.loads(text)
+        data["golden"] = [tuple(k) for k in data["golden"]]
+        return cls(**data)
+
+
+class WriteJournal:
+    def __init__(self, path: str = WRITE_JOURNAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("pragma journal_mode=wal")
+        self._conn.execute("pragma synchronous=normal")
+        default_type = DEFAULT_APPOINTMENT_TYPE.replace("'", "''")
+        self._conn.execute(f"""
+            create table if not exists pending (
+              seq              integer primary key autoincrement,
+              office           text    not null,
+              appointment_type text    not null default '{default_type}',
+              payload          text    not null,
+              created_at       real    not null
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute("pragma table_info(pending)")}
+        if "appointment_type" not in columns:  # journal from before multi-type scraping
+            self._conn.execute(
+                f"alter table pending add column appointment_type text not null default '{default_type}'"
+            )
+        self._conn.execute("drop index if exists idx_pending_office")
+        self._conn.execute(
+            "create index if not exists idx_pending_key on pending (office, appointment_type, seq)"
+        )
+
+    def append(self, snapshot: OfficeSnapshot) -> int:
+        with self._lock:
+            cur = self._conn.execute(
+                "insert into pending (office, appointment_type, payload, created_at) values (?, ?, ?, ?)",
+                (snapshot.office, snapshot.appointment_type, snapshot.to_json(), time.time()),
+            )
+            return cur.lastrowid
+
+    def latest(self) -> list[tuple[int, OfficeSnapshot]]:
+        """Newest pending snapshot per (office, appointment_type), oldest first."""
+        with self._lock:
+            rows = self._conn.execute("""
+                select seq, payload from pending
+                where seq in (select max(seq) from pending group by office, appointment_type)
+                order by seq
+            """).fetchall()
+        return [(seq, OfficeSnapshot.from_json(payload)) for seq, payload in rows]
+
+    def ack(self, key: tuple[str, str], seq: int) -> None:
+        """The snapshot `seq` for (office, appointment_type) is in the DB; drop it and everything older."""
+        with self._lock:
+            self._conn.execute(
+                "delete from pending where office = ? and appointment_type = ? and seq <= ?", (*key, seq)
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("select count(*) from pending").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
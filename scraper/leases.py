@@ -0,0 +1,130 @@
+"""
+Office leases, so several scraper workers can share the offices.
+
+With OFFICE_LEASES=true, runner.py only scrapes (and SlotWriter only writes)
+offices this worker holds an unexpired lease on in office_leases:
+
+  claim   every LEASE_CLAIM_SECONDS: renew what we hold, take over free or
+          expired leases up to an equal share per live worker, and hand back
+          anything over that share (claim_office_leases in schema.sql)
+  renew   every LEASE_RENEW_SECONDS in between, while scraping, so a long
+          sweep never outlives its leases (renew_office_leases)
+  release on shutdown, so peers don't have to wait for the TTL
+
+A worker that dies stops renewing; its leases expire after LEASE_TTL and the
+next claim by a peer takes them over. Locally a lease is treated as lost
+LEASE_SAFETY_SECONDS before its TTL runs out, so a worker that can't reach
+the DB stops writing before anyone else can take the office over.
+"""
+import asyncio
+import os
+import socket
+import time
+
+import db
+
+OFFICE_LEASES = os.environ.get("OFFICE_LEASES", "false").lower() == "true"
+LEASE_TTL = int(os.environ.get("LEASE_TTL", "120"))
+LEASE_RENEW_SECONDS = float(os.environ.get("LEASE_RENEW_SECONDS", "30"))
+LEASE_CLAIM_SECONDS = float(os.environ.get("LEASE_CLAIM_SECONDS", "60"))
+LEASE_SAFETY_SECONDS = float(os.environ.get("LEASE_SAFETY_SECONDS", "15"))
+WORKER_ID = os.environ.get("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseManager:
+    def __init__(
+        self,
+        offices: list[str],
+        holder: str = WORKER_ID,
+        ttl: int = LEASE_TTL,
+        renew_every: float = LEASE_RENEW_SECONDS,
+        claim_every: float = LEASE_CLAIM_SECONDS,
+    ):
+        self.offices = offices
+        self.holder = holder
+        self.ttl = ttl
+        self.renew_every = renew_every
+        self.claim_every = claim_every
+        self.db_client = None
+        self._held: dict[str, float] = {}  # office → local monotonic time it stops counting as held
+        self._task: asyncio.Task | None = None
+        self.on_gained: list = []  # callbacks(offices) run before a newly gained office counts as held
+        self.stats = {"claims": 0, "renewals": 0, "acquired": 0, "lost": 0, "errors": 0}
+
+    @property
+    def held(self) -> list[str]:
+        now = time.monotonic()
+        return sorted(o for o, until in self._held.items() if until > now)
+
+    def holds(self, office: str) -> bool:
+        return self._held.get(office, 0.0) > time.monotonic()
+
+    def _update(self, offices: list[str], started: float) -> None:
+        until = started + self.ttl - LEASE_SAFETY_SECONDS
+        gained = sorted(set(offices) - set(self.held))
+        lost = sorted(set(self.held) - set(offices))
+        if gained:
+            self.stats["acquired"] += len(gained)
+            print(f"  [leases] {self.holder} acquired {', '.join(gained)}", flush=True)
+            for callback in self.on_gained:
+                callback(gained)
+        if lost:
+            self.stats["lost"] += len(lost)
+            print(f"  [leases] {self.holder} lost {', '.join(lost)}", flush=True)
+        self._held = {office: until for office in offices}
+
+    async def claim(self) -> list[str]:
+        started = time.monotonic()
+        offices = await asyncio.to_thread(
+            db.claim_office_leases, self.db_client, self.holder, self.offices, self.ttl,
+        )
+        self.stats["claims"] += 1
+        self._update(offices, started)
+        return self.held
+
+    async def renew(self) -> list[str]:
+        started = time.monotonic()
+        offices = await asyncio.to_thread(db.renew_office_leases, self.db_client, self.holder, self.ttl)
+        self.stats["renewals"] += 1
+        self._update(offices, started)
+        return self.held
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        if self.db_client is None:
+            self.db_client = db.get_client()
+        await self.claim()
+        self._task = asyncio.create_task(self._loop())
+
+    async def _loop(self) -> None:
+        next_claim = time.monotonic() + self.claim_every
+        while True:
+            await asyncio.sleep(self.renew_every)
+            try:
+                if time.monotonic() >= next_claim:
+                    await self.claim()
+                    next_claim = time.monotonic() + self.claim_every
+                else:
+                    await self.renew()
+            except Exception as e:
+                # Leases keep counting down locally; nothing is written for offices that lapse
+                self.stats["errors"] += 1
+                print(f"  [leases] renew failed: {e}", flush=True)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.db_client is not None and self._held:
+            try:
+                await asyncio.to_thread(db.release_office_leases, self.db_client, self.holder)
+            except Exception as e:
+                print(f"  [leases] release failed (leases will expire): {e}", flush=True)
+        self._held.clear()
+
+    def report(self) -> str:
+        return f"{self.holder} holds {len(self.held)}/{len(self.offices)} " + " ".join(
+            f"{k}={v}" for k, v in self.stats.items()
+        )
@@ -1,23 +1,44 @@
 """
 Maine BMV Real ID Appointment Scraper
 - Runs every 5 min via GitHub Actions cron
-- Scrapes all 13 offices for Driver's License (Real ID) slots
+- Scrapes all 13 offices for each of APPOINTMENT_TYPES (default: Driver's License / Real ID)
 - Selectors confirmed via probe on 2026-02-21
 """
 import asyncio
 import os
+import time
 from datetime import date, datetime, timezone
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright, Page
+from playwright.async_api import Page
 
 load_dotenv()
 
 import db
 import alerts
+import metrics
+from browser_pool import BrowserPool
+from throttle import HostThrottle
+from navigator import ItemNotFound, office_step, appointment_type_step, back_to_types_step
+from session import ServiceSession
+from http_engine import HttpScraper, FastPathError
+from journal import OfficeSnapshot
+from public_snapshot import PUBLISH_SNAPSHOT, PUBLISHER
+from slots import split_slots
+from snapshot_store import STORE as SNAPSHOT_STORE
+from state_cache import SlotStateCache
+from subscribers import SubscriberCache
+from sweep_budget import SweepBudget
+from writer import SlotWriter
 
 BMV_URL = "https://mainebmvappt.cxmflow.com/Appointment/Index/2c052fc7-571f-4b76-9790-7e91f103c408"
 GOLDEN_THRESHOLD_DAYS = 8
 
+# Appointment types scraped at every office, as labelled on its "{office} Appts"
+# page; comma-separated. Each one after the first costs one back + one click.
+APPOINTMENT_TYPES = [
+    t.strip() for t in os.environ.get("APPOINTMENT_TYPES", db.DEFAULT_APPOINTMENT_TYPE).split(",") if t.strip()
+]
+
 # Exact office names as they appear on the BMV form ("{name} Appts")
 OFFICES = [
     "Augusta",
@@ -37,210 +58,483 @@ OFFICES = [
 
 DEBUG = os.environ.get("DEBUG", "false").lower() == "true"
 
+# "auto": HTTP fast path with Playwright fallback; "http": fast path only; "browser": Playwright only
+SCRAPE_ENGINE = os.environ.get("SCRAPE_ENGINE", "auto").lower()
 
-def today() -> date:
-    return datetime.now(timezone.utc).date()
+# Offices scraped in parallel (each in its own browser context).
+# 1 reproduces the old one-at-a-time sweep.
+SCRAPE_CONCURRENCY = int(os.environ.get("SCRAPE_CONCURRENCY", "3"))
 
+# One-shot runs wait this long for queued alert emails before exiting
+ALERT_DRAIN_TIMEOUT = float(os.environ.get("ALERT_DRAIN_TIMEOUT", "60"))
 
-def days_until(appt_date: date) -> int:
-    return (appt_date - today()).days
+# How long a sweep waits for its snapshots to be written before returning
+# (anything still pending stays in the write journal)
+WRITER_DRAIN_TIMEOUT = float(os.environ.get("WRITER_DRAIN_TIMEOUT", "60"))
 
 
-def is_golden(appt_date: date) -> bool:
-    return days_until(appt_date) < GOLDEN_THRESHOLD_DAYS
+def today() -> date:
+    return datetime.now(timezone.utc).date()
 
 
-async def screenshot(page: Page, name: str) -> None:
-    if DEBUG:
+def new_summary(office: str, error: str | None = None) -> dict:
+    return {
+        "office": office, "golden": 0, "future": 0, "new_golden": [], "gone_golden": 0, "error": error,
+        "retryable": True,
+    }
+
+
+async def screenshot(page: Page | None, name: str) -> None:
+    if DEBUG and page is not None:
         path = f"debug_{name}.png"
         await page.screenshot(path=path, full_page=True)
         print(f"  [debug] {path}")
 
 
-async def extract_slots(page: Page) -> list[dict]:
+async def extract_slots(page: Page) -> list[str]:
     """
-    Extract all available slots from the Date & Time page.
-    Uses data-datetime attribute on .ServiceAppointmentDateTime elements.
-    Format: "4/22/2026 2:15:00 PM"
+    Read every data-datetime attribute on the Date & Time page in one round trip.
+    Format: "4/22/2026 2:15:00 PM" — parsed in bulk by slots.split_slots.
     """
-    slot_elements = page.locator(".ServiceAppointmentDateTime[data-datetime]")
-    count = await slot_elements.count()
-
-    slots = []
-    for i in range(count):
-        el = slot_elements.nth(i)
-        dt_str = await el.get_attribute("data-datetime")
-        if not dt_str:
-            continue
-        try:
-            # Parse "4/22/2026 2:15:00 PM"
-            dt = datetime.strptime(dt_str.strip(), "%m/%d/%Y %I:%M:%S %p")
-            slots.append({
-                "date": dt.date(),
-                "time": dt.strftime("%H:%M:%S"),
-            })
-        except ValueError as e:
-            print(f"  [warn] parse error for '{dt_str}': {e}")
-
-    return slots
+    return await page.locator(".ServiceAppointmentDateTime[data-datetime]").evaluate_all(
+        "els => els.map(e => e.getAttribute('data-datetime'))"
+    )
 
 
-async def scrape_office(office: str, db_client) -> dict:
+async def slots_via_browser(
+    office: str, session: ServiceSession, throttle: HostThrottle, summary: dict,
+) -> dict[str, list[str]]:
     """
-    Navigate BMV form for one office and return slot summary.
-
-    Confirmed form flow (2026-02-21):
+    Walk the form in Chromium (steps 1–6 below) and return raw slot datetimes
+    per appointment type. Types the office doesn't offer are left out.
+    """
+    # ── Steps 1–3: Service page (fresh walk, history back, or checkpoint) ─────
+    nav, how = await session.to_service(BMV_URL, throttle)
+    page = session.page
+    summary["timings"] = nav.timings
+    summary["session"] = how
+    await screenshot(page, f"{office}_3_service")
+
+    # ── Step 4: office → Appointment Type list ────────────────────────────────
+    await nav.run(office_step(office))
+    await screenshot(page, f"{office}_4_appointment_type")
+
+    found: dict[str, list[str]] = {}
+    at_slots = False
+    for appt_type in APPOINTMENT_TYPES:
+        # ── Step 5: appointment type → Date & Time (back to the list first) ───
+        if at_slots:
+            await nav.run(back_to_types_step(office))
+            at_slots = False
+        try:
+            await nav.run(appointment_type_step(office, appt_type))
+        except ItemNotFound:
+            continue
+        at_slots = True
+        await screenshot(page, f"{office}_5_{appt_type}")
+
+        # ── Step 6: Extract slots ─────────────────────────────────────────────
+        started = time.monotonic()
+        found[appt_type] = await extract_slots(page)
+        nav.timings["extract"] = round(nav.timings.get("extract", 0.0) + (time.monotonic() - started) * 1000, 1)
+
+    if not found:
+        raise ItemNotFound(f"none of {APPOINTMENT_TYPES} found for {office}")
+    # back_to_service_step expects to start from a Date & Time page
+    if at_slots:
+        session.mark_at_slots()
+    return found
+
+
+async def scrape_office(
+    office: str,
+    session: ServiceSession,
+    throttle: HostThrottle,
+    http: HttpScraper | None = None,
+) -> tuple[dict, list[OfficeSnapshot]]:
+    """
+    Navigate BMV form for one office and return its slot summary plus one
+    snapshot per appointment type to hand to the SlotWriter (none when the
+    scrape failed).
+    With an HttpScraper the form is first replayed without a browser; the
+    Chromium walk below runs only if that fails validation (SCRAPE_ENGINE=auto).
+
+    Confirmed form flow (2026-02-21), driven by navigator.py.
+    Steps 1–3 are skipped when `session` can get back to the Service page:
       1. goto BMV_URL → Welcome page
       2. Click .QflowObjectItem ("I Agree") → Location page (auto-advances)
       3. JS click .next-button → Service page (all office appts + service types)
       4. Click .QflowObjectItem "{office} Appts" → Appointment types for office
-      5. Click .QflowObjectItem "Driver's License" → Date & Time page
+      5. Click .QflowObjectItem for the appointment type → Date & Time page
       6. Read .ServiceAppointmentDateTime[data-datetime] for all slots
+    Steps 5–6 repeat for each of APPOINTMENT_TYPES, going back to the
+    Appointment Type list in between, so extra types don't redo steps 1–4.
+    Types the office doesn't offer are listed in summary["missing_types"].
+
+    Per-step latencies (ms) are returned in summary["timings"] and recorded in
+    metrics, per-type golden / future counts in summary["types"], and the
+    engine that produced the slots in summary["engine"].
+    Nothing here touches the DB; new_golden / gone_golden are filled in once
+    the writer has applied the snapshot.
+    """
+    summary = new_summary(office)
+    snapshots: list[OfficeSnapshot] = []
+    office_started = time.monotonic()
+
+    try:
+        raw = None
+        if http is not None and (http.enabled or SCRAPE_ENGINE == "http"):
+            try:
+                started = time.monotonic()
+                raw = await http.fetch_slot_strings(office, APPOINTMENT_TYPES)
+                summary["engine"] = "http"
+                summary["timings"] = {"http": round((time.monotonic() - started) * 1000, 1)}
+            except FastPathError as e:
+                if SCRAPE_ENGINE == "http":
+                    raise
+                print(f"  [{office}] fast path rejected ({e}) — falling back to browser")
+
+        if raw is None:
+            raw = await slots_via_browser(office, session, throttle, summary)
+            summary["engine"] = "browser"
+
+        for step, ms in summary["timings"].items():
+            metrics.observe("bmv_step_seconds", ms / 1000, step=step)
+
+        summary["types"] = {}
+        summary["missing_types"] = [t for t in APPOINTMENT_TYPES if t not in raw]
+        scraped_at = time.time()
+        for appt_type, strings in raw.items():
+            if SNAPSHOT_STORE is not None:
+                SNAPSHOT_STORE.add(office, appt_type, strings, scraped_at)
+            slots = split_slots(strings, today(), GOLDEN_THRESHOLD_DAYS)
+
+            # ── Step 7: Snapshot for the writer ───────────────────────────────
+            summary["types"][appt_type] = {"golden": len(slots.golden), "future": slots.future_count}
+            summary["golden"] += len(slots.golden)
+            summary["future"] += slots.future_count
+            snapshots.append(OfficeSnapshot(
+                office=office,
+                golden=list(slots.golden),
+                closest_future=slots.closest_future.isoformat() if slots.closest_future else None,
+                golden_count=len(slots.golden),
+                future_count=slots.future_count,
+                fingerprint=slots.fingerprint,
+                scraped_at=scraped_at,
+                appointment_type=appt_type,
+            ))
+
+        found = ", ".join(f"{t} {len(v)}" for t, v in raw.items())
+        print(f"  [{office}] Found {found} slots via {summary['engine']} "
+              f"({', '.join(f'{k} {v:.0f}ms' for k, v in summary['timings'].items())})")
+        if summary["missing_types"]:
+            print(f"  [{office}] Not offered: {', '.join(summary['missing_types'])}")
+
+    except ItemNotFound as e:
+        # The office / type isn't offered on the site: the same page again won't have it
+        summary["error"] = str(e)
+        summary["retryable"] = False
+        await screenshot(session.page, f"{office}_ERROR")
+    except Exception as e:
+        session.invalidate()
+        summary["error"] = f"Error scraping {office}: {e}"
+        await screenshot(session.page, f"{office}_ERROR")
+        print(f"  [{office}] ERROR: {e}")
+
+    metrics.observe("bmv_office_seconds", time.monotonic() - office_started,
+                    office=office, engine=summary.get("engine", "none"))
+    metrics.inc("bmv_scrapes_total", office=office, result="error" if summary["error"] else "ok")
+    return summary, snapshots
+
+
+class ScrapeEngines:
+    """
+    What offices are scraped with: one ServiceSession per SCRAPE_CONCURRENCY
+    worker on a BrowserPool, the host throttle and the HTTP fast path.
+    runner.py keeps one for its whole loop, so sessions parked on the Service
+    page and the keep-alive pool survive from one batch of offices to the next.
     """
-    summary = {"office": office, "golden": 0, "future": 0, "new_golden": [], "error": None}
-
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-                       "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            viewport={"width": 1280, "height": 900}
-        )
-        page = await context.new_page()
-
-        try:
-            # ── Step 1: Welcome → Location ────────────────────────────────────
-            await page.goto(BMV_URL, wait_until="domcontentloaded", timeout=30000)
-            await page.wait_for_timeout(1500)
-            await screenshot(page, f"{office}_1_welcome")
-
-            agree = page.locator(".QflowObjectItem").first
-            await agree.wait_for(timeout=10000)
-            await agree.click()
-            await page.wait_for_timeout(1500)
-            await screenshot(page, f"{office}_2_location")
-
-            # ── Step 2: Location → Service (JS click Next, no office selected) ─
-            await page.evaluate("document.querySelector('.next-button').click()")
-            await page.wait_for_timeout(1500)
-            await screenshot(page, f"{office}_3_service")
-
-            # ── Step 3: Service → Appointment Types ───────────────────────────
-            office_item = page.locator(".QflowObjectItem").filter(has_text=f"{office} Appts")
-            count = await office_item.count()
-            if count == 0:
-                summary["error"] = f"'{office} Appts' not found on service page"
-                return summary
-
-            await office_item.first.click()
-            await page.wait_for_timeout(1500)
-            await screenshot(page, f"{office}_4_appt_type")
-
-            # ── Step 4: Select Driver's License ──────────────────────────────
-            dl_item = page.locator(".QflowObjectItem").filter(has_text="Driver's License")
-            dl_count = await dl_item.count()
-            if dl_count == 0:
-                summary["error"] = f"'Driver's License' not found for {office}"
-                return summary
-
-            await dl_item.first.click()
-            await page.wait_for_timeout(2000)
-            await screenshot(page, f"{office}_5_slots")
-
-            # ── Step 5: Extract slots ─────────────────────────────────────────
-            slots = await extract_slots(page)
-            print(f"  Found {len(slots)} total slots for {office}")
-
-            # ── Step 6: Process slots → DB ────────────────────────────────────
-            still_available_golden: set[tuple] = set()
-            future_dates: list[date] = []
-
-            for slot in slots:
-                appt_date = slot["date"]
-                appt_time = slot["time"]
-
-                if is_golden(appt_date):
-                    still_available_golden.add((appt_date.isoformat(), appt_time))
-                    is_new = db.upsert_golden_slot(db_client, office, appt_date, appt_time)
-                    if is_new:
-                        summary["new_golden"].append({"date": appt_date, "time": appt_time})
-                    summary["golden"] += 1
-                else:
-                    future_dates.append(appt_date)
-                    summary["future"] += 1
-
-            db.mark_golden_gone(db_client, office, still_available_golden)
-
-            if future_dates:
-                closest = min(future_dates)
-                db.upsert_future_slot(db_client, office, closest)
-            else:
-                db.mark_future_gone(db_client, office)
-
-            db.mark_office_checked(db_client, office)
-
-        except Exception as e:
-            summary["error"] = f"Error scraping {office}: {e}"
-            await screenshot(page, f"{office}_ERROR")
-            print(f"  ERROR: {e}")
-        finally:
-            await browser.close()
 
-    return summary
+    def __init__(self, pool: BrowserPool):
+        self.pool = pool
+        self.throttle = HostThrottle()
+        self.http = HttpScraper(BMV_URL, self.throttle) if SCRAPE_ENGINE in ("auto", "http") else None
+        self.all_sessions = [ServiceSession(pool) for _ in range(max(1, SCRAPE_CONCURRENCY))]
+        self.sessions: asyncio.Queue[ServiceSession] = asyncio.Queue()
+        for session in self.all_sessions:
+            self.sessions.put_nowait(session)
+
+    def session_stats(self) -> dict[str, int]:
+        totals: dict[str, int] = {}
+        for session in self.all_sessions:
+            for k, v in session.stats.items():
+                totals[k] = totals.get(k, 0) + v
+        return totals
+
+    async def close(self) -> None:
+        for session in self.all_sessions:
+            await session.close()
+        if self.http is not None:
+            await self.http.close()
+
+
+class ScrapeRun:
+    """
+    One scrape_runs row, with the bookkeeping that goes with it: the slot_stats
+    flush and the public snapshot publish. A one-shot sweep is one run; the
+    adaptive loop (runner.py) adds every batch of due offices in a cycle to the
+    same run and finishes it once per cycle.
+    """
 
+    def __init__(self, db_client):
+        self.db_client = db_client
+        metrics.start_run()
+        self.run_id = db.start_scrape_run(db_client)
+        self.offices_scraped = 0
+        self.golden = 0
+        self.future = 0
+        self.errors: list[dict] = []
+
+    def add(self, offices: int, golden: int, future: int, errors: list[dict]) -> None:
+        self.offices_scraped += offices
+        self.golden += golden
+        self.future += future
+        self.errors += errors
+
+    def finish(self, writer: SlotWriter) -> tuple[int, int | None]:
+        """Record the run, flush slot_stats and republish the snapshot. Returns (slot events, snapshot version)."""
+        db.finish_scrape_run(
+            self.db_client,
+            run_id=self.run_id,
+            offices_scraped=self.offices_scraped,
+            golden_found=self.golden,
+            future_found=self.future,
+            errors=self.errors,
+            timings=metrics.run_breakdown(),
+        )
+        slot_events = writer.flush_stats()
+        # After the writes, so the site sees this run in one notification
+        snapshot_version = PUBLISHER.publish(self.db_client) if PUBLISH_SNAPSHOT else None
+        return slot_events, snapshot_version
+
+
+async def main(
+    pool: BrowserPool | None = None,
+    cache: SlotStateCache | None = None,
+    dispatcher: alerts.AlertDispatcher | None = None,
+    subscriber_cache: SubscriberCache | None = None,
+    offices: list[str] | None = None,
+    writer: SlotWriter | None = None,
+    engines: ScrapeEngines | None = None,
+    run: ScrapeRun | None = None,
+    banner: bool = True,
+) -> list[dict]:
+    """
+    Run one sweep over `offices` (default: all OFFICES) and return the per-office summaries.
+    Up to SCRAPE_CONCURRENCY offices are scraped at once, each worker reusing
+    its own ServiceSession, within a SweepBudget: every attempt has a deadline,
+    failed offices are retried later in the sweep, and slow ones can be hedged
+    (see sweep_budget.py). Each finished office's snapshot goes to a SlotWriter,
+    which writes it to the DB and then queues its alerts, without holding up
+    the scrapers; the sweep waits up to WRITER_DRAIN_TIMEOUT for the writes
+    before filling in new_golden / gone_golden.
+    Alerts are queued on an AlertDispatcher and never block the sweep.
+    Once the writes are in, the website's public_snapshot is republished
+    (public_snapshot.py), and with SNAPSHOT_STORE_DIR set the raw slot lists
+    are appended to the local archive (snapshot_store.py).
+    Pass a long-lived BrowserPool, SlotStateCache, AlertDispatcher,
+    SubscriberCache, SlotWriter and ScrapeEngines (runner.py does) to reuse
+    them across runs; otherwise they're created for this sweep only, and
+    alerts are drained before returning. With a ScrapeRun passed in, this
+    sweep's totals are added to it and the caller finishes it (scrape_runs
+    row, slot_stats, public snapshot); otherwise the sweep is its own run.
+    banner=False skips the header (the adaptive runner prints its own per batch).
+    """
+    owns_pool = engines is None and pool is None
+    owns_engines = engines is None
+    if owns_engines:
+        engines = ScrapeEngines(pool or BrowserPool())
+    pool = engines.pool
+
+    if banner:
+        now_str = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+        print(f"\n{'='*60}\nMaine BMV Scraper — {now_str}\n{'='*60}")
+
+    owns_run = run is None
+    if owns_run:
+        run = ScrapeRun(db.get_client())
+
+    owns_dispatcher = dispatcher is None
+    if owns_dispatcher:
+        dispatcher = alerts.AlertDispatcher()
+
+    owns_writer = writer is None
+    if owns_writer:
+        writer = SlotWriter(
+            cache or SlotStateCache(), OFFICES, dispatcher,
+            subscriber_cache or SubscriberCache(), BMV_URL,
+            appointment_types=APPOINTMENT_TYPES,
+        )
+    writer.start()
 
-async def main():
-    now_str = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
-    print(f"\n{'='*60}\nMaine BMV Scraper — {now_str}\n{'='*60}")
+    throttle, http, sessions = engines.throttle, engines.http, engines.sessions
+    totals = {"golden": 0, "future": 0}
+    errors = []
+    summaries: list[dict] = []
+    writes: list[tuple[dict, asyncio.Future]] = []
+    offices = offices or OFFICES
+    budget = SweepBudget()
 
-    db_client = db.get_client()
-    run_id = db.start_scrape_run(db_client)
+    async def attempt(office: str, session: ServiceSession) -> tuple[dict, list[OfficeSnapshot]]:
+        try:
+            return await scrape_office(office, session, throttle, http)
+        except asyncio.CancelledError:
+            session.invalidate()  # cancelled mid-walk: the page is wherever it was
+            raise
+        finally:
+            sessions.put_nowait(session)
 
-    total_golden = 0
-    total_future = 0
-    errors = []
+    async def scrape_with_deadline(office: str) -> tuple[dict, list[OfficeSnapshot]]:
+        """One attempt, cancelled at its deadline and hedged once it runs past the p95."""
+        session = await sessions.get()
+        timeout = budget.attempt_timeout()
+        if timeout is None:
+            sessions.put_nowait(session)
+            budget.stats["skipped"] += 1
+            return new_summary(office, "skipped: sweep budget spent"), []
 
-    for office in OFFICES:
         print(f"\n── {office} ──")
-        summary = await scrape_office(office, db_client)
-
-        total_golden += summary["golden"]
-        total_future += summary["future"]
+        started = time.monotonic()
+        deadline = started + timeout
+        hedge_after = budget.hedge_after(office)
+        hedge_at = started + hedge_after if hedge_after is not None and hedge_after < timeout else None
+        primary = asyncio.create_task(attempt(office, session))
+        tasks = {primary}
+        result = None
+        try:
+            while tasks:
+                wake = min(deadline, hedge_at) if hedge_at is not None else deadline
+                done, tasks = await asyncio.wait(
+                    tasks, timeout=max(0.0, wake - time.monotonic()), return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    summary, snapshots = task.result()
+                    if result is None or not summary["error"]:
+                        result = (summary, snapshots)
+                        if not summary["error"] and task is not primary:
+                            budget.stats["hedge_wins"] += 1
+                if result is not None and not result[0]["error"]:
+                    break
+                if time.monotonic() >= deadline:
+                    break
+                if hedge_at is not None and time.monotonic() >= hedge_at:
+                    hedge_at = None
+                    if not sessions.empty():  # only hedge on idle capacity
+                        budget.stats["hedged"] += 1
+                        print(f"  [{office}] slower than p95 ({hedge_after:.1f}s) — hedging")
+                        tasks.add(asyncio.create_task(attempt(office, sessions.get_nowait())))
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if result is None:
+            budget.stats["timeouts"] += 1
+            metrics.inc("bmv_scrapes_total", office=office, result="timeout")
+            print(f"  [{office}] timed out after {timeout:.1f}s")
+            return new_summary(office, f"Timed out scraping {office} after {timeout:.1f}s"), []
+        if not result[0]["error"]:
+            budget.latency.record(office, time.monotonic() - started)
+        return result
+
+    async def run_office(office: str) -> None:
+        summary, snapshots = await scrape_with_deadline(office)
+        attempts = 1
+        while summary["error"] and summary["retryable"]:
+            delay = budget.retry_delay(attempts)
+            if delay is None:
+                break
+            budget.stats["retries"] += 1
+            print(f"  [{office}] retrying in {delay:.1f}s: {summary['error']}")
+            await asyncio.sleep(delay)
+            summary, snapshots = await scrape_with_deadline(office)
+            attempts += 1
+        summary["attempts"] = attempts
+        summaries.append(summary)
+        for snapshot in snapshots:
+            writes.append((summary, writer.submit(snapshot)))
+
+        totals["golden"] += summary["golden"]
+        totals["future"] += summary["future"]
 
         if summary["error"]:
-            errors.append({"office": office, "error": summary["error"]})
-            print(f"  ERROR: {summary['error']}")
+            errors.append({"office": office, "error": summary["error"], "attempts": attempts})
+            print(f"  [{office}] ERROR: {summary['error']}")
         else:
-            print(f"  Golden: {summary['golden']} | Future: {summary['future']} "
-                  f"| New alerts: {len(summary['new_golden'])}")
-
-        # Send email alerts for new golden slots
-        if summary["new_golden"]:
-            subscribers = db.get_active_subscribers(db_client, office)
-            for slot in summary["new_golden"]:
-                alerts.send_golden_alert(
-                    to_emails=subscribers,
-                    office=office,
-                    appt_date=slot["date"],
-                    appt_time=slot["time"],
-                    book_url=BMV_URL,
-                )
+            print(f"  [{office}] Golden: {summary['golden']} | Future: {summary['future']}")
+
+    started = time.monotonic()
+    try:
+        await asyncio.gather(*(run_office(office) for office in offices))
+    finally:
+        session_stats = engines.session_stats()
+        if owns_engines:
+            await engines.close()
+        if owns_pool:
+            await pool.close()
+    elapsed = time.monotonic() - started
+
+    # ── Wait for the writer, then fill in what it found ───────────────────────
+    if writes:
+        await asyncio.wait([future for _, future in writes], timeout=WRITER_DRAIN_TIMEOUT)
+    pending_writes = 0
+    for summary, future in writes:
+        outcome = future.result() if future.done() else None
+        if outcome is None:
+            pending_writes += 1
+            continue
+        summary["new_golden"] += outcome.new_golden
+        summary["gone_golden"] += outcome.gone_golden
 
-        # Small pause between offices (polite scraping)
-        await asyncio.sleep(2)
+    total_golden = totals["golden"]
+    total_future = totals["future"]
 
-    db.finish_scrape_run(
-        db_client,
-        run_id=run_id,
-        offices_scraped=len(OFFICES),
-        golden_found=total_golden,
-        future_found=total_future,
-        errors=errors,
-    )
+    run.add(len(offices), total_golden, total_future, errors)
+    if owns_run:
+        slot_events, snapshot_version = run.finish(writer)
+    stored = SNAPSHOT_STORE.flush() if SNAPSHOT_STORE is not None else 0
+
+    if owns_writer:
+        await writer.drain(timeout=WRITER_DRAIN_TIMEOUT)
+        await writer.close()
+
+    if owns_dispatcher:
+        await dispatcher.drain(timeout=ALERT_DRAIN_TIMEOUT)
+        await dispatcher.close()
 
     print(f"\n{'='*60}")
-    print(f"Done. Golden: {total_golden} | Future: {total_future} | Errors: {len(errors)}")
+    print(f"Done in {elapsed:.1f}s. Golden: {total_golden} | Future: {total_future} | Errors: {len(errors)}")
+    print(f"Browser pool: {pool.report()}")
+    print(f"Alerts: queued={dispatcher.queue_depth} "
+          + " ".join(f"{k}={v}" for k, v in dispatcher.stats.items()))
+    print(f"Writer: pending={pending_writes} journaled={len(writer.journal)} "
+          + " ".join(f"{k}={v}" for k, v in writer.stats.items()))
+    if owns_run:
+        print(f"Slot stats: {slot_events} events")
+    if owns_run and PUBLISH_SNAPSHOT:
+        print(f"Public snapshot: version={snapshot_version or PUBLISHER.version} "
+              + " ".join(f"{k}={v}" for k, v in PUBLISHER.stats.items()))
+    print(f"Sweep budget: remaining={budget.remaining():.0f}s "
+          + " ".join(f"{k}={v}" for k, v in budget.stats.items()))
+    if SNAPSHOT_STORE is not None:
+        print(f"Snapshot store: {stored} scrapes appended "
+              + " ".join(f"{k}={v}" for k, v in SNAPSHOT_STORE.stats.items()))
+    print("State cache: " + " ".join(f"{k}={v}" for k, v in writer.cache.stats.items()))
+    print("Service page: " + " ".join(f"{k}={v}" for k, v in session_stats.items()))
+    if http is not None:
+        print("HTTP fast path: " + " ".join(f"{k}={v}" for k, v in http.stats.items()))
     print(f"{'='*60}\n")
+    return summaries
 
 
 if __name__ == "__main__":
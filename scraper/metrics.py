@@ -0,0 +1,208 @@
+"""
+In-process timing spans, counters and histograms for the scraper.
+
+Everything records into one module-level Registry (REGISTRY) so main.py,
+db.py and alerts.py can instrument without passing objects around:
+
+  with metrics.span("bmv_db_seconds", op="reconcile_office"): ...
+  metrics.inc("bmv_emails_total", len(batch), result="sent")
+  metrics.observe("bmv_step_seconds", 0.42, step="date_time")
+
+Two views of the same data:
+  - cumulative counters / histograms, rendered in the Prometheus text format
+    by serve() (runner.py starts it when METRICS_PORT is set)
+  - a per-run breakdown (count / total / max ms per span, plus per-office
+    totals) that main() resets at the start of a sweep and stores in
+    scrape_runs.timings
+
+Stdlib only; histogram buckets are fixed and shared by every latency metric.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))  # 0 = no endpoint
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    "bmv_step_seconds": "Latency of one form step, extraction or HTTP fast-path fetch",
+    "bmv_office_seconds": "Wall time to scrape one office",
+    "bmv_db_seconds": "Latency of one db.py operation",
+    "bmv_email_seconds": "Latency of one Resend batch send",
+    "bmv_write_lag_seconds": "Time from scrape to its snapshot being written",
+    "bmv_scrapes_total": "Office scrapes by result",
+    "bmv_db_calls_total": "DB round trips by operation",
+    "bmv_emails_total": "Alert emails by result",
+    "bmv_new_golden_total": "New golden slots seen",
+    "bmv_writes_total": "Office snapshots by write result",
+}
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(labels: Labels, extra: tuple[str, str] | None = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, Labels], float] = {}
+        self._histograms: dict[tuple[str, Labels], _Histogram] = {}
+        self._run: dict[str, list[float]] = {}          # span key → [count, total ms, max ms]
+        self._run_offices: dict[str, float] = {}        # office → ms
+        self._run_started = time.monotonic()
+
+    # ── Recording ────────────────────────────────────────────────────────────
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        key = (name, _labels(labels))
+        # Per-run breakdown is keyed by metric + its most specific non-office label
+        run_key = name.removeprefix("bmv_").removesuffix("_seconds")
+        detail = labels.get("step") or labels.get("op")
+        if detail:
+            run_key = f"{run_key}.{detail}"
+        ms = seconds * 1000
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = _Histogram()
+            hist.observe(seconds)
+            agg = self._run.get(run_key)
+            if agg is None:
+                self._run[run_key] = [1, ms, ms]
+            else:
+                agg[0] += 1
+                agg[1] += ms
+                agg[2] = max(agg[2], ms)
+            if name == "bmv_office_seconds" and "office" in labels:
+                self._run_offices[labels["office"]] = round(ms, 1)
+
+    @contextmanager
+    def span(self, name: str, **labels) -> Iterator[None]:
+        """Time the block into histogram `name`, whether or not it raises."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started, **labels)
+
+    # ── Per-run breakdown ────────────────────────────────────────────────────
+
+    def start_run(self) -> None:
+        with self._lock:
+            self._run = {}
+            self._run_offices = {}
+            self._run_started = time.monotonic()
+
+    def run_breakdown(self) -> dict:
+        """Compact summary of this run for scrape_runs.timings: {span: [n, total ms, max ms]}."""
+        with self._lock:
+            return {
+                "wall_ms": round((time.monotonic() - self._run_started) * 1000, 1),
+                "spans": {k: [int(n), round(total, 1), round(peak, 1)]
+                          for k, (n, total, peak) in sorted(self._run.items())},
+                "offices": dict(sorted(self._run_offices.items())),
+            }
+
+    # ── Exposition ───────────────────────────────────────────────────────────
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (k, (list(h.counts), h.sum, h.count)) for k, h in self._histograms.items()
+            )
+
+        lines: list[str] = []
+        typed: set[str] = set()
+
+        def header(name: str, kind: str) -> None:
+            if name not in typed:
+                typed.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_fmt_labels(labels)} {value:g}")
+        for (name, labels), (counts, total, count) in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, n in zip(BUCKETS, counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_fmt_labels(labels, ('le', f'{bound:g}'))} {cumulative}")
+            lines.append(f"{name}_bucket{_fmt_labels(labels, ('le', '+Inf'))} {count}")
+            lines.append(f"{name}_sum{_fmt_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+span = REGISTRY.span
+start_run = REGISTRY.start_run
+run_breakdown = REGISTRY.run_breakdown
+
+
+def serve(port: int = METRICS_PORT, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve GET /metrics from a daemon thread. Returns the server (call shutdown() to stop)."""
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    return server
@@ -0,0 +1,277 @@
+"""
+Event-driven walk through the BMV (cxmflow/Qflow) booking form.
+
+Each screen of the form is a Step: an action that leaves the previous screen
+plus a readiness predicate that says when the next one is usable. Steps wait
+only as long as the site actually takes (bounded by a per-step timeout) and
+record their own latency, instead of sleeping a fixed 1.5–2s after every click.
+
+    Welcome → Location → Service → Appointment Type → Date & Time
+
+With several appointment types, each one after the first is one history back
+to the Appointment Type list plus one click (back_to_types_step).
+"""
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from playwright.async_api import Page, TimeoutError as PlaywrightTimeout
+
+ITEM = ".QflowObjectItem"
+SLOT = ".ServiceAppointmentDateTime[data-datetime]"
+
+# Cheap fingerprint of "which screen are we on": URL plus the visible item labels.
+# Every transition in the form swaps the item list, so a change here means the
+# click landed even when the URL stays the same.
+_FINGERPRINT_JS = """() => location.href + '|' + Array.from(
+    document.querySelectorAll('.QflowObjectItem'),
+    e => e.textContent.trim()
+).join('|').slice(0, 4000)"""
+
+
+class NavigationError(Exception):
+    """The form didn't reach the expected screen."""
+
+
+class ItemNotFound(NavigationError):
+    """A .QflowObjectItem we need to click isn't on the page."""
+
+
+class StepTimeout(NavigationError):
+    def __init__(self, step: str, timeout_ms: int):
+        super().__init__(f"step '{step}' not ready after {timeout_ms}ms")
+        self.step = step
+
+
+# ── Readiness predicates ─────────────────────────────────────────────────────
+# arm() runs before the step's action (to snapshot state / start listening),
+# wait() runs after it and returns once the page is ready.
+
+class Ready(ABC):
+    async def arm(self, page: Page) -> None:
+        pass
+
+    @abstractmethod
+    async def wait(self, page: Page, timeout_ms: int) -> None:
+        ...
+
+
+class Selector(Ready):
+    """Ready when a selector (optionally containing text) reaches the given state."""
+
+    def __init__(self, selector: str, has_text: str | None = None, state: str = "visible"):
+        self.selector = selector
+        self.has_text = has_text
+        self.state = state
+
+    async def wait(self, page: Page, timeout_ms: int) -> None:
+        locator = page.locator(self.selector)
+        if self.has_text:
+            locator = locator.filter(has_text=self.has_text)
+        await locator.first.wait_for(state=self.state, timeout=timeout_ms)
+
+
+class BodyText(Ready):
+    """Ready when the page body contains a piece of text."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    async def wait(self, page: Page, timeout_ms: int) -> None:
+        await page.wait_for_function(
+            "t => document.body && document.body.innerText.includes(t)",
+            arg=self.text,
+            timeout=timeout_ms,
+        )
+
+
+class DomChanged(Ready):
+    """Ready once the screen fingerprint differs from what it was before the action."""
+
+    def __init__(self):
+        self._before: str | None = None
+
+    async def arm(self, page: Page) -> None:
+        try:
+            self._before = await page.evaluate(_FINGERPRINT_JS)
+        except Exception:
+            self._before = None  # no document yet (first goto)
+
+    async def wait(self, page: Page, timeout_ms: int) -> None:
+        await page.wait_for_function(
+            f"before => ({_FINGERPRINT_JS})() !== before",
+            arg=self._before,
+            timeout=timeout_ms,
+        )
+
+
+class AllOf(Ready):
+    """Ready when every predicate is ready (checked in order, sharing one deadline)."""
+
+    def __init__(self, *preds: Ready):
+        self.preds = preds
+
+    async def arm(self, page: Page) -> None:
+        for p in self.preds:
+            await p.arm(page)
+
+    async def wait(self, page: Page, timeout_ms: int) -> None:
+        deadline = time.monotonic() + timeout_ms / 1000
+        for p in self.preds:
+            remaining = max(1, int((deadline - time.monotonic()) * 1000))
+            await p.wait(page, remaining)
+
+
+class AnyOf(Ready):
+    """Ready when the first of several predicates is ready."""
+
+    def __init__(self, *preds: Ready):
+        self.preds = preds
+
+    async def arm(self, page: Page) -> None:
+        for p in self.preds:
+            await p.arm(page)
+
+    async def wait(self, page: Page, timeout_ms: int) -> None:
+        tasks = [asyncio.ensure_future(p.wait(page, timeout_ms)) for p in self.preds]
+        try:
+            pending = set(tasks)
+            last_error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        return
+                    last_error = t.exception()
+            raise last_error
+        finally:
+            for t in tasks:
+                t.cancel()
+
+
+# ── Steps ────────────────────────────────────────────────────────────────────
+
+@dataclass
+class Step:
+    name: str
+    action: Callable[[Page], Awaitable[None]]
+    ready: Ready
+    timeout_ms: int = 10000
+
+
+def welcome_step(url: str) -> Step:
+    async def action(page: Page) -> None:
+        await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+
+    return Step("welcome", action, Selector(ITEM), timeout_ms=30000)
+
+
+def location_step() -> Step:
+    async def action(page: Page) -> None:
+        await page.locator(ITEM).first.click()
+
+    return Step("location", action, AllOf(DomChanged(), Selector(".next-button", state="attached")))
+
+
+def _service_ready() -> Ready:
+    return Selector(ITEM, has_text=" Appts")
+
+
+def service_step() -> Step:
+    async def action(page: Page) -> None:
+        # Next with no office selected → Service page listing every "{office} Appts"
+        await page.evaluate("document.querySelector('.next-button').click()")
+
+    return Step("service", action, AllOf(DomChanged(), _service_ready()))
+
+
+def back_to_service_step() -> Step:
+    """Date & Time → (back) Appointment Type → (back) Service, within the same session."""
+    async def action(page: Page) -> None:
+        for _ in range(2):
+            if await page.go_back(wait_until="domcontentloaded") is None:
+                raise NavigationError("no history to go back to")
+
+    return Step("back_to_service", action, AllOf(DomChanged(), _service_ready()), timeout_ms=5000)
+
+
+def restore_service_step(url: str) -> Step:
+    """Load a saved Service page URL in a context restored from a storage_state snapshot."""
+    async def action(page: Page) -> None:
+        await page.goto(url, wait_until="domcontentloaded", timeout=15000)
+
+    return Step("restore_service", action, _service_ready(), timeout_ms=8000)
+
+
+async def _click_item(page: Page, text: str, missing: str) -> None:
+    item = page.locator(ITEM).filter(has_text=text)
+    if await item.count() == 0:
+        raise ItemNotFound(missing)
+    await item.first.click()
+
+
+def office_step(office: str) -> Step:
+    async def action(page: Page) -> None:
+        await _click_item(page, f"{office} Appts", f"'{office} Appts' not found on service page")
+
+    return Step("appointment_type", action, AllOf(DomChanged(), Selector(ITEM)))
+
+
+def back_to_types_step(office: str) -> Step:
+    """Date & Time → (back) the office's Appointment Type list, to pick the next type."""
+    async def action(page: Page) -> None:
+        if await page.go_back(wait_until="domcontentloaded") is None:
+            raise NavigationError(f"no history back to {office}'s appointment types")
+
+    return Step("back_to_types", action, AllOf(DomChanged(), Selector(ITEM)), timeout_ms=5000)
+
+
+def appointment_type_step(office: str, appt_type: str) -> Step:
+    async def action(page: Page) -> None:
+        await _click_item(page, appt_type, f"'{appt_type}' not found for {office}")
+
+    # An office with no openings still renders the "Choose a Date" screen, just without slots
+    ready = AllOf(DomChanged(), AnyOf(Selector(SLOT, state="attached"), BodyText("Choose a Date")))
+    return Step("date_time", action, ready, timeout_ms=15000)
+
+
+# ── Runner ───────────────────────────────────────────────────────────────────
+
+@dataclass
+class Navigator:
+    """
+    Runs steps against one page and records per-step latency (ms) in `timings`,
+    summed when a step runs more than once (one date_time per appointment type).
+    `before_action` is awaited before every action — used for host throttling.
+    """
+    page: Page
+    before_action: Callable[[], Awaitable[None]] | None = None
+    timings: dict[str, float] = field(default_factory=dict)
+
+    async def run(self, step: Step) -> None:
+        await step.ready.arm(self.page)
+        if self.before_action is not None:
+            await self.before_action()
+
+        started = time.monotonic()
+        await step.action(self.page)
+        try:
+            await step.ready.wait(self.page, step.timeout_ms)
+        except PlaywrightTimeout:
+            raise StepTimeout(step.name, step.timeout_ms) from None
+        finally:
+            elapsed = (time.monotonic() - started) * 1000
+            self.timings[step.name] = round(self.timings.get(step.name, 0.0) + elapsed, 1)
+
+    async def to_service(self, url: str) -> None:
+        """Welcome → Location → Service."""
+        await self.run(welcome_step(url))
+        await self.run(location_step())
+        await self.run(service_step())
+
+    async def to_slots(self, office: str, appt_type: str) -> None:
+        """Service → Appointment Type → Date & Time."""
+        await self.run(office_step(office))
+        await self.run(appointment_type_step(office, appt_type))
@@ -4,6 +4,8 @@ Probe step 2: understand Date & Time DOM structure for slot extraction + paginat
 import asyncio
 from playwright.async_api import async_playwright
 
+from navigator import Navigator
+
 BMV_URL = "https://mainebmvappt.cxmflow.com/Appointment/Index/2c052fc7-571f-4b76-9790-7e91f103c408"
 TEST_OFFICE = "Portland"
 
@@ -11,26 +13,10 @@ TEST_OFFICE = "Portland"
 async def navigate_to_slots(page):
     """Navigate to the slot page for Portland, Driver's License."""
     print("→ Loading...")
-    await page.goto(BMV_URL, wait_until="domcontentloaded", timeout=30000)
-    await page.wait_for_timeout(1500)
-
-    # Step 1: I Agree
-    await page.locator(".QflowObjectItem").first.click()
-    await page.wait_for_timeout(1500)
-
-    # Step 2: JS Next → Service page
-    await page.evaluate("document.querySelector('.next-button').click()")
-    await page.wait_for_timeout(1500)
-
-    # Step 3: Click Portland Appts
-    await page.locator(".QflowObjectItem").filter(has_text=f"{TEST_OFFICE} Appts").first.click()
-    await page.wait_for_timeout(1500)
-
-    # Step 4: Click Driver's License
-    dl = page.locator(".QflowObjectItem").filter(has_text="Driver's License")
-    await dl.first.click()
-    await page.wait_for_timeout(2000)
-    print("→ On Date & Time page")
+    nav = Navigator(page)
+    await nav.to_service(BMV_URL)
+    await nav.to_slots(TEST_OFFICE, "Driver's License")
+    print("→ On Date & Time page — " + ", ".join(f"{k} {v:.0f}ms" for k, v in nav.timings.items()))
 
 
 async def probe():
@@ -0,0 +1,92 @@
+"""
+The precomputed snapshot the website reads, published once per sweep.
+
+Instead of every open tab re-querying appointments on every realtime event,
+main() ends each sweep by building one compact JSON document from the live
+rows (two SELECTs) and storing it in the single-row public_snapshot table:
+
+  slots    every available golden row and each office's current closest
+           future row: id, office, appointment_type, slot_type, date, time,
+           first_seen_at
+  offices  office_status per office and type: last_checked_at and counts
+  last_checked_at  newest of those, for "Last checked"
+
+publish_public_snapshot (schema.sql) bumps public_snapshot.version only when
+the checksum differs from the stored one, so clients (subscribed to that one
+row) are notified at most once per sweep, however many rows the sweep wrote.
+"""
+import hashlib
+import json
+import os
+
+import db
+
+PUBLISH_SNAPSHOT = os.environ.get("PUBLISH_SNAPSHOT", "true").lower() == "true"
+
+
+def build_payload(slots: list[dict], status: list[dict]) -> dict:
+    golden = sorted(
+        (r for r in slots if r["slot_type"] == "golden"),
+        key=lambda r: (r["appointment_date"], r["appointment_time"] or "", r["office"], r["appointment_type"]),
+    )
+    future = sorted(
+        (r for r in slots if r["slot_type"] == "future"),
+        key=lambda r: (r["office"], r["appointment_type"]),
+    )
+    offices = sorted(status, key=lambda r: (r["office"], r["appointment_type"]))
+    return {
+        "slots": [{
+            "id": r["id"],
+            "office": r["office"],
+            "appointment_type": r["appointment_type"],
+            "slot_type": r["slot_type"],
+            "appointment_date": r["appointment_date"],
+            "appointment_time": r["appointment_time"],
+            "first_seen_at": r["first_seen_at"],
+        } for r in golden + future],
+        "offices": [{
+            "office": r["office"],
+            "appointment_type": r["appointment_type"],
+            "last_checked_at": r["last_checked_at"],
+            "golden_count": r["golden_count"],
+            "future_count": r["future_count"],
+        } for r in offices],
+        "last_checked_at": max((r["last_checked_at"] for r in offices), default=None),
+    }
+
+
+def checksum(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+class SnapshotPublisher:
+    """Remembers the last checksum it published, so an unchanged snapshot costs no write."""
+
+    def __init__(self):
+        self.last_checksum: str | None = None
+        self.version: int | None = None
+        self.stats = {"published": 0, "unchanged": 0, "failed": 0}
+
+    def publish(self, db_client) -> int | None:
+        """Build and publish the snapshot. Returns the new version, None if unchanged or failed."""
+        try:
+            payload = build_payload(*db.load_public_rows(db_client))
+            digest = checksum(payload)
+            if digest == self.last_checksum:
+                self.stats["unchanged"] += 1
+                return None
+            version = db.publish_public_snapshot(db_client, payload, digest)
+        except Exception as e:
+            self.stats["failed"] += 1
+            print(f"  [snapshot] publish failed: {e}", flush=True)
+            return None
+        self.last_checksum = digest
+        if version is None:
+            self.stats["unchanged"] += 1
+            return None
+        self.version = version
+        self.stats["published"] += 1
+        return version
+
+
+PUBLISHER = SnapshotPublisher()
@@ -0,0 +1,188 @@
+"""
+Replay archived raw scrapes (snapshot_store.py) through the reconcile logic, offline.
+
+Re-derives the appointments history the scraper would have written, with the
+current golden / future rules or different ones, without touching the live
+site and, unless asked to, the DB:
+
+  python reprocess.py                                      # summary of everything stored
+  python reprocess.py --since 2026-10-01 --golden-days 5 --out rows.jsonl.gz
+  python reprocess.py --gone-after-misses 1 --stats-out stats.json
+  python reprocess.py --upload appointments_rebuild        # a table created "like appointments"
+
+Each stored scrape goes through slots.split_slots and db.plan_reconcile, the
+code the writer uses, with the scrape's own time as "now". The plans are
+applied to an in-memory table instead of Supabase, so a month of sweeps
+replays in seconds. As in the writer, a scrape whose fingerprint matches
+the previous one, with no misses pending, only counts as a heartbeat.
+"""
+import argparse
+import gzip
+import json
+import time
+import uuid
+from datetime import date, datetime, timezone
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import db
+from db import OfficeState, ReconcilePlan
+from slots import SlotSplit, split_slots
+from snapshot_store import SNAPSHOT_STORE_DIR, RawSnapshot, read_snapshots
+from stats import SlotStats
+
+REPROCESS_BATCH = 500
+
+
+class MemoryAppointments:
+    """The appointments table, as far as reconcile_office's writes go."""
+
+    def __init__(self):
+        self.rows: dict[str, dict] = {}
+        self._golden: dict[tuple, str] = {}  # uq_golden_slot key → id
+
+    def _insert(self, values: dict) -> dict:
+        row = {"id": str(uuid.uuid4()), "replaced_at": None, "replaced_by_date": None, "missed_since": None, **values}
+        self.rows[row["id"]] = row
+        return row
+
+    def _update(self, ids: list[str], payload: dict) -> None:
+        for row_id in ids:
+            self.rows[row_id].update(payload)
+
+    def apply(self, plan: ReconcilePlan) -> tuple[list[dict], dict | None]:
+        """reconcile_office's writes for one plan. Returns (upserted rows, inserted future row)."""
+        upserted = []
+        for values in plan.upsert_rows():
+            key = tuple(values[k] for k in db.GOLDEN_CONFLICT_KEY.split(","))
+            row_id = self._golden.get(key)
+            if row_id is None:
+                # first_seen_at isn't in the payload; on insert the column default (now) applies
+                row = self._insert({"first_seen_at": plan.now, **values})
+                self._golden[key] = row["id"]
+            else:
+                row = self.rows[row_id]
+                row.update(values)
+            upserted.append(row)
+        if plan.retire_future:
+            old_id, payload = plan.retire_future
+            self._update([old_id], payload)
+        future_row = self._insert(plan.future_row()) if plan.insert_future else None
+        self._update(plan.refresh_ids, plan.refresh_payload())
+        self._update(plan.missed_ids, plan.missed_payload())
+        for payload, ids in plan.gone_updates():
+            self._update(ids, payload)
+        return upserted, future_row
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def reprocess(
+    snapshots,
+    golden_days: int = db.GOLDEN_THRESHOLD_DAYS,
+    gone_after_misses: int = db.GONE_AFTER_MISSES,
+    gone_after_seconds: int = db.GONE_AFTER_SECONDS,
+) -> tuple[MemoryAppointments, SlotStats, dict]:
+    table = MemoryAppointments()
+    slot_stats = SlotStats()
+    states: dict[tuple[str, str], OfficeState] = {}
+    fingerprints: dict[tuple[str, str], str] = {}
+    # Unchanged scrapes come back from the store as the very same tuple: split it once per day
+    splits: dict[tuple[str, str], tuple[tuple[str, ...], date, SlotSplit, str]] = {}
+    counts = {"scrapes": 0, "heartbeats": 0, "reconciles": 0, "appeared": 0, "gone": 0}
+
+    snapshot: RawSnapshot
+    for snapshot in snapshots:
+        counts["scrapes"] += 1
+        key = (snapshot.office, snapshot.appointment_type)
+        today = datetime.fromtimestamp(snapshot.scraped_at, timezone.utc).date()
+        cached = splits.get(key)
+        if cached is not None and cached[0] is snapshot.slots and cached[1] == today:
+            _, _, slots, fingerprint = cached
+        else:
+            slots = split_slots(list(snapshot.slots), today, golden_days)
+            fingerprint = slots.fingerprint
+            splits[key] = (snapshot.slots, today, slots, fingerprint)
+        state = states.setdefault(key, OfficeState())
+        if not state.misses and fingerprints.get(key) == fingerprint:
+            counts["heartbeats"] += 1
+            continue
+
+        plan = db.plan_reconcile(
+            snapshot.office, set(slots.golden), slots.closest_future, state, snapshot.appointment_type,
+            now=_iso(snapshot.scraped_at),
+            gone_after_misses=gone_after_misses, gone_after_seconds=gone_after_seconds,
+        )
+        result = plan.finish(*table.apply(plan), calls=0)
+        states[key] = result.state
+        fingerprints[key] = fingerprint
+        slot_stats.record(snapshot.office, snapshot.appointment_type, result)
+        counts["reconciles"] += 1
+        counts["appeared"] += len(result.new_golden)
+        counts["gone"] += len(result.gone_golden)
+    return table, slot_stats, counts
+
+
+def write_rows(path: str, rows: list[dict]) -> None:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, separators=(",", ":")) + "\n")
+
+
+def upload_rows(db_client, table: str, rows: list[dict], batch: int = REPROCESS_BATCH) -> None:
+    for i in range(0, len(rows), batch):
+        db_client.table(table).upsert(rows[i:i + batch], on_conflict="id").execute()
+        print(f"  uploaded {min(i + batch, len(rows))}/{len(rows)} rows", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--dir", default=SNAPSHOT_STORE_DIR, help="snapshot store (default: SNAPSHOT_STORE_DIR)")
+    parser.add_argument("--since", type=date.fromisoformat, help="first UTC day to replay")
+    parser.add_argument("--until", type=date.fromisoformat, help="last UTC day to replay")
+    parser.add_argument("--offices", help="comma-separated; default all")
+    parser.add_argument("--types", help="comma-separated appointment types; default all")
+    parser.add_argument("--golden-days", type=int, default=db.GOLDEN_THRESHOLD_DAYS)
+    parser.add_argument("--gone-after-misses", type=int, default=db.GONE_AFTER_MISSES)
+    parser.add_argument("--gone-after-seconds", type=int, default=db.GONE_AFTER_SECONDS)
+    parser.add_argument("--out", metavar="PATH", help="write the derived rows as JSON lines (.gz to compress)")
+    parser.add_argument("--stats-out", metavar="PATH", help="write the derived slot_stats increments as JSON")
+    parser.add_argument("--upload", metavar="TABLE", help="upsert the derived rows into this table")
+    parser.add_argument("--batch", type=int, default=REPROCESS_BATCH)
+    args = parser.parse_args()
+    if not args.dir:
+        parser.error("no snapshot store: pass --dir or set SNAPSHOT_STORE_DIR")
+
+    offices = set(args.offices.split(",")) if args.offices else None
+    types = set(args.types.split(",")) if args.types else None
+    snapshots = (
+        s for s in read_snapshots(args.dir, args.since, args.until)
+        if (offices is None or s.office in offices) and (types is None or s.appointment_type in types)
+    )
+
+    started = time.perf_counter()
+    table, slot_stats, counts = reprocess(snapshots, args.golden_days, args.gone_after_misses, args.gone_after_seconds)
+    elapsed = time.perf_counter() - started
+    rows = sorted(table.rows.values(), key=lambda r: (r["first_seen_at"], r["office"], r["appointment_date"]))
+
+    print(f"Replayed {counts['scrapes']} scrapes in {elapsed:.1f}s "
+          f"({counts['scrapes'] / max(elapsed, 1e-9):.0f}/s): "
+          + " ".join(f"{k}={v}" for k, v in counts.items() if k != "scrapes"))
+    print(f"Rows: {len(rows)} ({sum(1 for r in rows if r['slot_type'] == 'golden')} golden, "
+          f"{sum(1 for r in rows if r['available'])} still available); "
+          f"slot_stats events: {slot_stats.pending}")
+
+    if args.out:
+        write_rows(args.out, rows)
+        print(f"Wrote {args.out}")
+    if args.stats_out:
+        with open(args.stats_out, "w") as f:
+            json.dump(slot_stats.deltas(), f, indent=2)
+        print(f"Wrote {args.stats_out}")
+    if args.upload:
+        upload_rows(db.get_client(), args.upload, rows, args.batch)
@@ -0,0 +1,204 @@
+"""
+Playwright request routing for scraper contexts.
+
+The scraper only reads DOM attributes and clicks .QflowObjectItem elements, so:
+  - resource types in BLOCK_RESOURCE_TYPES (images, fonts, media by default)
+    and any request to a host in BLOCK_HOSTS (analytics, tag managers) are aborted
+  - the site's own scripts and stylesheets are served from an on-disk cache in
+    ASSET_CACHE_DIR, shared by every context and every browser the pool launches
+
+Cached assets are revalidated against the site at most every ASSET_REVALIDATE
+seconds with If-None-Match / If-Modified-Since. A 304 keeps the cached copy; a
+200 whose body differs replaces it and is logged, so a site deploy shows up in
+the output (and stats["changed"]) instead of silently.
+Everything else (documents, XHR, form posts) goes to the network untouched.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+from playwright.async_api import Request, Route
+
+import metrics
+
+
+def _env_list(name: str, default: str) -> frozenset[str]:
+    return frozenset(v.strip().lower() for v in os.environ.get(name, default).split(",") if v.strip())
+
+
+RESOURCE_POLICY = os.environ.get("RESOURCE_POLICY", "true").lower() == "true"
+BLOCK_RESOURCE_TYPES = _env_list("BLOCK_RESOURCE_TYPES", "image,media,font,manifest")
+BLOCK_HOSTS = _env_list(
+    "BLOCK_HOSTS",
+    "google-analytics.com,googletagmanager.com,doubleclick.net,facebook.net,"
+    "hotjar.com,clarity.ms,nr-data.net,newrelic.com",
+)
+CACHE_RESOURCE_TYPES = _env_list("CACHE_RESOURCE_TYPES", "script,stylesheet")
+ASSET_CACHE_DIR = os.environ.get("ASSET_CACHE_DIR", os.path.join(tempfile.gettempdir(), "bmv-asset-cache"))
+ASSET_REVALIDATE = int(os.environ.get("ASSET_REVALIDATE", "3600"))
+
+# Response headers worth replaying from the cache
+_KEEP_HEADERS = ("content-type", "etag", "last-modified", "cache-control")
+
+
+@dataclass
+class _Asset:
+    url: str
+    status: int
+    headers: dict[str, str]
+    body: bytes
+    digest: str
+    checked_at: float  # wall clock of last fetch / 304
+
+
+class ResourcePolicy:
+    """One instance per BrowserPool; install() on each new context."""
+
+    def __init__(
+        self,
+        block_types: frozenset[str] = BLOCK_RESOURCE_TYPES,
+        block_hosts: frozenset[str] = BLOCK_HOSTS,
+        cache_types: frozenset[str] = CACHE_RESOURCE_TYPES,
+        cache_dir: str | None = ASSET_CACHE_DIR,
+        revalidate: int = ASSET_REVALIDATE,
+    ):
+        self.block_types = block_types
+        self.block_hosts = block_hosts
+        self.cache_types = cache_types
+        self.cache_dir = cache_dir
+        self.revalidate = revalidate
+        self._assets: dict[str, _Asset] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.stats = {"blocked": 0, "cache_hits": 0, "fetched": 0, "revalidated": 0,
+                      "changed": 0, "passed": 0, "bytes_saved": 0}
+
+    async def install(self, context) -> None:
+        await context.route("**/*", self._handle)
+
+    # ── Routing ──────────────────────────────────────────────────────────────
+
+    def _blocked(self, request: Request) -> bool:
+        if request.resource_type in self.block_types:
+            return True
+        host = (urlsplit(request.url).hostname or "").lower()
+        return any(host == h or host.endswith("." + h) for h in self.block_hosts)
+
+    def _count(self, key: str, n: int = 1) -> None:
+        self.stats[key] += n
+        metrics.inc("bmv_assets_total", n, result=key)
+
+    async def _handle(self, route: Route, request: Request) -> None:
+        try:
+            if self._blocked(request):
+                self._count("blocked")
+                await route.abort("blockedbyclient")
+            elif self.cache_dir and request.method == "GET" and request.resource_type in self.cache_types:
+                await self._serve_cached(route, request)
+            else:
+                self.stats["passed"] += 1
+                await route.continue_()
+        except Exception as e:
+            # Context closed mid-request, or the route was already handled; nothing to do
+            if "closed" not in str(e).lower() and "already handled" not in str(e).lower():
+                print(f"  [assets] routing {request.url} failed: {e}", flush=True)
+
+    async def _serve_cached(self, route: Route, request: Request) -> None:
+        url = request.url
+        lock = self._locks.setdefault(url, asyncio.Lock())
+        async with lock:
+            asset = self._assets.get(url) or self._load(url)
+            if asset is not None and time.time() - asset.checked_at < self.revalidate:
+                self._count("cache_hits")
+                self.stats["bytes_saved"] += len(asset.body)
+                await route.fulfill(status=asset.status, headers=asset.headers, body=asset.body)
+                return
+
+            headers = dict(request.headers)
+            if asset is not None:
+                if asset.headers.get("etag"):
+                    headers["if-none-match"] = asset.headers["etag"]
+                if asset.headers.get("last-modified"):
+                    headers["if-modified-since"] = asset.headers["last-modified"]
+            try:
+                response = await route.fetch(headers=headers)
+            except Exception:
+                if asset is None:
+                    await route.continue_()
+                    return
+                # Site unreachable for the asset: the cached copy is better than nothing
+                await route.fulfill(status=asset.status, headers=asset.headers, body=asset.body)
+                return
+
+            if response.status == 304 and asset is not None:
+                asset.checked_at = time.time()
+                self._save(asset, body=False)
+                self._count("revalidated")
+                self.stats["bytes_saved"] += len(asset.body)
+                await route.fulfill(status=asset.status, headers=asset.headers, body=asset.body)
+                return
+
+            body = await response.body()
+            if response.status == 200:
+                digest = hashlib.sha256(body).hexdigest()
+                if asset is not None and asset.digest != digest:
+                    self._count("changed")
+                    print(f"  [assets] {url} changed on the site ({asset.digest[:8]} → {digest[:8]})", flush=True)
+                fresh = _Asset(
+                    url=url,
+                    status=200,
+                    headers={k: v for k, v in response.headers.items() if k.lower() in _KEEP_HEADERS},
+                    body=body,
+                    digest=digest,
+                    checked_at=time.time(),
+                )
+                self._assets[url] = fresh
+                self._save(fresh)
+                self._count("fetched")
+            await route.fulfill(response=response, body=body)
+
+    # ── Disk cache ───────────────────────────────────────────────────────────
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest()[:32])
+
+    def _load(self, url: str) -> _Asset | None:
+        path = self._path(url)
+        try:
+            with open(path + ".json") as f:
+                meta = json.load(f)
+            with open(path + ".body", "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url or hashlib.sha256(body).hexdigest() != meta.get("digest"):
+            return None
+        asset = _Asset(url, meta["status"], meta["headers"], body, meta["digest"], meta["checked_at"])
+        self._assets[url] = asset
+        return asset
+
+    def _save(self, asset: _Asset, body: bool = True) -> None:
+        path = self._path(asset.url)
+        try:
+            if body:
+                with open(path + ".body.tmp", "wb") as f:
+                    f.write(asset.body)
+                os.replace(path + ".body.tmp", path + ".body")
+            meta = {"url": asset.url, "status": asset.status, "headers": asset.headers,
+                    "digest": asset.digest, "checked_at": asset.checked_at}
+            with open(path + ".json.tmp", "w") as f:
+                json.dump(meta, f)
+            os.replace(path + ".json.tmp", path + ".json")
+        except OSError as e:
+            print(f"  [assets] could not write cache for {asset.url}: {e}", flush=True)
+
+    def report(self) -> str:
+        s = dict(self.stats)
+        s["bytes_saved"] = f"{s['bytes_saved'] / 1024:.0f}KB"
+        return " ".join(f"{k}={v}" for k, v in s.items())
@@ -1,28 +1,98 @@
 """
 Persistent background worker for the Maine BMV scraper.
 Runs on Render as a long-lived process — no cold starts between scrapes.
-Loops every SCRAPE_INTERVAL seconds (default 600 = 10 minutes).
+By default offices are polled on an adaptive per-office schedule (scheduler.py)
+with SCRAPE_INTERVAL (default 600 = 10 minutes) as the base interval;
+SCHEDULE_MODE=fixed sweeps every office every SCRAPE_INTERVAL seconds instead.
+Chromium is launched once and shared across runs via BrowserPool, the
+browser sessions and HTTP fast path are kept in one ScrapeEngines, and each
+office's DB state is kept warm in a SlotStateCache between runs. In the
+adaptive schedule every SCRAPE_INTERVAL is one cycle: the batches of due
+offices in it share one scrape_runs row, and the public snapshot is
+republished when the cycle ends (or straight away when a batch turns up new
+golden slots). Alert
+emails go out from one AlertDispatcher in the background, to subscribers
+looked up through a SubscriberCache. DB writes go through one SlotWriter
+(journaled locally, so an outage only delays them). With OFFICE_LEASES=true
+several workers can run at once: each only scrapes the offices it holds a
+lease on (leases.py) and takes over a dead peer's. With METRICS_PORT set, step / office / DB /
+email latency histograms and counters are served at :METRICS_PORT/metrics in
+the Prometheus text format.
 """
 import asyncio
 import os
+import time
 from datetime import datetime, timezone
 
 SCRAPE_INTERVAL = int(os.environ.get("SCRAPE_INTERVAL", "600"))
+SCHEDULE_MODE = os.environ.get("SCHEDULE_MODE", "adaptive").lower()
 
 
 async def run_loop():
-    from main import main
+    from main import main, APPOINTMENT_TYPES, BMV_URL, OFFICES, ScrapeEngines
+    from browser_pool import BrowserPool
+    from state_cache import SlotStateCache
+    from alerts import AlertDispatcher
+    from subscribers import SubscriberCache
+    from writer import SlotWriter
+    from leases import OFFICE_LEASES, LeaseManager
+    import metrics
 
-    print(f"Maine BMV scraper started — interval: {SCRAPE_INTERVAL // 60} min", flush=True)
+    if metrics.METRICS_PORT:
+        metrics.serve(metrics.METRICS_PORT)
+        print(f"Metrics on :{metrics.METRICS_PORT}/metrics", flush=True)
 
+    print(f"Maine BMV scraper started — {SCHEDULE_MODE} schedule, "
+          f"interval: {SCRAPE_INTERVAL // 60} min", flush=True)
+
+    pool = BrowserPool()
+    dispatcher = AlertDispatcher()
+    cache = SlotStateCache()
+    subscriber_cache = SubscriberCache()
+    leases = LeaseManager(OFFICES) if OFFICE_LEASES else None
+    if leases is not None:
+        await leases.start()
+        print(f"Leases: {leases.report()}", flush=True)
+    writer = SlotWriter(cache, OFFICES, dispatcher, subscriber_cache, BMV_URL,
+                        appointment_types=APPOINTMENT_TYPES, leases=leases)
+    engines = ScrapeEngines(pool)
+    resources = {
+        "pool": pool,
+        "engines": engines,
+        "cache": cache,
+        "dispatcher": dispatcher,
+        "subscriber_cache": subscriber_cache,
+        "writer": writer,
+    }
+    try:
+        if SCHEDULE_MODE == "fixed":
+            await _loop(main, resources, leases)
+        else:
+            await _adaptive_loop(main, resources, leases)
+    finally:
+        await writer.drain(timeout=60)
+        await writer.close()
+        if leases is not None:
+            await leases.close()
+        await dispatcher.drain(timeout=60)
+        await dispatcher.close()
+        await engines.close()
+        await pool.close()
+
+
+async def _loop(main, resources: dict, leases=None) -> None:
     run_count = 0
     while True:
         run_count += 1
         now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
         print(f"\n{'='*50}\n[Run #{run_count}] {now}\n{'='*50}", flush=True)
 
+        offices = leases.held if leases is not None else None
         try:
-            await main()
+            if offices == []:
+                print(f"[Run #{run_count}] no office leases held — {leases.report()}", flush=True)
+            else:
+                await main(offices=offices, **resources)
         except Exception as e:
             print(f"[Run #{run_count} ERROR] {e}", flush=True)
 
@@ -31,5 +101,56 @@ async def run_loop():
         await asyncio.sleep(SCRAPE_INTERVAL)
 
 
+def _finish_cycle(run, writer) -> None:
+    try:
+        slot_events, version = run.finish(writer)
+    except Exception as e:
+        print(f"[Cycle ERROR] could not record the run: {e}", flush=True)
+        return
+    print(f"[Cycle done] offices={run.offices_scraped} golden={run.golden} future={run.future} "
+          f"errors={len(run.errors)} slot_stats={slot_events} snapshot={version or 'unchanged'}", flush=True)
+
+
+async def _adaptive_loop(main, resources: dict, leases=None) -> None:
+    import db
+    from main import OFFICES, ScrapeRun
+    from public_snapshot import PUBLISH_SNAPSHOT, PUBLISHER
+    from scheduler import OfficeScheduler
+
+    scheduler = OfficeScheduler(OFFICES, base_interval=SCRAPE_INTERVAL)
+    run_count = 0
+    run, cycle_ends = None, 0.0
+    try:
+        while True:
+            offices = scheduler.take_due(set(leases.held) if leases is not None else None)
+            if offices:
+                run_count += 1
+                now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+                print(f"\n{'='*50}\n[Run #{run_count}] {now} — {', '.join(offices)}\n{'='*50}", flush=True)
+                try:
+                    if run is None:
+                        run, cycle_ends = ScrapeRun(db.get_client()), time.monotonic() + SCRAPE_INTERVAL
+                    summaries = await main(offices=offices, run=run, banner=False, **resources)
+                    if PUBLISH_SNAPSHOT and any(s["new_golden"] for s in summaries):
+                        PUBLISHER.publish(run.db_client)
+                except Exception as e:
+                    print(f"[Run #{run_count} ERROR] {e}", flush=True)
+                    summaries = [{"office": o, "error": str(e)} for o in offices]
+                for summary in summaries:
+                    scheduler.record(summary)
+                print(f"[Next up: {scheduler.report()}]", flush=True)
+
+            if run is not None and time.monotonic() >= cycle_ends:
+                _finish_cycle(run, resources["writer"])
+                run = None
+            wake = scheduler.seconds_until_next()
+            if run is not None:
+                wake = min(wake, cycle_ends - time.monotonic())
+            await asyncio.sleep(max(1.0, wake))
+    finally:
+        if run is not None:
+            _finish_cycle(run, resources["writer"])
+
+
 if __name__ == "__main__":
     asyncio.run(run_loop())
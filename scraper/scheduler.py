@@ -0,0 +1,131 @@
+"""
+Adaptive per-office polling for runner.py.
+
+Instead of sweeping all 13 offices every SCRAPE_INTERVAL, each office has its
+own next-due time in a priority queue:
+
+  - offices with recent golden-slot churn (new or gone slots, decayed with a
+    CHURN_HALFLIFE) are polled more often, down to SCHEDULE_MIN_INTERVAL
+  - quiet offices drift out toward SCHEDULE_MAX_INTERVAL
+  - overnight in Maine (QUIET_HOURS) every interval is stretched by QUIET_FACTOR
+  - a failed scrape is retried at the minimum interval
+  - at most SCHEDULE_MAX_PER_MINUTE office scrapes start per minute overall,
+    so the request budget stays what it was with the fixed loop
+"""
+import heapq
+import math
+import os
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+SCRAPE_INTERVAL = int(os.environ.get("SCRAPE_INTERVAL", "600"))
+SCHEDULE_MIN_INTERVAL = int(os.environ.get("SCHEDULE_MIN_INTERVAL", "180"))
+SCHEDULE_MAX_INTERVAL = int(os.environ.get("SCHEDULE_MAX_INTERVAL", "1800"))
+# Default cap = the fixed loop's budget (every office once per SCRAPE_INTERVAL)
+SCHEDULE_MAX_PER_MINUTE = float(os.environ.get("SCHEDULE_MAX_PER_MINUTE", "0")) or None
+SCHEDULE_BURST = int(os.environ.get("SCHEDULE_BURST", "3"))
+CHURN_HALFLIFE = int(os.environ.get("CHURN_HALFLIFE", "3600"))
+QUIET_HOURS = (22, 6)  # local start/end hour
+QUIET_FACTOR = float(os.environ.get("QUIET_FACTOR", "3"))
+LOCAL_TZ = ZoneInfo("America/New_York")
+
+
+class OfficeScheduler:
+    def __init__(
+        self,
+        offices: list[str],
+        base_interval: int = SCRAPE_INTERVAL,
+        min_interval: int = SCHEDULE_MIN_INTERVAL,
+        max_interval: int = SCHEDULE_MAX_INTERVAL,
+        max_per_minute: float | None = SCHEDULE_MAX_PER_MINUTE,
+        burst: int = SCHEDULE_BURST,
+    ):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.max_per_minute = max_per_minute or len(offices) * 60 / max(1, base_interval)
+        self.burst = max(1, burst)
+
+        now = time.monotonic()
+        # Everything is due at start; the rate cap spreads the first round out
+        self._heap: list[tuple[float, str]] = [(now, o) for o in offices]
+        heapq.heapify(self._heap)
+
+        self._churn: dict[str, float] = {o: 0.0 for o in offices}
+        self._churn_at: dict[str, float] = {o: now for o in offices}
+        self._tokens = float(self.burst)
+        self._tokens_at = now
+
+    # ── Rate cap (token bucket: max_per_minute refill, `burst` capacity) ────
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._tokens_at) * self.max_per_minute / 60)
+        self._tokens_at = now
+
+    # ── Queue ────────────────────────────────────────────────────────────────
+
+    def take_due(self, allowed: set[str] | None = None) -> list[str]:
+        """
+        Pop every office that is due, as far as the rate cap allows. Due offices
+        not in `allowed` (leased to another worker) are pushed back by the
+        minimum interval without using up the rate cap.
+        """
+        now = time.monotonic()
+        self._refill(now)
+        due, skipped = [], []
+        while self._heap and self._heap[0][0] <= now and self._tokens >= 1:
+            _, office = heapq.heappop(self._heap)
+            if allowed is not None and office not in allowed:
+                skipped.append(office)
+                continue
+            self._tokens -= 1
+            due.append(office)
+        for office in skipped:
+            heapq.heappush(self._heap, (now + self.min_interval, office))
+        return due
+
+    def seconds_until_next(self) -> float:
+        if not self._heap:
+            return float(self.base_interval)
+        now = time.monotonic()
+        wait = self._heap[0][0] - now
+        if self._tokens < 1:
+            wait = max(wait, (1 - self._tokens) * 60 / self.max_per_minute)
+        return max(0.0, wait)
+
+    # ── Intervals ────────────────────────────────────────────────────────────
+
+    def churn(self, office: str, now: float | None = None) -> float:
+        now = time.monotonic() if now is None else now
+        elapsed = now - self._churn_at.get(office, now)
+        return self._churn.get(office, 0.0) * math.pow(0.5, elapsed / CHURN_HALFLIFE)
+
+    def _quiet(self) -> bool:
+        hour = datetime.now(LOCAL_TZ).hour
+        start, end = QUIET_HOURS
+        return hour >= start or hour < end
+
+    def interval(self, office: str) -> float:
+        # churn 0 → 1.5× base (quiet offices drift out); churn 1 → base; churn 4 → base / 2
+        interval = self.base_interval * 1.5 / (1 + 0.5 * self.churn(office))
+        if self._quiet():
+            interval *= QUIET_FACTOR
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def record(self, summary: dict) -> float:
+        """Feed back one office's scrape result and schedule its next run. Returns the interval used."""
+        office = summary["office"]
+        now = time.monotonic()
+        changes = len(summary.get("new_golden") or []) + summary.get("gone_golden", 0)
+        self._churn[office] = self.churn(office, now) + changes
+        self._churn_at[office] = now
+
+        interval = self.min_interval if summary.get("error") else self.interval(office)
+        heapq.heappush(self._heap, (now + interval, office))
+        return interval
+
+    def report(self) -> str:
+        now = time.monotonic()
+        upcoming = sorted(self._heap)[:3]
+        return ", ".join(f"{o} in {max(0, due - now):.0f}s" for due, o in upcoming)
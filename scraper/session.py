@@ -0,0 +1,116 @@
+"""
+Service-page checkpointing.
+
+Every office starts from the same Service page ("{office} Appts" list), so a
+ServiceSession walks Welcome → Location → Service once and then, for each
+following office, gets back there the cheapest way that still works:
+
+  1. back    — history back from the previous office's Date & Time page
+  2. restore — new context from the saved storage_state, goto the saved Service URL
+  3. fresh   — full walk from BMV_URL (and a new checkpoint)
+
+Each tier is validated by the Service page's readiness predicate, so an
+expired server session is detected automatically and falls through to the
+next tier. Checkpoints also age out after SESSION_MAX_AGE seconds.
+Set SESSION_REUSE=false to get a fresh context and full walk for every office.
+"""
+import os
+import time
+from dataclasses import dataclass
+
+from playwright.async_api import BrowserContext, Page
+
+from browser_pool import BrowserPool
+from navigator import Navigator, back_to_service_step, restore_service_step
+from throttle import HostThrottle
+
+SESSION_REUSE = os.environ.get("SESSION_REUSE", "true").lower() == "true"
+SESSION_MAX_AGE = int(os.environ.get("SESSION_MAX_AGE", "900"))
+
+
+@dataclass
+class Checkpoint:
+    url: str
+    storage_state: dict
+    saved_at: float
+
+    def expired(self) -> bool:
+        return time.monotonic() - self.saved_at > SESSION_MAX_AGE
+
+
+class ServiceSession:
+    """One browser context + page, parked on the Service page between offices."""
+
+    def __init__(self, pool: BrowserPool, reuse: bool = SESSION_REUSE):
+        self.pool = pool
+        self.reuse = reuse
+        self.context: BrowserContext | None = None
+        self.page: Page | None = None
+        self._cm = None
+        self._checkpoint: Checkpoint | None = None
+        self._can_go_back = False  # page sits on a Date & Time page reached from Service
+        self.stats = {"fresh": 0, "back": 0, "restored": 0, "expired": 0}
+
+    async def _open(self, storage_state: dict | None = None) -> None:
+        await self.close()
+        self._cm = self.pool.context(storage_state=storage_state)
+        self.context = await self._cm.__aenter__()
+        self.page = await self.context.new_page()
+
+    async def close(self) -> None:
+        cm, self._cm = self._cm, None
+        self.context = self.page = None
+        self._can_go_back = False
+        if cm is not None:
+            await cm.__aexit__(None, None, None)
+
+    def invalidate(self) -> None:
+        """Call after an office fails mid-walk: don't trust this page's position."""
+        self._can_go_back = False
+
+    def mark_at_slots(self) -> None:
+        """Call once the Date & Time page for an office has been read."""
+        self._can_go_back = self.reuse
+
+    async def to_service(self, url: str, throttle: HostThrottle) -> tuple[Navigator, str]:
+        """
+        Return a Navigator whose page is on the Service page, plus how it got
+        there ("back" / "restored" / "fresh").
+        """
+        if self.reuse and self._checkpoint and self._checkpoint.expired():
+            self._checkpoint = None
+            self.stats["expired"] += 1
+
+        if self.reuse and self._can_go_back and self._checkpoint:
+            nav = Navigator(self.page, before_action=throttle.wait)
+            self._can_go_back = False
+            try:
+                await nav.run(back_to_service_step())
+                self.stats["back"] += 1
+                return nav, "back"
+            except Exception:
+                pass
+
+        if self.reuse and self._checkpoint:
+            await self._open(storage_state=self._checkpoint.storage_state)
+            nav = Navigator(self.page, before_action=throttle.wait)
+            try:
+                await nav.run(restore_service_step(self._checkpoint.url))
+                self.stats["restored"] += 1
+                return nav, "restored"
+            except Exception:
+                # Server-side session is gone — checkpoint is useless now
+                self._checkpoint = None
+                self.stats["expired"] += 1
+
+        await self._open()
+        nav = Navigator(self.page, before_action=throttle.wait)
+        await nav.to_service(url)
+        self.stats["fresh"] += 1
+        if self.reuse:
+            self._checkpoint = Checkpoint(
+                url=self.page.url,
+                storage_state=await self.context.storage_state(),
+                saved_at=time.monotonic(),
+            )
+        return nav, "fresh"
@@ -0,0 +1,81 @@
+"""
+Slot parsing and golden/future split, shared by the browser and HTTP engines.
+
+data-datetime values look like "4/22/2026 2:15:00 PM". The same few hundred
+strings come back every sweep, so parsing is a regex plus an LRU cache rather
+than a strptime per element.
+"""
+import hashlib
+import re
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import NamedTuple
+
+_DATETIME_RE = re.compile(
+    r"^\s*(\d{1,2})/(\d{1,2})/(\d{4})\s+(\d{1,2}):(\d{2})(?::(\d{2}))?\s*([AaPp][Mm])\s*$"
+)
+
+
+@lru_cache(maxsize=8192)
+def parse_datetime(dt_str: str) -> tuple[date, str] | None:
+    """"4/22/2026 2:15:00 PM" → (date(2026, 4, 22), "14:15:00"); None if unparseable."""
+    m = _DATETIME_RE.match(dt_str)
+    if not m:
+        return None
+    month, day, year, hour, minute, second, ampm = m.groups()
+    hour = int(hour) % 12 + (12 if ampm.upper() == "PM" else 0)
+    try:
+        d = date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+    if hour > 23 or int(minute) > 59:
+        return None
+    return d, f"{hour:02d}:{minute}:{second or '00'}"
+
+
+class SlotSplit(NamedTuple):
+    """All slots for one office, split at the golden threshold. Everything is sorted."""
+    golden: tuple[tuple[str, str], ...]  # (date ISO, "HH:MM:SS"), distinct
+    future_dates: tuple[date, ...]       # distinct dates >= threshold
+    future_count: int                    # individual future slots (for run totals)
+
+    @property
+    def closest_future(self) -> date | None:
+        return self.future_dates[0] if self.future_dates else None
+
+    @property
+    def total(self) -> int:
+        return len(self.golden) + self.future_count
+
+    @property
+    def fingerprint(self) -> str:
+        """Content hash of what the DB cares about: golden slots + closest future date."""
+        h = hashlib.blake2b(digest_size=12)
+        for d, t in self.golden:
+            h.update(f"{d} {t};".encode())
+        h.update(f"|{self.closest_future}".encode())
+        return h.hexdigest()
+
+
+def split_slots(raw: list[str | None], today: date, golden_days: int) -> SlotSplit:
+    """Parse raw data-datetime strings and split into golden slots / future dates."""
+    cutoff = today + timedelta(days=golden_days)
+    golden: set[tuple[str, str]] = set()
+    future: set[date] = set()
+    future_count = 0
+
+    for dt_str in raw:
+        if not dt_str:
+            continue
+        parsed = parse_datetime(dt_str)
+        if parsed is None:
+            print(f"  [warn] parse error for '{dt_str}'")
+            continue
+        d, t = parsed
+        if d < cutoff:
+            golden.add((d.isoformat(), t))
+        else:
+            future.add(d)
+            future_count += 1
+
+    return SlotSplit(tuple(sorted(golden)), tuple(sorted(future)), future_count)
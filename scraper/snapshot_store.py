@@ -0,0 +1,154 @@
+"""
+Compact local archive of every office's raw slot list, for reprocessing.
+
+scrape_office keeps only what the DB needs (golden slots, closest future
+date) and drops the raw data-datetime strings. With SNAPSHOT_STORE_DIR set,
+each successful scrape's full list is also kept here, so history can be
+re-derived offline when the golden / future rules change (reprocess.py):
+
+  {SNAPSHOT_STORE_DIR}/{YYYY-MM-DD}.{worker}.jsonl.gz   one per UTC day and worker
+
+One JSON line per office / appointment type scrape, delta-encoded against the
+previous line for the same key in the same file:
+
+  {"t": ts, "o": office, "a": type, "s": [...]}               full list (first one per key)
+  {"t": ts, "o": office, "a": type, "+": [...], "-": [...]}   what changed
+  {"t": ts, "o": office, "a": type}                           unchanged
+
+Lines are buffered during a sweep and flush() appends them as one gzip
+member (a .gz file can be a series of members), so a day of unchanged
+sweeps costs a few bytes per scrape.
+"""
+import gzip
+import heapq
+import json
+import os
+import zlib
+from collections import Counter
+from datetime import date, datetime, timezone
+from typing import Iterator, NamedTuple
+
+from leases import WORKER_ID
+
+SNAPSHOT_STORE_DIR = os.environ.get("SNAPSHOT_STORE_DIR", "")
+
+
+class RawSnapshot(NamedTuple):
+    office: str
+    appointment_type: str
+    scraped_at: float           # time.time()
+    slots: tuple[str, ...]      # raw data-datetime strings, sorted
+
+
+def _day(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).date().isoformat()
+
+
+class SnapshotStore:
+    def __init__(self, directory: str = SNAPSHOT_STORE_DIR, worker: str = WORKER_ID):
+        self.directory = directory
+        self.worker = worker.replace(os.sep, "_")
+        self._day: str | None = None
+        self._last: dict[tuple[str, str], Counter] = {}  # what the current file last recorded per key
+        self._buffer: list[str] = []
+        self.stats = {"full": 0, "delta": 0, "same": 0, "bytes": 0, "errors": 0}
+
+    def path(self, day: str) -> str:
+        return os.path.join(self.directory, f"{day}.{self.worker}.jsonl.gz")
+
+    def add(self, office: str, appointment_type: str, raw: list[str | None], scraped_at: float) -> None:
+        day = _day(scraped_at)
+        if day != self._day:
+            # Each day's file stands on its own: start it with full lists
+            self.flush()
+            self._day = day
+            self._last.clear()
+
+        key = (office, appointment_type)
+        current = Counter(s for s in raw if s)
+        previous = self._last.get(key)
+        record: dict = {"t": round(scraped_at, 3), "o": office, "a": appointment_type}
+        if previous is None:
+            record["s"] = sorted(current.elements())
+            kind = "full"
+        elif current != previous:
+            record["+"] = sorted((current - previous).elements())
+            record["-"] = sorted((previous - current).elements())
+            kind = "delta"
+        else:
+            kind = "same"
+        self._last[key] = current
+        self._buffer.append(json.dumps(record, separators=(",", ":")))
+        self.stats[kind] += 1
+
+    def flush(self) -> int:
+        """Append the buffered lines to today's file as one gzip member. Returns how many."""
+        if not self._buffer:
+            return 0
+        lines, self._buffer = self._buffer, []
+        data = gzip.compress(("\n".join(lines) + "\n").encode())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path(self._day), "ab") as f:
+                f.write(data)
+        except OSError as e:
+            self.stats["errors"] += 1
+            # The deltas we'd write next have no base on disk
+            self._last.clear()
+            print(f"  [snapshots] write failed, {len(lines)} scrapes dropped: {e}", flush=True)
+            return 0
+        self.stats["bytes"] += len(data)
+        return len(lines)
+
+
+STORE = SnapshotStore() if SNAPSHOT_STORE_DIR else None
+
+
+# ── Reading ──────────────────────────────────────────────────────────────────
+
+def read_file(path: str) -> Iterator[RawSnapshot]:
+    """Decode one day file. A truncated last member (crash mid-write) ends the file early."""
+    state: dict[tuple[str, str], Counter] = {}
+    slots: dict[tuple[str, str], tuple[str, ...]] = {}  # decoded list per key, reused while unchanged
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                key = (record["o"], record["a"])
+                if "s" in record:
+                    state[key] = Counter(record["s"])
+                    slots[key] = tuple(record["s"])
+                elif key not in state:
+                    continue  # delta without its base (a write that failed halfway)
+                elif "+" in record:
+                    current = state[key]
+                    current.update(record["+"])
+                    for s in record["-"]:
+                        current[s] -= 1
+                        if current[s] <= 0:
+                            del current[s]
+                    slots[key] = tuple(sorted(current.elements()))
+                yield RawSnapshot(key[0], key[1], record["t"], slots[key])
+    except (EOFError, gzip.BadGzipFile, zlib.error, json.JSONDecodeError) as e:
+        print(f"  [snapshots] {os.path.basename(path)}: stopped at a damaged record ({e})", flush=True)
+
+
+def day_files(directory: str, since: date | None = None, until: date | None = None) -> list[str]:
+    paths = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".jsonl.gz"):
+            continue
+        try:
+            day = date.fromisoformat(name.split(".", 1)[0])
+        except ValueError:
+            continue
+        if (since is None or day >= since) and (until is None or day <= until):
+            paths.append(os.path.join(directory, name))
+    return paths
+
+
+def read_snapshots(
+    directory: str = SNAPSHOT_STORE_DIR, since: date | None = None, until: date | None = None,
+) -> Iterator[RawSnapshot]:
+    """Every stored scrape between since and until (UTC days, inclusive), oldest first across workers."""
+    return heapq.merge(*(read_file(p) for p in day_files(directory, since, until)), key=lambda s: s.scraped_at)
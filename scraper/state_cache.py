@@ -0,0 +1,78 @@
+"""
+In-process cache of each office's live DB state, for the long-running runner.
+
+Keyed by (office, appointment_type). Hydrated from one query at startup and
+updated from every successful reconcile, so sweeps don't re-read appointments
+to find out what changed. Each key also keeps the fingerprint of its last
+written scrape: when a new scrape has the same fingerprint the DB already
+matches it and only the heartbeat (mark_office_checked) is written — unless
+a slot is still counting misses toward being marked gone (db.plan_reconcile),
+which needs the reconcile to run even when the page looks the same.
+
+Everything is re-read from the DB every STATE_RESYNC_SECONDS to catch drift
+(manual edits, another writer, a write that failed halfway).
+"""
+import os
+import time
+
+import db
+from db import OfficeState
+
+STATE_RESYNC_SECONDS = int(os.environ.get("STATE_RESYNC_SECONDS", "1800"))
+
+
+class SlotStateCache:
+    def __init__(self, resync_seconds: int = STATE_RESYNC_SECONDS):
+        self.resync_seconds = resync_seconds
+        self._states: dict[tuple[str, str], OfficeState] = {}
+        self._fingerprints: dict[tuple[str, str], str] = {}
+        self._loaded_at: float | None = None
+        self.stats = {"hydrations": 0, "unchanged": 0, "reconciled": 0}
+
+    @property
+    def stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.resync_seconds
+
+    def ensure_fresh(self, db_client, offices: list[str], appointment_types: list[str] | None = None) -> None:
+        """Hydrate on first use and whenever the last full read is older than the resync interval."""
+        if self.stale:
+            self.load(db.load_all_office_states(db_client, offices, appointment_types))
+
+    def load(self, states: dict[tuple[str, str], OfficeState]) -> None:
+        """
+        Replace everything with a full read (load_all_office_states, sync or async).
+        The DB only knows when a slot was first missed; the miss counts of slots
+        still live are carried over from the replaced states.
+        """
+        for key, state in states.items():
+            old = self._states.get(key)
+            if old is None:
+                continue
+            for slot, (count, since) in old.misses.items():
+                if slot in state.golden:
+                    loaded = state.misses.get(slot)
+                    state.misses[slot] = (max(count, loaded[0]), loaded[1]) if loaded else (count, since)
+        self._states = states
+        self._fingerprints.clear()
+        self._loaded_at = time.monotonic()
+        self.stats["hydrations"] += 1
+
+    def get(self, key: tuple[str, str]) -> OfficeState | None:
+        return self._states.get(key)
+
+    def unchanged(self, key: tuple[str, str], fingerprint: str) -> bool:
+        state = self._states.get(key)
+        if state is not None and not state.misses and self._fingerprints.get(key) == fingerprint:
+            self.stats["unchanged"] += 1
+            return True
+        return False
+
+    def update(self, key: tuple[str, str], state: OfficeState, fingerprint: str) -> None:
+        self._states[key] = state
+        self._fingerprints[key] = fingerprint
+        self.stats["reconciled"] += 1
+
+    def invalidate(self, key: tuple[str, str]) -> None:
+        """Forget an office / type after a failed write; the next reconcile re-reads it."""
+        self._states.pop(key, None)
+        self._fingerprints.pop(key, None)
@@ -0,0 +1,99 @@
+"""
+Incremental golden-slot analytics, maintained by the scraper.
+
+Every reconcile already knows exactly which slots appeared and which went
+away, so the aggregates are fed from those diffs (O(changes) per sweep)
+instead of scanning appointments:
+
+  appear_hour  when golden slots appear, by local hour of day (24 buckets)
+  lead_time    how far ahead of the appointment a slot appears (LEAD_BUCKETS)
+  lifetime     how long a slot stays bookable before it's gone (LIFETIME_BUCKETS)
+
+Counts are per office and appointment type and accumulate in memory during a
+sweep; flush() adds them to slot_stats with a single increment_slot_stats RPC,
+which sums the bucket arrays in Postgres so concurrent writers can't lose
+updates.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from zoneinfo import ZoneInfo
+
+import db
+from db import ReconcileResult, parse_ts
+
+LOCAL_TZ = ZoneInfo("America/New_York")
+
+# Upper bounds in seconds; one extra bucket at the end for everything larger
+LIFETIME_BUCKETS = (300, 900, 1800, 3600, 2 * 3600, 6 * 3600, 24 * 3600, 3 * 86400)
+LEAD_BUCKETS = (2 * 3600, 6 * 3600, 12 * 3600, 86400, 2 * 86400, 3 * 86400, 5 * 86400, 8 * 86400)
+METRICS = {"appear_hour": 24, "lead_time": len(LEAD_BUCKETS) + 1, "lifetime": len(LIFETIME_BUCKETS) + 1}
+
+
+def bucket(seconds: float, bounds: tuple[int, ...]) -> int:
+    for i, bound in enumerate(bounds):
+        if seconds < bound:
+            return i
+    return len(bounds)
+
+
+@dataclass
+class _Delta:
+    buckets: list[int]
+    total: int = 0
+    sum_seconds: float = 0.0
+
+
+class SlotStats:
+    """Per-sweep accumulator of slot_stats increments."""
+
+    def __init__(self):
+        self._deltas: dict[tuple[str, str, str], _Delta] = {}  # (office, appointment type, metric)
+
+    def _add(self, group: tuple[str, str], metric: str, index: int, seconds: float = 0.0) -> None:
+        delta = self._deltas.get((*group, metric))
+        if delta is None:
+            delta = self._deltas[(*group, metric)] = _Delta([0] * METRICS[metric])
+        delta.buckets[index] += 1
+        delta.total += 1
+        delta.sum_seconds += seconds
+
+    def record(self, office: str, appointment_type: str, result: ReconcileResult) -> None:
+        """Fold one reconcile's new / gone golden slots into the sweep's increments."""
+        now = parse_ts(result.at) if result.at else datetime.now(LOCAL_TZ)
+        group = (office, appointment_type)
+
+        for d, t in result.new_golden:
+            self._add(group, "appear_hour", now.astimezone(LOCAL_TZ).hour)
+            starts = datetime.combine(date.fromisoformat(d), time.fromisoformat(t), LOCAL_TZ)
+            lead = max(0.0, (starts - now).total_seconds())
+            self._add(group, "lead_time", bucket(lead, LEAD_BUCKETS), lead)
+
+        for key in result.gone_golden:
+            appeared = result.gone_appeared.get(key)
+            if appeared is None:
+                continue
+            # Bookable until the first scrape that missed it, not until the miss that confirmed it
+            gone = parse_ts(result.gone_since[key]) if key in result.gone_since else now
+            lifetime = max(0.0, (gone - parse_ts(appeared)).total_seconds())
+            self._add(group, "lifetime", bucket(lifetime, LIFETIME_BUCKETS), lifetime)
+
+    @property
+    def pending(self) -> int:
+        return sum(d.total for d in self._deltas.values())
+
+    def deltas(self) -> list[dict]:
+        """The accumulated increments, in increment_slot_stats' format."""
+        return [
+            {"office": office, "appointment_type": appointment_type, "metric": metric, "buckets": d.buckets,
+             "total": d.total, "sum_seconds": round(d.sum_seconds, 1)}
+            for (office, appointment_type, metric), d in sorted(self._deltas.items())
+        ]
+
+    def flush(self, db_client) -> int:
+        """Send the accumulated increments in one RPC. Returns how many events were written."""
+        if not self._deltas:
+            return 0
+        db.increment_slot_stats(db_client, self.deltas())
+        written = self.pending
+        self._deltas.clear()
+        return written
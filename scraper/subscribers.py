@@ -0,0 +1,50 @@
+"""
+Subscriber lookup for alerts, cached across sweeps.
+
+The full active list is loaded into a SubscriberIndex (office → emails) and
+reused for SUBSCRIBER_TTL seconds. After that, a one-row change-marker query
+decides whether the index is still good or needs a reload, so an unchanged
+list costs one tiny query per TTL instead of a full-table read per office.
+"""
+import os
+import time
+
+import db
+from db import SubscriberIndex
+
+SUBSCRIBER_TTL = int(os.environ.get("SUBSCRIBER_TTL", "300"))
+
+
+class SubscriberCache:
+    def __init__(self, ttl: int = SUBSCRIBER_TTL):
+        self.ttl = ttl
+        self._index: SubscriberIndex | None = None
+        self._checked_at = 0.0
+        self.stats = {"loads": 0, "marker_checks": 0}
+
+    def get(self, db_client) -> SubscriberIndex:
+        now = time.monotonic()
+        if self._index is not None and now - self._checked_at < self.ttl:
+            return self._index
+
+        marker = None
+        if self._index is not None:
+            marker = db.subscriber_change_marker(db_client)
+            self.stats["marker_checks"] += 1
+            if marker == self._index.marker:
+                self._checked_at = now
+                return self._index
+
+        if marker is None:
+            marker = db.subscriber_change_marker(db_client)
+        self._index = db.load_subscriber_index(db_client)
+        self._index.marker = marker
+        self._checked_at = now
+        self.stats["loads"] += 1
+        return self._index
+
+    def invalidate(self) -> None:
+        self._index = None
+
+    def for_office(self, db_client, office: str) -> list[str]:
+        return self.get(db_client).for_office(office)
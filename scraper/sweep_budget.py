@@ -0,0 +1,114 @@
+"""
+Deadline bookkeeping for one sweep.
+
+A sweep gets SWEEP_BUDGET_SECONDS in total. Each office attempt is cancelled
+after OFFICE_TIMEOUT_SECONDS (or whatever is left of the budget, if less), so
+one hung page can't hold the sweep for a stack of 30s goto / 10s wait_for
+timeouts. A failed or timed-out office is retried later in the same sweep,
+after a jittered backoff, for as long as the budget leaves room for another
+attempt (OFFICE_RETRIES at most).
+
+With HEDGE_SLOW_OFFICES=true, an attempt still running past the p95 of recent
+successful attempts gets a second, parallel attempt on an idle session; the
+first one to succeed wins and the other is cancelled. The p95 is the office's
+own once it has HEDGE_OFFICE_MIN_SAMPLES attempts behind it (offices differ a
+lot in how long their pages take), all offices' until then. The durations live
+in one process-wide OfficeLatency, so the runner learns them across sweeps.
+"""
+import os
+import random
+import time
+from collections import deque
+
+SWEEP_BUDGET_SECONDS = float(os.environ.get("SWEEP_BUDGET_SECONDS", "240"))
+OFFICE_TIMEOUT_SECONDS = float(os.environ.get("OFFICE_TIMEOUT_SECONDS", "75"))
+OFFICE_RETRIES = int(os.environ.get("OFFICE_RETRIES", "2"))
+RETRY_BACKOFF_BASE = float(os.environ.get("RETRY_BACKOFF_BASE", "2.0"))
+# Don't start an attempt (first or retry) with less than this left in the budget
+MIN_ATTEMPT_SECONDS = float(os.environ.get("MIN_ATTEMPT_SECONDS", "5"))
+HEDGE_SLOW_OFFICES = os.environ.get("HEDGE_SLOW_OFFICES", "false").lower() == "true"
+HEDGE_MIN_SAMPLES = int(os.environ.get("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_OFFICE_MIN_SAMPLES = int(os.environ.get("HEDGE_OFFICE_MIN_SAMPLES", "8"))
+
+
+class LatencyTracker:
+    """Durations of recent successful office attempts, for the hedging threshold."""
+
+    def __init__(self, window: int = 200, min_samples: int = HEDGE_MIN_SAMPLES):
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def p95(self) -> float | None:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+class OfficeLatency:
+    """A LatencyTracker per office, plus one over all offices to fall back on."""
+
+    def __init__(self, office_window: int = 50, office_min_samples: int = HEDGE_OFFICE_MIN_SAMPLES):
+        self.overall = LatencyTracker()
+        self.office_window = office_window
+        self.office_min_samples = office_min_samples
+        self._offices: dict[str, LatencyTracker] = {}
+
+    def record(self, office: str, seconds: float) -> None:
+        self.overall.record(seconds)
+        tracker = self._offices.get(office)
+        if tracker is None:
+            tracker = self._offices[office] = LatencyTracker(self.office_window, self.office_min_samples)
+        tracker.record(seconds)
+
+    def p95(self, office: str) -> float | None:
+        tracker = self._offices.get(office)
+        own = tracker.p95() if tracker is not None else None
+        return own if own is not None else self.overall.p95()
+
+
+LATENCY = OfficeLatency()
+
+
+class SweepBudget:
+    def __init__(
+        self,
+        budget: float = SWEEP_BUDGET_SECONDS,
+        office_timeout: float = OFFICE_TIMEOUT_SECONDS,
+        retries: int = OFFICE_RETRIES,
+        hedge: bool = HEDGE_SLOW_OFFICES,
+        latency: OfficeLatency = LATENCY,
+    ):
+        self.deadline = time.monotonic() + budget if budget > 0 else float("inf")
+        self.office_timeout = office_timeout
+        self.retries = retries
+        self.hedge = hedge
+        self.latency = latency
+        self.stats = {"timeouts": 0, "retries": 0, "hedged": 0, "hedge_wins": 0, "skipped": 0}
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def attempt_timeout(self) -> float | None:
+        """Timeout for an attempt starting now; None when the budget can't fit one."""
+        remaining = self.remaining()
+        if remaining < MIN_ATTEMPT_SECONDS:
+            return None
+        return min(self.office_timeout, remaining)
+
+    def hedge_after(self, office: str) -> float | None:
+        """Seconds into an attempt at `office` after which to start a hedge, or None."""
+        return self.latency.p95(office) if self.hedge else None
+
+    def retry_delay(self, attempt: int) -> float | None:
+        """Jittered backoff before retry number `attempt` (1-based), or None if it wouldn't fit."""
+        if attempt > self.retries:
+            return None
+        base = RETRY_BACKOFF_BASE * (2 ** (attempt - 1))
+        delay = base + random.uniform(0, base)
+        if self.remaining() - delay < MIN_ATTEMPT_SECONDS:
+            return None
+        return delay
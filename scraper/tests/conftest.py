@@ -0,0 +1,13 @@
+"""
+Unit tests for the pure parts of the scraper (no DB, no browser, no network).
+
+  cd scraper && python -m pytest -q tests
+"""
+import os
+import sys
+
+# db.py reads these at import; nothing here talks to Supabase
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
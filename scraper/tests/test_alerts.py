@@ -0,0 +1,52 @@
+from datetime import date
+
+from alerts import build_digest
+
+DAY = date(2026, 10, 20)
+
+
+def test_digest_is_titled_with_the_slots_type():
+    subject, html = build_digest("Portland", [{"date": DAY, "time": "09:00:00", "type": "Learner Permit"}], "#")
+    assert subject == "⚡ Portland — Learner Permit — October 20, 2026 at 9:00 AM — Book Now"
+    assert "New Learner Permit Appointment" in html
+    assert "Real ID" not in subject + html
+
+
+def test_mixed_types_label_each_slot():
+    slots = [{"date": DAY, "time": "09:00:00", "type": "Learner Permit"},
+             {"date": DAY, "time": "10:00:00", "type": "Driver's License"}]
+    subject, html = build_digest("Portland", slots, "#")
+    assert subject == "⚡ Portland — 2 new slots from October 20, 2026 at 9:00 AM — Book Now"
+    assert "9:00 AM · Learner Permit" in html and "10:00 AM · Driver's License" in html
+
+
+def test_cooldown_is_lifted_when_nothing_was_sent(monkeypatch):
+    import asyncio
+
+    import alerts
+    monkeypatch.setattr(alerts.resend, "api_key", "test")
+    sent = []
+
+    def send(params):
+        if not sent:
+            sent.append(None)
+            raise RuntimeError("resend is down")
+        sent.extend(params)
+
+    monkeypatch.setattr(alerts.resend.Batch, "send", send)
+    slot = {"date": DAY, "time": "09:00:00", "type": "Learner Permit"}
+
+    async def run():
+        dispatcher = alerts.AlertDispatcher(max_retries=0)
+        dispatcher.submit("Portland", [slot], ["a@example.com"], "#")
+        await dispatcher.drain()
+        dispatcher.submit("Portland", [slot], ["a@example.com"], "#")  # failed: not cooled down
+        await dispatcher.drain()
+        dispatcher.submit("Portland", [slot], ["a@example.com"], "#")  # delivered: cooled down
+        await dispatcher.drain()
+        await dispatcher.close()
+        return dispatcher.stats
+
+    stats = asyncio.run(run())
+    assert len(sent) == 2  # the failure marker plus one delivered email
+    assert stats["failed"] == 1 and stats["emails"] == 1 and stats["cooled_down"] == 1
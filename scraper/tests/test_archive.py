@@ -0,0 +1,44 @@
+import archive
+
+MAX_ROWS = 3  # what this fake PostgREST returns at most per request, like max_rows
+
+
+class FakeArchive:
+    """Just enough of the supabase query builder for _archived_for_days."""
+
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+        self.requests = 0
+
+    def table(self, name):
+        self._range = (0, len(self.rows) - 1)
+        return self
+
+    def select(self, *args, **kwargs):
+        return self
+
+    in_ = gte = lt = order = select
+
+    def range(self, start, end):
+        self._range = (start, end)
+        return self
+
+    def execute(self):
+        self.requests += 1
+        start, end = self._range
+        return type("Response", (), {"data": self.rows[start:min(end + 1, start + MAX_ROWS)]})()
+
+
+def row(office: str, hour: int) -> dict:
+    first = f"2026-10-14T{hour:02d}:00:00+00:00"
+    return {"office": office, "appointment_type": "Driver's License", "slot_type": "golden",
+            "first_seen_at": first, "last_seen_at": first}
+
+
+def test_archived_rows_are_read_past_the_row_cap(monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_READ_PAGE", MAX_ROWS)
+    client = FakeArchive([row("Portland", h) for h in range(12, 19)])  # 7 rows, 3 per response
+    day = archive.local_day(client.rows[0])
+    rows = archive._archived_for_days(client, {("Portland", day)})
+    assert len(rows) == 7
+    assert client.requests == 3
@@ -0,0 +1,150 @@
+import asyncio
+import os
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+
+from http_engine import EmptyDateTime, FastPathError, HttpScraper, parse_page
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "qflow")
+START = "https://bmv.test/Appointment/Index/abc"
+
+# (Step posted, SelectedItemId posted) → next page
+FLOW = {
+    ("welcome", "agree-1"): "location",
+    ("location", ""): "service",
+    ("service", "svc-2"): "types-Portland",
+    ("appointment_type", "type-1"): "date_time-Portland-Driver_s_License",
+    ("appointment_type", "type-2"): "date_time-empty",
+}
+
+
+def fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, f"{name}.html"), encoding="utf-8") as f:
+        return f.read()
+
+
+class FakeQflow(httpx.MockTransport):
+    def __init__(self, pages: dict[str, str] | None = None):
+        super().__init__(self.handle)
+        self.pages = pages or {}
+        self.closed = False
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            name = "welcome"
+        else:
+            form = {k: v[0] for k, v in parse_qs(request.content.decode(), keep_blank_values=True).items()}
+            name = FLOW.get((form.get("Step"), form.get("SelectedItemId")), "session_expired")
+        return httpx.Response(200, text=self.pages.get(name) or fixture(name))
+
+    async def aclose(self) -> None:
+        self.closed = True
+
+
+def fetch(transport: FakeQflow, office: str = "Portland", types=("Driver's License",)):
+    scraper = HttpScraper(START, transport=transport, record_dir="")
+    result = asyncio.run(scraper.fetch_slot_strings(office, list(types)))
+    return scraper, result
+
+
+# ── Parsing ──────────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("name, screen", [
+    ("welcome", "welcome"),
+    ("location", "location"),
+    ("service", "service"),
+    ("types-Portland", "appointment_type"),
+    ("date_time-Portland-Driver_s_License", "date_time"),
+    ("date_time-empty", "date_time"),
+])
+def test_each_fixture_is_recognised_as_its_screen_only(name, screen):
+    page = parse_page(fixture(name), START)
+    others = {"welcome", "location", "service", "appointment_type", "date_time"} - {screen}
+    if screen == "location":
+        # A list of items without office entries: a type list as far as the item check goes
+        others.discard("appointment_type")
+    assert page.looks_like(screen)
+    assert not any(page.looks_like(other) for other in others)
+
+
+def test_session_expired_page_is_no_screen():
+    # Mentions "Choose a Date" and has an item, but isn't any step of the flow
+    page = parse_page(fixture("session_expired"), START)
+    assert not any(page.looks_like(s) for s in ("welcome", "location", "service", "appointment_type", "date_time"))
+
+
+def test_date_time_page_parsing():
+    page = parse_page(fixture("date_time-Portland-Driver_s_License"), START)
+    assert page.slot_datetimes == ["10/20/2026 9:00:00 AM", "10/20/2026 2:15:00 PM", "11/3/2026 10:30:00 AM"]
+    assert page.fields["SelectedItemId"] == ""
+    assert page.form_action == "/Appointment/Next"
+
+
+def test_script_text_is_not_page_text():
+    page = parse_page(fixture("welcome"), START)
+    assert "QflowObjectItem" not in page.text
+    assert [item.text for item in page.items] == ["I Agree"]
+
+
+# ── Walk ─────────────────────────────────────────────────────────────────────
+
+def test_walk_returns_slots_and_closes_only_the_client():
+    transport = FakeQflow()
+    scraper, result = fetch(transport)
+    assert result == {"Driver's License": ["10/20/2026 9:00:00 AM", "10/20/2026 2:15:00 PM", "11/3/2026 10:30:00 AM"]}
+    assert scraper.stats == {"ok": 1, "failed": 0, "empty": 0, "requests": 5}
+    assert not transport.closed
+
+
+def test_agree_is_picked_by_text_not_position():
+    welcome = fixture("welcome").replace(
+        '<div class="QflowObjectItem" data-id="agree-1">',
+        '<div class="QflowObjectItem" data-id="lang-es"><span>Español</span></div>\n'
+        '<div class="QflowObjectItem" data-id="agree-1">',
+    )
+    _, result = fetch(FakeQflow({"welcome": welcome}))
+    assert list(result) == ["Driver's License"]
+
+
+def test_welcome_without_agree_is_rejected():
+    welcome = fixture("welcome").replace("I Agree", "Continue")
+    with pytest.raises(FastPathError, match="welcome"):
+        fetch(FakeQflow({"welcome": welcome}))
+
+
+def test_empty_date_time_is_left_to_the_browser():
+    scraper = HttpScraper(START, transport=FakeQflow(), record_dir="")
+    with pytest.raises(EmptyDateTime):
+        asyncio.run(scraper.fetch_slot_strings("Portland", ["Driver's License", "Learner Permit"]))
+    # Not a failure of the fast path itself
+    assert scraper.stats["failed"] == 0 and scraper.stats["empty"] == 1
+
+
+def test_marker_without_slots_on_unexpected_page_never_returns_empty():
+    notice = "<html><body><h1>Scheduled maintenance</h1><p>Choose a Date again after 6 PM.</p></body></html>"
+    transport = FakeQflow({"date_time-Portland-Driver_s_License": notice})
+    with pytest.raises(FastPathError):
+        fetch(transport)
+
+
+def test_unrecognised_page_mid_walk_is_rejected():
+    transport = FakeQflow({"service": fixture("session_expired")})
+    with pytest.raises(FastPathError, match="service screen"):
+        fetch(transport)
+
+
+def test_form_without_item_field_fails_closed():
+    welcome = fixture("welcome").replace('name="SelectedItemId"', 'name="SomethingElse"')
+    with pytest.raises(FastPathError, match="SelectedItemId"):
+        fetch(FakeQflow({"welcome": welcome}))
+
+
+def test_recording_saves_every_page(tmp_path):
+    scraper = HttpScraper(START, transport=FakeQflow(), record_dir=str(tmp_path))
+    asyncio.run(scraper.fetch_slot_strings("Portland", ["Driver's License"]))
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "date_time-Portland-Driver_s_License.html", "location.html", "service.html",
+        "types-Portland.html", "welcome.html",
+    ]
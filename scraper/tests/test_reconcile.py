@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta, timezone
+
+import db
+from db import OfficeState
+from reprocess import reprocess
+from snapshot_store import RawSnapshot
+
+OFFICE = "Portland"
+SLOT = ("2026-10-20", "09:00:00")
+T0 = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+
+
+def at(minutes: int) -> str:
+    return (T0 + timedelta(minutes=minutes)).isoformat()
+
+
+def live_state() -> OfficeState:
+    """One golden slot, last written (reconciled) at T0."""
+    return OfficeState(golden={SLOT: "row-1"}, appeared={SLOT: at(0)})
+
+
+def plan(state: OfficeState, golden: set, now: str, **policy):
+    policy = {"gone_after_misses": 2, "gone_after_seconds": 3600, **policy}
+    return db.plan_reconcile(OFFICE, golden, None, state, now=now, **policy)
+
+
+def test_stable_slot_is_held_on_first_miss():
+    # Unchanged scrapes for two hours are heartbeats only: nothing reconciles,
+    # so the state still says T0. The first miss must not be aged from there.
+    first = plan(live_state(), set(), now=at(120))
+    assert first.gone == {}
+    assert first.held == [SLOT]
+    assert first.next_state.golden == {SLOT: "row-1"}
+    assert first.next_state.misses == {SLOT: (1, at(120))}
+
+
+def test_second_miss_marks_gone_as_of_first_miss():
+    first = plan(live_state(), set(), now=at(120))
+    second = plan(first.next_state, set(), now=at(125))
+    assert second.gone == {SLOT: "row-1"}
+    assert second.next_state.golden == {}
+    # last_seen_at is when it went missing, not T0 and not the second miss
+    assert second.gone_updates() == [({"available": False, "last_seen_at": at(120)}, ["row-1"])]
+
+
+def test_result_carries_first_miss_of_gone_slots():
+    first = plan(live_state(), set(), now=at(120))
+    result = plan(first.next_state, set(), now=at(125)).finish([], None, calls=0)
+    assert result.gone_golden == [SLOT]
+    assert result.gone_since == {SLOT: at(120)}
+
+
+def test_seen_again_clears_misses():
+    first = plan(live_state(), set(), now=at(120))
+    back = plan(first.next_state, {SLOT}, now=at(125))
+    assert back.gone == {}
+    assert back.next_state.misses == {}
+    assert back.refresh_ids == ["row-1"]
+
+
+def test_age_rule_counts_from_first_miss():
+    first = plan(live_state(), set(), now=at(120), gone_after_misses=5)
+    soon = plan(first.next_state, set(), now=at(150), gone_after_misses=5)
+    assert soon.held == [SLOT]
+    late = plan(soon.next_state, set(), now=at(180), gone_after_misses=5)
+    assert late.gone == {SLOT: "row-1"}
+    assert late.gone_since == {SLOT: at(120)}
+
+
+def test_single_miss_policy_is_immediate():
+    first = plan(live_state(), set(), now=at(120), gone_after_misses=1)
+    assert first.gone_updates() == [({"available": False, "last_seen_at": at(120)}, ["row-1"])]
+
+
+def test_reprocess_holds_stable_slot_on_first_miss():
+    raw = ("10/20/2026 9:00:00 AM",)
+    ts = T0.timestamp()
+    snapshots = [RawSnapshot(OFFICE, db.DEFAULT_APPOINTMENT_TYPE, ts + m * 60, raw) for m in range(0, 121, 5)]
+    snapshots.append(RawSnapshot(OFFICE, db.DEFAULT_APPOINTMENT_TYPE, ts + 125 * 60, ()))
+    table, _, counts = reprocess(snapshots, golden_days=8, gone_after_misses=2, gone_after_seconds=3600)
+    assert counts["gone"] == 0
+    (row,) = [r for r in table.rows.values() if r["slot_type"] == "golden"]
+    assert row["available"] is True
+
+    snapshots.append(RawSnapshot(OFFICE, db.DEFAULT_APPOINTMENT_TYPE, ts + 130 * 60, ()))
+    table, _, counts = reprocess(snapshots, golden_days=8, gone_after_misses=2, gone_after_seconds=3600)
+    assert counts["gone"] == 1
+    (row,) = [r for r in table.rows.values() if r["slot_type"] == "golden"]
+    assert row["available"] is False
+    assert row["last_seen_at"] == datetime.fromtimestamp(ts + 125 * 60, timezone.utc).isoformat()
+
+
+def load(table) -> OfficeState:
+    """A freshly loaded state, as load_office_state would read it back."""
+    rows = [r for r in table.rows.values() if r["available"]]
+    return db._office_states(rows, [OFFICE], [db.DEFAULT_APPOINTMENT_TYPE])[(OFFICE, db.DEFAULT_APPOINTMENT_TYPE)]
+
+
+def run(table, golden: set, now: str) -> db.ReconcileResult:
+    p = plan(load(table), golden, now=now)
+    return p.finish(*table.apply(p), calls=0)
+
+
+def test_misses_survive_fresh_state_loads():
+    from reprocess import MemoryAppointments
+    table = MemoryAppointments()
+    run(table, {SLOT}, now=at(0))
+    first = run(table, set(), now=at(10))
+    assert first.held_golden == [SLOT]
+    (row,) = table.rows.values()
+    assert row["missed_since"] == at(10)
+
+    second = run(table, set(), now=at(20))
+    assert second.gone_golden == [SLOT]
+    assert row["available"] is False and row["last_seen_at"] == at(10)
+
+
+def test_seen_again_clears_missed_since():
+    from reprocess import MemoryAppointments
+    table = MemoryAppointments()
+    run(table, {SLOT}, now=at(0))
+    run(table, set(), now=at(10))
+    back = run(table, {SLOT}, now=at(20))
+    assert back.gone_golden == [] and back.held_golden == []
+    (row,) = table.rows.values()
+    assert row["missed_since"] is None
+    assert run(table, set(), now=at(30)).held_golden == [SLOT]
+
+
+def test_cache_reload_keeps_miss_counts():
+    from state_cache import SlotStateCache
+    cache = SlotStateCache()
+    key = (OFFICE, db.DEFAULT_APPOINTMENT_TYPE)
+    held = plan(live_state(), set(), now=at(10), gone_after_misses=3).next_state
+    cache.update(key, plan(held, set(), now=at(20), gone_after_misses=3).next_state, "fp")
+    reloaded = live_state()
+    reloaded.misses[SLOT] = (1, at(10))  # all the DB knows
+    cache.load({key: reloaded})
+    assert cache.get(key).misses == {SLOT: (2, at(10))}
+
+
+def test_gained_lease_drops_cached_state():
+    from journal import WriteJournal
+    from leases import LeaseManager
+    from state_cache import SlotStateCache
+    from writer import SlotWriter
+    cache = SlotStateCache()
+    key = (OFFICE, db.DEFAULT_APPOINTMENT_TYPE)
+    leases = LeaseManager([OFFICE, "Bangor"], holder="w1")
+    SlotWriter(cache, [OFFICE, "Bangor"], journal=WriteJournal(":memory:"), leases=leases)
+    cache.update(key, live_state(), "fp")  # from before another worker took the office over
+    leases._update(["Bangor"], started=0.0)
+    assert cache.get(key) is not None
+    leases._update([OFFICE, "Bangor"], started=0.0)
+    assert cache.get(key) is None
@@ -0,0 +1,39 @@
+from db import ReconcileResult, OfficeState
+from stats import SlotStats
+
+AT = "2026-10-17T12:00:00+00:00"
+
+
+def result(new=(), gone=(), appeared=None, gone_since=None) -> ReconcileResult:
+    return ReconcileResult(new_golden=list(new), gone_golden=list(gone), state=OfficeState(), calls=0,
+                           gone_appeared=appeared or {}, at=AT, gone_since=gone_since or {})
+
+
+def test_increments_are_kept_apart_per_appointment_type():
+    stats = SlotStats()
+    slot = ("2026-10-20", "09:00:00")
+    stats.record("Portland", "Driver's License", result(new=[slot]))
+    stats.record("Portland", "Learner Permit", result(new=[slot]))
+    stats.record("Portland", "Learner Permit", result(gone=[slot], appeared={slot: "2026-10-17T11:00:00+00:00"}))
+    deltas = {(d["office"], d["appointment_type"], d["metric"]): d for d in stats.deltas()}
+    assert sorted(deltas) == [
+        ("Portland", "Driver's License", "appear_hour"),
+        ("Portland", "Driver's License", "lead_time"),
+        ("Portland", "Learner Permit", "appear_hour"),
+        ("Portland", "Learner Permit", "lead_time"),
+        ("Portland", "Learner Permit", "lifetime"),
+    ]
+    assert deltas[("Portland", "Learner Permit", "lifetime")]["sum_seconds"] == 3600.0
+    assert stats.pending == 5
+
+
+
+def test_lifetime_ends_at_first_miss():
+    # Gone is confirmed at 12:00, but the slot was already missing from the 11:40 scrape
+    stats = SlotStats()
+    slot = ("2026-10-20", "09:00:00")
+    stats.record("Portland", "Driver's License", result(
+        gone=[slot], appeared={slot: "2026-10-17T11:00:00+00:00"}, gone_since={slot: "2026-10-17T11:40:00+00:00"},
+    ))
+    [lifetime] = stats.deltas()
+    assert lifetime["sum_seconds"] == 2400.0
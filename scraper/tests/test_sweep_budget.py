@@ -0,0 +1,23 @@
+from sweep_budget import OfficeLatency, SweepBudget
+
+
+def test_office_p95_falls_back_to_all_offices_until_it_has_samples():
+    latency = OfficeLatency(office_min_samples=3)
+    latency.overall.min_samples = 5
+    assert latency.p95("Portland") is None
+    for _ in range(40):
+        latency.record("Bangor", 2.0)
+    assert latency.p95("Portland") == 2.0
+    for _ in range(2):
+        latency.record("Portland", 9.0)
+    assert latency.p95("Portland") == 2.0
+    latency.record("Portland", 9.0)
+    assert latency.p95("Portland") == 9.0
+    assert latency.p95("Bangor") == 2.0
+
+
+def test_hedge_after_is_per_office_and_off_by_default():
+    latency = OfficeLatency(office_min_samples=1)
+    latency.record("Calais", 4.0)
+    assert SweepBudget(hedge=True, latency=latency).hedge_after("Calais") == 4.0
+    assert SweepBudget(hedge=False, latency=latency).hedge_after("Calais") is None
@@ -0,0 +1,27 @@
+"""
+Per-host politeness limiter shared by all concurrent office scrapes.
+Every navigation/click that hits the BMV site goes through wait(), which
+spaces requests at least HOST_MIN_INTERVAL seconds apart across all workers.
+"""
+import asyncio
+import os
+import time
+
+HOST_MIN_INTERVAL = float(os.environ.get("HOST_MIN_INTERVAL", "0.5"))
+
+
+class HostThrottle:
+    def __init__(self, min_interval: float = HOST_MIN_INTERVAL):
+        self.min_interval = min_interval
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if self.min_interval <= 0:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.min_interval
+        if delay > 0:
+            await asyncio.sleep(delay)
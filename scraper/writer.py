@@ -0,0 +1,319 @@
+"""
+Persistence side of the scrape pipeline.
+
+scrape_office only produces an OfficeSnapshot per office and appointment type;
+SlotWriter consumes them and applies them to Supabase, so browser / HTTP work never waits on a DB
+round trip and a failed write doesn't throw the scrape away.
+
+  submit()  append the snapshot to the WriteJournal (durable), queue the office,
+            and return a future for its WriteResult
+  worker    takes the newest snapshot per (office, appointment_type) (older queued ones are
+            coalesced away) and, in a thread: reconcile_office unless the
+            fingerprint is unchanged, then the office_status heartbeat. Then
+            acks the journal, folds new / gone slots into slot_stats and
+            queues alert digests — alerts only ever go out for written rows.
+  failures  the snapshot stays journaled and is retried with backoff; after
+            WRITER_MAX_RETRIES it is left for the office's next snapshot
+            (which supersedes it) or the next start()
+
+With a LeaseManager (OFFICE_LEASES=true), snapshots for offices this worker
+no longer holds a lease on are dropped instead of written: the worker that
+took the office over writes it from its own scrape.
+
+With an AsyncDB (DB_ASYNC=true) the writes run on the event loop instead of
+in a thread, and each office's reconcile and heartbeat go out together.
+
+start() replays whatever a crash or outage left in the journal. Alerts are
+skipped for snapshots older than WRITER_ALERT_MAX_AGE, so a replay after a
+long outage doesn't email about slots that are probably gone by now.
+
+All SlotStateCache access happens on the writer, one snapshot at a time.
+"""
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass
+from datetime import date
+
+import db
+import metrics
+from db_async import DB_ASYNC, AsyncDB
+from journal import OfficeSnapshot, WriteJournal
+from state_cache import SlotStateCache
+from stats import SlotStats
+
+WRITER_MAX_RETRIES = int(os.environ.get("WRITER_MAX_RETRIES", "5"))
+WRITER_BACKOFF_BASE = float(os.environ.get("WRITER_BACKOFF_BASE", "1.0"))
+WRITER_ALERT_MAX_AGE = int(os.environ.get("WRITER_ALERT_MAX_AGE", "900"))
+
+
+@dataclass
+class WriteResult:
+    office: str
+    new_golden: list[dict]  # [{"date": date, "time": "HH:MM:SS", "type": str}] — what was alerted on
+    gone_golden: int
+    unchanged: bool         # fingerprint matched the cache; only the heartbeat was written
+    appointment_type: str = db.DEFAULT_APPOINTMENT_TYPE
+
+
+class SlotWriter:
+    def __init__(
+        self,
+        cache: SlotStateCache,
+        offices: list[str],
+        dispatcher=None,
+        subscriber_cache=None,
+        book_url: str = db.BOOK_URL,
+        journal: WriteJournal | None = None,
+        max_retries: int = WRITER_MAX_RETRIES,
+        appointment_types: list[str] | None = None,
+        async_db: AsyncDB | None = None,
+        leases=None,
+    ):
+        self.cache = cache
+        self.offices = offices
+        self.appointment_types = appointment_types or [db.DEFAULT_APPOINTMENT_TYPE]
+        self.dispatcher = dispatcher
+        self.subscriber_cache = subscriber_cache
+        self.book_url = book_url
+        self.journal = journal if journal is not None else WriteJournal()
+        self.max_retries = max_retries
+        self.db_client = None
+        self.async_db = async_db
+        self.leases = leases
+        if leases is not None:
+            leases.on_gained.append(self.forget_offices)
+        self._owns_async_db = False
+        self.slot_stats = SlotStats()
+
+        self._queue: asyncio.Queue[tuple[str, str]] = asyncio.Queue()
+        self._latest: dict[tuple[str, str], tuple[int, OfficeSnapshot]] = {}  # queued, not yet picked up
+        self._waiters: dict[tuple[str, str], list[asyncio.Future]] = {}
+        self._task: asyncio.Task | None = None
+        self.stats = {
+            "applied": 0, "unchanged": 0, "coalesced": 0, "retries": 0, "failed": 0, "replayed": 0, "fenced": 0,
+        }
+
+    @property
+    def backlog(self) -> int:
+        return len(self._latest)
+
+    def forget_offices(self, offices: list[str]) -> None:
+        """Drop cached state for offices another worker may have written since we last held them."""
+        for office in offices:
+            for appointment_type in self.appointment_types:
+                self.cache.invalidate((office, appointment_type))
+
+    # ── Producer side ────────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        if self.db_client is None:
+            self.db_client = db.get_client()
+        if self.async_db is None and DB_ASYNC:
+            self.async_db = AsyncDB()
+            self._owns_async_db = True
+        for seq, snapshot in self.journal.latest():
+            self.stats["replayed"] += 1
+            self._enqueue(seq, snapshot)
+        if self.stats["replayed"]:
+            print(f"  [writer] replaying {self.stats['replayed']} journaled snapshots", flush=True)
+        self._task = asyncio.create_task(self._worker())
+
+    def _enqueue(self, seq: int, snapshot: OfficeSnapshot) -> None:
+        if snapshot.key in self._latest:
+            self.stats["coalesced"] += 1
+            self._latest[snapshot.key] = (seq, snapshot)
+            return
+        self._latest[snapshot.key] = (seq, snapshot)
+        self._queue.put_nowait(snapshot.key)
+
+    def submit(self, snapshot: OfficeSnapshot) -> asyncio.Future:
+        """Journal and queue one office / type snapshot. The future resolves to a WriteResult (None on failure)."""
+        self.start()
+        seq = self.journal.append(snapshot)
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(snapshot.key, []).append(future)
+        self._enqueue(seq, snapshot)
+        return future
+
+    # ── Consumer side ────────────────────────────────────────────────────────
+
+    def _apply(self, snapshot: OfficeSnapshot):
+        """Runs in a worker thread. Returns (WriteResult, ReconcileResult | None)."""
+        office, appt_type = key = snapshot.key
+        self.cache.ensure_fresh(self.db_client, self.offices, self.appointment_types)
+        result = None
+        if not self.cache.unchanged(key, snapshot.fingerprint):
+            try:
+                result = db.reconcile_office(
+                    self.db_client, office, set(snapshot.golden), _closest(snapshot),
+                    state=self.cache.get(key), appointment_type=appt_type,
+                )
+            except Exception:
+                self.cache.invalidate(key)
+                raise
+            self.cache.update(key, result.state, snapshot.fingerprint)
+        db.mark_office_checked(
+            self.db_client, office, snapshot.golden_count, snapshot.future_count, appointment_type=appt_type,
+        )
+        return _outcome(snapshot, result), result
+
+    async def _apply_async(self, snapshot: OfficeSnapshot):
+        """_apply on the AsyncDB: reconcile and heartbeat are independent, so they're sent together."""
+        office, appt_type = key = snapshot.key
+        adb = self.async_db
+        if self.cache.stale:
+            self.cache.load(await adb.load_all_office_states(self.offices, self.appointment_types))
+        writes = [adb.mark_office_checked(
+            office, snapshot.golden_count, snapshot.future_count, appointment_type=appt_type,
+        )]
+        changed = not self.cache.unchanged(key, snapshot.fingerprint)
+        if changed:
+            writes.append(adb.reconcile_office(
+                office, set(snapshot.golden), _closest(snapshot),
+                state=self.cache.get(key), appointment_type=appt_type,
+            ))
+        outcomes = await asyncio.gather(*writes, return_exceptions=True)
+        result = outcomes[1] if changed else None
+        if isinstance(result, BaseException):
+            self.cache.invalidate(key)
+            raise result
+        if isinstance(outcomes[0], BaseException):
+            raise outcomes[0]
+        if result is not None:
+            self.cache.update(key, result.state, snapshot.fingerprint)
+        return _outcome(snapshot, result), result
+
+    async def _worker(self) -> None:
+        while True:
+            key = await self._queue.get()
+            try:
+                await self._write(key)
+            except Exception as e:
+                print(f"  [writer] {'/'.join(key)}: unexpected error: {e}", flush=True)
+            finally:
+                self._queue.task_done()
+
+    def _superseded(self, key: tuple[str, str], waiters: list[asyncio.Future]) -> bool:
+        """A newer snapshot was queued meanwhile: hand our waiters to it."""
+        if key not in self._latest:
+            return False
+        self._waiters.setdefault(key, []).extend(waiters)
+        return True
+
+    async def _write(self, key: tuple[str, str]) -> None:
+        seq, snapshot = self._latest.pop(key)
+        waiters = self._waiters.pop(key, [])
+        office, label = snapshot.office, snapshot.label
+
+        for attempt in range(self.max_retries + 1):
+            if self.leases is not None and not self.leases.holds(office):
+                self.stats["fenced"] += 1
+                self.journal.ack(key, seq)
+                print(f"  [writer] {label}: lease not held — dropping snapshot", flush=True)
+                if not self._superseded(key, waiters):
+                    _resolve(waiters, None)
+                return
+            try:
+                if self.async_db is not None:
+                    outcome, result = await self._apply_async(snapshot)
+                else:
+                    outcome, result = await asyncio.to_thread(self._apply, snapshot)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.stats["failed"] += 1
+                    metrics.inc("bmv_writes_total", office=office, result="failed")
+                    print(f"  [writer] {label}: write failed after {attempt + 1} tries, "
+                          f"kept in journal: {e}", flush=True)
+                    if not self._superseded(key, waiters):
+                        _resolve(waiters, None)
+                    return
+                self.stats["retries"] += 1
+                delay = WRITER_BACKOFF_BASE * (2 ** attempt)
+                print(f"  [writer] {label}: write failed ({e}), retrying in {delay:.0f}s", flush=True)
+                await asyncio.sleep(delay + random.uniform(0, delay))
+                if self._superseded(key, waiters):
+                    return
+
+        self.journal.ack(key, seq)
+        lag = time.time() - snapshot.scraped_at
+        metrics.observe("bmv_write_lag_seconds", lag)
+        if outcome.unchanged:
+            self.stats["unchanged"] += 1
+            metrics.inc("bmv_writes_total", office=office, result="unchanged")
+        else:
+            self.stats["applied"] += 1
+            metrics.inc("bmv_writes_total", office=office, result="applied")
+            self.slot_stats.record(office, snapshot.appointment_type, result)
+            held = f", {len(result.held_golden)} missing (not gone yet)" if result.held_golden else ""
+            print(f"  [{label}] Saved: {len(outcome.new_golden)} new, {outcome.gone_golden} gone golden{held}",
+                  flush=True)
+
+        if outcome.new_golden:
+            metrics.inc("bmv_new_golden_total", len(outcome.new_golden), office=office)
+            if lag > WRITER_ALERT_MAX_AGE:
+                print(f"  [{label}] snapshot is {lag:.0f}s old — not alerting", flush=True)
+            elif self.dispatcher is not None and self.subscriber_cache is not None:
+                # A stale cache refreshes with blocking supabase calls: keep them off the loop
+                subscribers = await asyncio.to_thread(self.subscriber_cache.for_office, self.db_client, office)
+                self.dispatcher.submit(office, outcome.new_golden, subscribers, self.book_url)
+        _resolve(waiters, outcome)
+
+    # ── Lifecycle ────────────────────────────────────────────────────────────
+
+    async def drain(self, timeout: float | None = None) -> bool:
+        """Wait for everything queued so far to be written. False on timeout."""
+        if self._task is None:
+            return True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            print(f"  [writer] drain timed out with {self.backlog} snapshots queued "
+                  f"({len(self.journal)} journaled)", flush=True)
+            return False
+
+    def flush_stats(self) -> int:
+        try:
+            return self.slot_stats.flush(self.db_client)
+        except Exception as e:
+            print(f"  [stats] slot_stats update failed: {e}", flush=True)
+            return 0
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for waiters in self._waiters.values():
+            _resolve(waiters, None)
+        self._waiters.clear()
+        # Anything not written is still in the journal for the next start()
+        self._latest.clear()
+        self._queue = asyncio.Queue()
+        if self._owns_async_db:
+            await self.async_db.close()
+            self.async_db = None
+            self._owns_async_db = False
+
+
+def _closest(snapshot: OfficeSnapshot) -> date | None:
+    return date.fromisoformat(snapshot.closest_future) if snapshot.closest_future else None
+
+
+def _outcome(snapshot: OfficeSnapshot, result: db.ReconcileResult | None) -> WriteResult:
+    office, appt_type = snapshot.key
+    if result is None:
+        return WriteResult(office, [], 0, unchanged=True, appointment_type=appt_type)
+    new = [{"date": date.fromisoformat(d), "time": t, "type": appt_type} for d, t in result.new_golden]
+    return WriteResult(office, new, len(result.gone_golden), unchanged=False, appointment_type=appt_type)
+
+
+def _resolve(waiters: list[asyncio.Future], value) -> None:
+    for future in waiters:
+        if not future.done():
+            future.set_result(value)
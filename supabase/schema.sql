@@ -3,9 +3,10 @@
 
 -- ─────────────────────────────────────────────────────────────
 -- APPOINTMENTS
--- Stores every slot we've ever seen. Two types:
+-- Stores every slot we've ever seen, per office and appointment type
+-- (scraper APPOINTMENT_TYPES). Two slot types:
 --   'golden' → < 8 days away (specific time stored)
---   'future' → >= 8 days away (one "closest date" record per office)
+--   'future' → >= 8 days away (one "closest date" record per office and appointment type)
 -- ─────────────────────────────────────────────────────────────
 create table if not exists appointments (
   id               uuid        default gen_random_uuid() primary key,
@@ -19,21 +20,29 @@ create table if not exists appointments (
   available        boolean     not null default true,
   first_seen_at    timestamptz not null default now(),
   last_seen_at     timestamptz not null default now(),
-  last_checked_at  timestamptz,
+  last_checked_at  timestamptz,           -- legacy; per-office check time lives in office_status
   replaced_at      timestamptz,           -- when a closer future date took over
   replaced_by_date date,                  -- the closer date that replaced it
   book_url         text        default 'https://mainebmvappt.cxmflow.com/Appointment/Index/2c052fc7-571f-4b76-9790-7e91f103c408',
+  missed_since     timestamptz,           -- golden slot missing from scrapes since; null while seen
   created_at       timestamptz not null default now()
 );
 
--- Unique: one golden row per (office, date, time)
-create unique index if not exists uq_golden_slot
-  on appointments (office, appointment_date, appointment_time)
-  where slot_type = 'golden';
+-- Migration for tables created before missed slots were held (db.plan_reconcile)
+alter table appointments add column if not exists missed_since timestamptz;
 
--- Unique: one active "current closest" per office
-create unique index if not exists uq_current_closest
-  on appointments (office)
+-- Unique: one golden row per (office, appointment type, date, time).
+-- Not partial, so PostgREST upserts can target it
+-- (on_conflict=office,appointment_type,appointment_date,appointment_time,slot_type).
+-- Future rows have a null time, so they never collide.
+drop index if exists uq_golden_slot;
+create unique index uq_golden_slot
+  on appointments (office, appointment_type, appointment_date, appointment_time, slot_type);
+
+-- Unique: one active "current closest" per office and appointment type
+drop index if exists uq_current_closest;
+create unique index uq_current_closest
+  on appointments (office, appointment_type)
   where slot_type = 'future' and is_current_closest = true;
 
 -- General indexes
@@ -42,6 +51,62 @@ create index if not exists idx_appt_available on appointments (available);
 create index if not exists idx_appt_golden   on appointments (is_golden, available);
 create index if not exists idx_appt_date     on appointments (appointment_date);
 
+-- Live queries
+-- Live golden slots (slot_type = 'golden' and available), ordered by date, time
+create index if not exists idx_appt_live_golden
+  on appointments (appointment_date, appointment_time)
+  where slot_type = 'golden' and available;
+-- AppointmentsTable (Gone / All views): ordered by is_golden desc, available desc, date, time nulls first
+create index if not exists idx_appt_table_order
+  on appointments (is_golden desc, available desc, appointment_date, appointment_time nulls first);
+-- Scraper cache hydration + archive.py: available rows per office / gone rows by age
+create index if not exists idx_appt_office_available
+  on appointments (office) where available;
+create index if not exists idx_appt_gone_last_seen
+  on appointments (last_seen_at) where not available;
+
+
+-- ─────────────────────────────────────────────────────────────
+-- ARCHIVE (cold storage)
+-- scraper/archive.py moves rows that are no longer available and
+-- were last seen more than ARCHIVE_RETENTION_DAYS ago out of
+-- appointments into appointments_archive, so the hot table only
+-- holds live slots plus recent history.
+-- ─────────────────────────────────────────────────────────────
+create table if not exists appointments_archive (
+  like appointments including defaults,
+  archived_at timestamptz not null default now(),
+  primary key (id)
+);
+
+-- Columns added to appointments after the archive table was created
+alter table appointments_archive add column if not exists missed_since timestamptz;
+
+create index if not exists idx_archive_office_first_seen
+  on appointments_archive (office, first_seen_at);
+
+-- Per-office, per-type, per-day summary of archived slots (day = first_seen_at in Maine time).
+-- Recomputed from appointments_archive for every day an archive run touches.
+create table if not exists appointment_daily_rollups (
+  office                  text    not null,
+  appointment_type        text    not null default 'Driver''s License',
+  day                     date    not null,
+  slot_type               text    not null check (slot_type in ('golden', 'future')),
+  slots_seen              int     not null default 0,
+  median_lifetime_seconds int,              -- first_seen_at → last_seen_at
+  max_lifetime_seconds    int,
+  earliest_first_seen     time,             -- local time of day
+  latest_first_seen       time,
+  first_seen_by_hour      int[]   not null default array_fill(0, array[24]),  -- index 0 = midnight
+  updated_at              timestamptz not null default now(),
+  primary key (office, appointment_type, day, slot_type)
+);
+
+-- Migration for tables created before appointment types were tracked
+alter table appointment_daily_rollups add column if not exists appointment_type text not null default 'Driver''s License';
+alter table appointment_daily_rollups drop constraint if exists appointment_daily_rollups_pkey;
+alter table appointment_daily_rollups add primary key (office, appointment_type, day, slot_type);
+
 
 -- ─────────────────────────────────────────────────────────────
 -- SCRAPE RUNS
@@ -54,9 +119,38 @@ create table if not exists scrape_runs (
   offices_scraped   int         default 0,
   golden_slots_found int        default 0,
   future_slots_found int        default 0,
-  errors            jsonb       default '[]'::jsonb
+  errors            jsonb       default '[]'::jsonb,
+  timings           jsonb       -- {wall_ms, spans: {name: [count, total_ms, max_ms]}, offices: {office: ms}}
+);
+
+alter table scrape_runs add column if not exists timings jsonb;
+
+-- Latest completed run
+create index if not exists idx_scrape_runs_completed
+  on scrape_runs (completed_at desc);
+
+
+-- ─────────────────────────────────────────────────────────────
+-- OFFICE STATUS
+-- One row per office and appointment type, upserted by the scraper
+-- after every check.
+-- Deliberately not in the realtime publication: a heartbeat per
+-- office per sweep shouldn't wake every open browser tab.
+-- ─────────────────────────────────────────────────────────────
+create table if not exists office_status (
+  office           text        not null,
+  appointment_type text        not null default 'Driver''s License',
+  last_checked_at  timestamptz not null default now(),
+  golden_count     int         not null default 0,
+  future_count     int         not null default 0,
+  primary key (office, appointment_type)
 );
 
+-- Older installs: one row per office
+alter table office_status add column if not exists appointment_type text not null default 'Driver''s License';
+alter table office_status drop constraint if exists office_status_pkey;
+alter table office_status add primary key (office, appointment_type);
+
 
 -- ─────────────────────────────────────────────────────────────
 -- EMAIL SUBSCRIBERS
@@ -66,18 +160,243 @@ create table if not exists email_subscribers (
   email          text        unique not null,
   subscribed_at  timestamptz not null default now(),
   offices        text[]      default array[]::text[],  -- empty = all offices
-  active         boolean     not null default true
+  active         boolean     not null default true,
+  updated_at     timestamptz not null default now()    -- change marker for the scraper's subscriber cache
+);
+
+alter table email_subscribers add column if not exists updated_at timestamptz not null default now();
+
+create or replace function touch_updated_at() returns trigger
+language plpgsql as $$
+begin
+  new.updated_at = now();
+  return new;
+end;
+$$;
+
+drop trigger if exists trg_email_subscribers_updated_at on email_subscribers;
+create trigger trg_email_subscribers_updated_at
+  before update on email_subscribers
+  for each row execute function touch_updated_at();
+
+-- Per-office lookups push "offices @> {office}" down to Postgres
+create index if not exists idx_subscribers_offices
+  on email_subscribers using gin (offices) where active;
+create index if not exists idx_subscribers_updated_at
+  on email_subscribers (updated_at desc);
+
+
+-- ─────────────────────────────────────────────────────────────
+-- SLOT STATS
+-- Golden-slot analytics maintained incrementally by the scraper
+-- (scraper/stats.py): one row per office, appointment type and metric, bucket counts
+-- summed by increment_slot_stats() once per sweep.
+--   appear_hour  24 buckets, local hour the slot appeared
+--   lead_time    appearance → appointment: <2h,<6h,<12h,<1d,<2d,<3d,<5d,<8d,8d+
+--   lifetime     appearance → gone: <5m,<15m,<30m,<1h,<2h,<6h,<1d,<3d,3d+
+-- ─────────────────────────────────────────────────────────────
+create table if not exists slot_stats (
+  office      text             not null,
+  appointment_type text        not null default 'Driver''s License',
+  metric      text             not null check (metric in ('appear_hour', 'lead_time', 'lifetime')),
+  buckets     int[]            not null,
+  total       bigint           not null default 0,
+  sum_seconds double precision not null default 0,  -- lead_time / lifetime: for means
+  updated_at  timestamptz      not null default now(),
+  primary key (office, appointment_type, metric)
 );
 
+-- Migration for tables created before appointment types were tracked
+alter table slot_stats add column if not exists appointment_type text not null default 'Driver''s License';
+alter table slot_stats drop constraint if exists slot_stats_pkey;
+alter table slot_stats add primary key (office, appointment_type, metric);
+
+-- deltas: [{"office", "appointment_type", "metric", "buckets": [int], "total", "sum_seconds"}]
+-- (a delta without appointment_type counts as Driver's License)
+create or replace function increment_slot_stats(deltas jsonb) returns void
+language plpgsql as $$
+declare
+  d jsonb;
+begin
+  for d in select * from jsonb_array_elements(deltas) loop
+    insert into slot_stats as s (office, appointment_type, metric, buckets, total, sum_seconds, updated_at)
+    values (
+      d->>'office',
+      coalesce(d->>'appointment_type', 'Driver''s License'),
+      d->>'metric',
+      array(select jsonb_array_elements_text(d->'buckets')::int),
+      (d->>'total')::bigint,
+      coalesce((d->>'sum_seconds')::double precision, 0),
+      now()
+    )
+    on conflict (office, appointment_type, metric) do update set
+      buckets = (
+        select array_agg(coalesce(old_n, 0) + coalesce(new_n, 0) order by i)
+        from unnest(s.buckets, excluded.buckets) with ordinality as b(old_n, new_n, i)
+      ),
+      total       = s.total + excluded.total,
+      sum_seconds = s.sum_seconds + excluded.sum_seconds,
+      updated_at  = now();
+  end loop;
+end;
+$$;
+
+revoke execute on function increment_slot_stats(jsonb) from public, anon, authenticated;
+grant execute on function increment_slot_stats(jsonb) to service_role;
+
+
+-- ─────────────────────────────────────────────────────────────
+-- OFFICE LEASES
+-- Lets several scraper workers (OFFICE_LEASES=true) split the
+-- offices between them (scraper/leases.py). A worker only scrapes
+-- and writes offices it holds an unexpired lease on; leases are
+-- renewed while it runs, and a dead worker's leases expire and are
+-- claimed by the others. claim_office_leases() also rebalances:
+-- each live worker (seen in lease_workers within the TTL) gets
+-- about an equal share, and a worker over its share hands the
+-- surplus back.
+-- ─────────────────────────────────────────────────────────────
+create table if not exists office_leases (
+  office      text        primary key,
+  holder      text,                       -- worker id; null = free
+  expires_at  timestamptz not null default now(),
+  acquired_at timestamptz,
+  renewed_at  timestamptz
+);
+
+create table if not exists lease_workers (
+  holder   text        primary key,
+  seen_at  timestamptz not null default now()
+);
+
+create or replace function claim_office_leases(p_holder text, p_offices text[], p_ttl_seconds int)
+returns table (office text)
+language plpgsql as $$
+declare
+  v_ttl     interval := make_interval(secs => p_ttl_seconds);
+  v_workers int;
+  v_share   int;
+  v_mine    int;
+begin
+  insert into lease_workers (holder, seen_at) values (p_holder, now())
+    on conflict (holder) do update set seen_at = now();
+  insert into office_leases (office) select unnest(p_offices)
+    on conflict do nothing;
+
+  -- Keep what we hold, including lapsed leases nobody has taken yet
+  update office_leases l set expires_at = now() + v_ttl, renewed_at = now()
+   where l.holder = p_holder and l.office = any(p_offices);
+
+  select count(*) into v_workers from lease_workers w
+   where w.seen_at > now() - v_ttl;
+  v_share := ceil(array_length(p_offices, 1)::numeric / greatest(v_workers, 1));
+  select count(*) into v_mine from office_leases l
+   where l.holder = p_holder and l.office = any(p_offices);
+
+  if v_mine < v_share then
+    update office_leases l
+       set holder = p_holder, expires_at = now() + v_ttl, acquired_at = now(), renewed_at = now()
+     where l.office in (
+       select f.office from office_leases f
+        where f.office = any(p_offices) and (f.holder is null or f.expires_at <= now())
+        order by f.expires_at
+        limit v_share - v_mine
+        for update skip locked
+     );
+  elsif v_mine > v_share then
+    update office_leases l set holder = null, expires_at = now()
+     where l.office in (
+       select m.office from office_leases m
+        where m.holder = p_holder and m.office = any(p_offices)
+        order by m.office desc
+        limit v_mine - v_share
+        for update skip locked
+     );
+  end if;
+
+  return query
+    select l.office from office_leases l
+     where l.holder = p_holder and l.expires_at > now()
+     order by l.office;
+end;
+$$;
+
+create or replace function renew_office_leases(p_holder text, p_ttl_seconds int)
+returns table (office text)
+language plpgsql as $$
+begin
+  update lease_workers set seen_at = now() where holder = p_holder;
+  return query
+    update office_leases l
+       set expires_at = now() + make_interval(secs => p_ttl_seconds), renewed_at = now()
+     where l.holder = p_holder
+    returning l.office;
+end;
+$$;
+
+create or replace function release_office_leases(p_holder text) returns void
+language plpgsql as $$
+begin
+  update office_leases set holder = null, expires_at = now() where holder = p_holder;
+  delete from lease_workers where holder = p_holder;
+end;
+$$;
+
+revoke execute on function claim_office_leases(text, text[], int) from public, anon, authenticated;
+revoke execute on function renew_office_leases(text, int) from public, anon, authenticated;
+revoke execute on function release_office_leases(text) from public, anon, authenticated;
+grant execute on function claim_office_leases(text, text[], int) to service_role;
+grant execute on function renew_office_leases(text, int) to service_role;
+grant execute on function release_office_leases(text) to service_role;
+
+
+-- ─────────────────────────────────────────────────────────────
+-- PUBLIC SNAPSHOT
+-- The one row the website reads (scraper/public_snapshot.py): live
+-- golden slots, each office's closest future date and office_status,
+-- as one JSON payload, republished at the end of every sweep.
+-- Browsers subscribe to this row instead of to appointments, so they
+-- are notified once per sweep rather than once per row written.
+-- ─────────────────────────────────────────────────────────────
+create table if not exists public_snapshot (
+  id           smallint    primary key default 1 check (id = 1),
+  version      bigint      not null default 0,
+  payload      jsonb       not null default '{}'::jsonb,
+  checksum     text,
+  published_at timestamptz not null default now()
+);
+
+insert into public_snapshot (id) values (1) on conflict do nothing;
+
+-- Bumps the version only when the content changed; null when it didn't
+create or replace function publish_public_snapshot(p_payload jsonb, p_checksum text)
+returns bigint
+language sql as $$
+  update public_snapshot
+     set version = version + 1, payload = p_payload, checksum = p_checksum, published_at = now()
+   where id = 1 and checksum is distinct from p_checksum
+  returning version;
+$$;
+
+revoke execute on function publish_public_snapshot(jsonb, text) from public, anon, authenticated;
+grant execute on function publish_public_snapshot(jsonb, text) to service_role;
+
 
 -- ─────────────────────────────────────────────────────────────
 -- ROW LEVEL SECURITY
--- Public: read appointments + scrape_runs, insert subscribers
+-- Public: read appointments, scrape_runs + public_snapshot, insert subscribers
 -- Service role: full write access (used by scraper)
 -- ─────────────────────────────────────────────────────────────
 alter table appointments      enable row level security;
 alter table scrape_runs       enable row level security;
 alter table email_subscribers enable row level security;
+alter table office_status     enable row level security;
+alter table appointments_archive      enable row level security;
+alter table appointment_daily_rollups enable row level security;
+alter table slot_stats                enable row level security;
+alter table office_leases             enable row level security;
+alter table lease_workers             enable row level security;
+alter table public_snapshot           enable row level security;
 
 -- Anyone can read appointments and scrape_runs
 create policy "public_read_appointments"
@@ -86,6 +405,18 @@ create policy "public_read_appointments"
 create policy "public_read_scrape_runs"
   on scrape_runs for select to anon, authenticated using (true);
 
+create policy "public_read_office_status"
+  on office_status for select to anon, authenticated using (true);
+
+create policy "public_read_rollups"
+  on appointment_daily_rollups for select to anon, authenticated using (true);
+
+create policy "public_read_slot_stats"
+  on slot_stats for select to anon, authenticated using (true);
+
+create policy "public_read_snapshot"
+  on public_snapshot for select to anon, authenticated using (true);
+
 -- Anyone can subscribe (insert their email)
 create policy "public_subscribe"
   on email_subscribers for insert to anon, authenticated with check (true);
@@ -97,12 +428,39 @@ create policy "service_insert_appointments"
 create policy "service_update_appointments"
   on appointments for update to service_role using (true);
 
+create policy "service_delete_appointments"
+  on appointments for delete to service_role using (true);
+
+create policy "service_all_archive"
+  on appointments_archive for all to service_role using (true) with check (true);
+
+create policy "service_all_rollups"
+  on appointment_daily_rollups for all to service_role using (true) with check (true);
+
+create policy "service_all_slot_stats"
+  on slot_stats for all to service_role using (true) with check (true);
+
+create policy "service_all_office_leases"
+  on office_leases for all to service_role using (true) with check (true);
+
+create policy "service_all_lease_workers"
+  on lease_workers for all to service_role using (true) with check (true);
+
+create policy "service_all_public_snapshot"
+  on public_snapshot for all to service_role using (true) with check (true);
+
 create policy "service_insert_scrape_runs"
   on scrape_runs for insert to service_role with check (true);
 
 create policy "service_update_scrape_runs"
   on scrape_runs for update to service_role using (true);
 
+create policy "service_insert_office_status"
+  on office_status for insert to service_role with check (true);
+
+create policy "service_update_office_status"
+  on office_status for update to service_role using (true);
+
 create policy "service_read_subscribers"
   on email_subscribers for select to service_role using (true);
 
@@ -112,7 +470,24 @@ create policy "service_update_subscribers"
 
 -- ─────────────────────────────────────────────────────────────
 -- REALTIME
--- Frontend subscribes to live updates without polling
+-- Frontend subscribes to live updates without polling. Only the
+-- public snapshot is published: one event per sweep, however many
+-- appointment rows the sweep wrote. (Older installs published
+-- appointments and scrape_runs; those are taken out.)
 -- ─────────────────────────────────────────────────────────────
-alter publication supabase_realtime add table appointments;
-alter publication supabase_realtime add table scrape_runs;
+do $$
+begin
+  if not exists (select 1 from pg_publication_tables
+                  where pubname = 'supabase_realtime' and schemaname = 'public' and tablename = 'public_snapshot') then
+    alter publication supabase_realtime add table public_snapshot;
+  end if;
+  if exists (select 1 from pg_publication_tables
+              where pubname = 'supabase_realtime' and schemaname = 'public' and tablename = 'appointments') then
+    alter publication supabase_realtime drop table appointments;
+  end if;
+  if exists (select 1 from pg_publication_tables
+              where pubname = 'supabase_realtime' and schemaname = 'public' and tablename = 'scrape_runs') then
+    alter publication supabase_realtime drop table scrape_runs;
+  end if;
+end;
+$$;